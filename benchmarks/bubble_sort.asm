@@ -0,0 +1,30 @@
+# Bubble sorts 64 words stored in descending order, x20 and x21 are the
+# first and last element afterwards, 1 and 64
+lui x10, 0x10
+addi x11, x0, 64
+addi x5, x0, 0
+fill:
+slli x6, x5, 2
+add x6, x10, x6
+sub x7, x11, x5
+sw x7, 0(x6)
+addi x5, x5, 1
+blt x5, x11, fill
+addi x12, x11, -1
+outer:
+addi x13, x10, 0
+slli x14, x12, 2
+add x14, x10, x14
+inner:
+lw x6, 0(x13)
+lw x7, 4(x13)
+bge x7, x6, ordered
+sw x7, 0(x13)
+sw x6, 4(x13)
+ordered:
+addi x13, x13, 4
+blt x13, x14, inner
+addi x12, x12, -1
+blt x0, x12, outer
+lw x20, 0(x10)
+lw x21, 252(x10)
@@ -0,0 +1,34 @@
+# Single precision dot product of a[i] = 0.5 * i and b[i] = 2.0 over 256
+# elements, f4 = 32640.0 (0x46FF0000)
+lui x10, 0x10
+lui x11, 0x20
+addi x12, x0, 256
+lui x5, 0x3F000
+sw x5, 0(x11)
+flw f1, 0(x11)
+lui x5, 0x40000
+sw x5, 0(x11)
+flw f2, 0(x11)
+fsub.s f3, f1, f1
+fsub.s f4, f1, f1
+addi x5, x0, 0
+fill:
+slli x6, x5, 2
+add x7, x10, x6
+fsw f3, 0(x7)
+add x7, x11, x6
+fsw f2, 0(x7)
+fadd.s f3, f3, f1
+addi x5, x5, 1
+blt x5, x12, fill
+addi x5, x0, 0
+dot:
+slli x6, x5, 2
+add x7, x10, x6
+flw f5, 0(x7)
+add x7, x11, x6
+flw f6, 0(x7)
+fmul.s f7, f5, f6
+fadd.s f4, f4, f7
+addi x5, x5, 1
+blt x5, x12, dot
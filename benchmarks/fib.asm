@@ -0,0 +1,24 @@
+# Recursive fib(15) through jal/jalr with a stack frame per call, x10 = 610
+lui x2, 0x40
+addi x10, x0, 15
+jal x1, fib
+jal x0, done
+fib:
+addi x5, x0, 2
+blt x10, x5, base
+addi x2, x2, -12
+sw x1, 0(x2)
+sw x10, 4(x2)
+addi x10, x10, -1
+jal x1, fib
+sw x10, 8(x2)
+lw x10, 4(x2)
+addi x10, x10, -2
+jal x1, fib
+lw x6, 8(x2)
+add x10, x10, x6
+lw x1, 0(x2)
+addi x2, x2, 12
+base:
+jalr x0, 0(x1)
+done:
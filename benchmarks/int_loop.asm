@@ -0,0 +1,11 @@
+# Integer ALU loop, x5 = 1 + 2 + ... + 16384 = 134225920
+addi x5, x0, 0
+addi x6, x0, 1
+lui x7, 0x4
+loop:
+add x5, x5, x6
+xor x8, x5, x6
+slli x9, x6, 2
+and x10, x8, x9
+addi x6, x6, 1
+bge x7, x6, loop
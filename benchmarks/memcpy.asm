@@ -0,0 +1,33 @@
+# Fills 1024 words with 3 * i, copies them word by word and sums the
+# copy, x20 = 1571328
+lui x10, 0x10
+lui x11, 0x20
+addi x12, x0, 1024
+addi x5, x0, 0
+addi x8, x0, 0
+fill:
+slli x6, x5, 2
+add x7, x10, x6
+sw x8, 0(x7)
+addi x8, x8, 3
+addi x5, x5, 1
+blt x5, x12, fill
+slli x14, x12, 2
+add x14, x10, x14
+addi x13, x10, 0
+addi x15, x11, 0
+copy:
+lw x6, 0(x13)
+sw x6, 0(x15)
+addi x13, x13, 4
+addi x15, x15, 4
+blt x13, x14, copy
+addi x20, x0, 0
+addi x15, x11, 0
+slli x14, x12, 2
+add x14, x11, x14
+sum:
+lw x6, 0(x15)
+add x20, x20, x6
+addi x15, x15, 4
+blt x15, x14, sum
@@ -145,6 +145,11 @@ class InstructionToken(Token):
                 rs1 = args[1]
                 rs2 = args[2]
                 immediate = None
+            case InsTyp.I if self.instruction in ("ecall", "ebreak"):
+                # No operands, ebreak is told apart by its immediate
+                rd = "x0"
+                rs1 = "x0"
+                immediate = "1" if self.instruction == "ebreak" else "0"
             case InsTyp.I:
                 rd = args[0]
                 immediate, rs1 = self.separate_imm_offset(args[1])
@@ -302,11 +307,11 @@ class InstructionToken(Token):
         
         # B-type
         if self.instruction_type == InsTyp.B:
-            # Ensure alignment
+            # Ensure alignment, imm[0] is not encoded
             if value % 2 != 0:
                 raise SyntaxError("Branch offset must be even")
-            value = value // 2  # **important!** imm[12:1] represents multiples of 2
             # Mask to 13-bit signed
+            value = value & 0x1FFF
             if value & 0x1000:
                 value |= 0xFFFFE000
         
@@ -0,0 +1,181 @@
+"""
+Batch runner.
+
+Assembles and runs many programs in a pool of worker processes, each on
+its own DataPath with its own run limits, and streams one JSON Lines
+result per program:
+
+    riscv-batch submissions/ --max_steps 1000000 --timeout 5 > results.jsonl
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from datapath import EXIT_ERROR, DataPath
+from fast_datapath import FastDataPath
+from program_loader import is_elf, load_file
+import gates
+
+ENGINES:dict[str, type[DataPath]] = {
+    "gate": DataPath,
+    "functional": FastDataPath,
+    "block": BlockDataPath,
+}
+
+# Files picked up from a directory
+PROGRAM_SUFFIXES = (".asm", ".hex", ".bin", ".elf")
+
+
+@dataclass
+class Job:
+    path:str
+    engine:str = "block"
+    max_steps:int|None = None
+    timeout:float|None = None
+    halt_on_ecall:bool = False
+
+
+@dataclass
+class JobResult:
+    path:str
+    engine:str
+    exit_reason:str
+    step_count:int
+    pc:int
+    rv32i_registers:list[int]
+    rv32f_registers:list[int]
+    # sha256 of the non zero memory bytes as (address, byte) pairs in address order
+    memory_digest:str
+    seconds:float
+    error:str|None = None
+
+
+def load_source(dp:DataPath, path:str):
+    """
+    Loads an assembly, hex, flat binary or ELF file the same way riscv-sim does.
+    """
+    if path.endswith(".bin") or is_elf(path):
+        dp.load_image(load_file(path))
+        return
+    with open(path, mode="r") as fp:
+        source = fp.read()
+    if path.endswith(".asm"):
+        dp.load_program(Assembler(source).parse(0x0))
+    else:
+        dp.load_program(source.splitlines())
+
+
+def memory_digest(dp:DataPath) -> str:
+    digest = hashlib.sha256()
+    for address, value in sorted(dp.memory.nonzero_bytes().items()):
+        digest.update(struct.pack("<IB", address, value))
+    return digest.hexdigest()
+
+
+def run_job(job:Job) -> JobResult:
+    """
+    Runs one program on a new DataPath, errors in the program are
+    reported in the result instead of raised.
+    """
+    start = time.perf_counter()
+    dp = ENGINES[job.engine](post_mortem_size=0)
+    error = None
+    try:
+        load_source(dp, job.path)
+        exit_reason = dp.run(job.max_steps, job.timeout, job.halt_on_ecall).reason
+    except Exception as e:
+        exit_reason = EXIT_ERROR
+        error = f"{type(e).__name__}: {e}"
+    state = dp.state()
+    # The digest reads the memory, so it has to come before closing it
+    digest = memory_digest(dp)
+    dp.memory.close()
+    return JobResult(
+        job.path,
+        job.engine,
+        exit_reason,
+        dp.step_count,
+        state.pc,
+        list(state.rv32i_registers),
+        list(state.rv32f_registers),
+        digest,
+        time.perf_counter() - start,
+        error
+    )
+
+
+def find_jobs(source:str, defaults:dict) -> list[Job]:
+    """
+    Jobs for every program file in a directory, or for every line of a
+    JSON Lines manifest.  A manifest line holds a "path", relative to the
+    manifest, and optionally any other Job field, which overrides the
+    defaults for that program.
+    """
+    if os.path.isdir(source):
+        return [Job(str(path), **defaults) for path in sorted(Path(source).iterdir()) if path.suffix in PROGRAM_SUFFIXES]
+    jobs:list[Job] = []
+    base = Path(source).parent
+    with open(source) as fp:
+        for line in fp:
+            if line.strip():
+                fields = {**defaults, **json.loads(line)}
+                fields["path"] = str(base / fields["path"])
+                jobs.append(Job(**fields))
+    return jobs
+
+
+def run_batch(jobs:Iterable[Job], workers:int|None = None, gate_backend:str|None = None, chunksize:int = 1) -> Iterator[JobResult]:
+    """
+    Runs the jobs across a pool of worker processes and yields their
+    results in job order as they finish.
+    """
+    initializer = gates.use_backend if gate_backend is not None else None
+    initargs = (gate_backend,) if gate_backend is not None else ()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        yield from executor.map(run_job, jobs, chunksize=chunksize)
+
+
+def write_results(results:Iterable[JobResult], output:TextIO):
+    for result in results:
+        output.write(json.dumps(asdict(result)) + "\n")
+        output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs every program in a directory or JSON Lines manifest across a process pool and writes one JSON Lines result per program.",
+        usage="riscv-batch {directory or manifest} [--workers N] [--max_steps N] [--timeout seconds]"
+    )
+    parser.add_argument("source", help="Directory of .asm, .hex, .bin or .elf programs, or a JSON Lines manifest of jobs.")
+    parser.add_argument("--engine", choices=list(ENGINES), default="block", help="Execution engine for programs that don't set their own.")
+    parser.add_argument("--max_steps", type=int, default=None, help="Default instruction budget per program.")
+    parser.add_argument("--timeout", type=float, default=None, help="Default wall time limit per program in seconds.")
+    parser.add_argument("--halt_on_ecall", action="store_true", help="Flag to stop programs at their first ecall or ebreak by default.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, the number of CPUs by default.")
+    parser.add_argument("--chunksize", type=int, default=1, help="Programs sent to a worker at a time, larger chunks cut overhead for many short programs.")
+    parser.add_argument("--gates", choices=list(gates.GATE_BACKENDS), default=None, help="Gate backend of the worker processes for the gate-level engine.")
+    parser.add_argument("-o", "--output", default=None, help="Path to write the results to, standard output by default.")
+    args = parser.parse_args()
+
+    defaults = {"engine": args.engine, "max_steps": args.max_steps, "timeout": args.timeout, "halt_on_ecall": args.halt_on_ecall}
+    results = run_batch(find_jobs(args.source, defaults), args.workers, args.gates, args.chunksize)
+    if args.output is None:
+        write_results(results, sys.stdout)
+    else:
+        with open(args.output, "w") as fp:
+            write_results(results, fp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Guest workload benchmarks.
+
+Runs the programs in benchmarks/ on every engine configuration and
+reports the guest instructions per second as MIPS.  Results can be
+saved as a JSON baseline and later runs compared against it:
+
+    riscv-bench --save baseline.json
+    riscv-bench --baseline baseline.json --threshold 0.1
+"""
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from datapath import DataPath
+from fast_datapath import FastDataPath
+
+# The workloads are not installed with the modules, by default they are
+# read from the benchmarks/ directory of a checkout run from its root
+BENCHMARK_DIR = Path("benchmarks")
+
+# Engine configuration name to the DataPath it runs on
+ENGINES:dict[str, Callable[[], DataPath]] = {
+    "gate": DataPath,
+    "packed": lambda: DataPath(packed_words=True),
+    "packed-word-alu": lambda: DataPath(packed_words=True, alu_mode="word"),
+    "functional": FastDataPath,
+    "block": BlockDataPath,
+}
+
+# The bit tuple configuration only runs the first instructions of each
+# workload, its rate does not change over a run
+MAX_STEPS:dict[str, int] = {
+    "gate": 1000,
+}
+
+
+@dataclass
+class Result:
+    steps:int
+    seconds:float
+    mips:float
+
+
+def run_workload(dp:DataPath, max_steps:int|None):
+    if max_steps is None:
+        dp.run()
+        return
+    for _ in range(max_steps):
+        if not dp.step():
+            break
+
+
+def measure(program:list[str], engine:str, repeat:int = 5) -> Result:
+    """
+    Runs the program on a new DataPath of the engine configuration
+    repeat times and keeps the fastest run.  Time is the CPU time of this
+    process, so other load on the machine does not count, and assembly
+    and setup are not timed.
+    """
+    best:Result|None = None
+    for _ in range(repeat):
+        dp = ENGINES[engine]()
+        dp.load_program(program)
+        start = time.process_time()
+        run_workload(dp, MAX_STEPS.get(engine))
+        seconds = max(time.process_time() - start, 1e-9)
+        if best is None or seconds < best.seconds:
+            best = Result(dp.step_count, seconds, dp.step_count / seconds / 1e6)
+    return best
+
+
+def load_programs(directory:Path = BENCHMARK_DIR) -> dict[str, list[str]]:
+    """
+    Assembles every .asm file in the directory, keyed by file stem.
+    """
+    return {path.stem: Assembler(path.read_text()).parse(0x0) for path in sorted(directory.glob("*.asm"))}
+
+
+def run_benchmarks(programs:dict[str, list[str]], engines:list[str], repeat:int = 5) -> dict[str, Result]:
+    """
+    Results keyed by "{program}/{engine}".
+    """
+    return {f"{name}/{engine}": measure(program, engine, repeat) for name, program in programs.items() for engine in engines}
+
+
+def find_regressions(results:dict[str, Result], baseline:dict[str, dict], threshold:float) -> list[str]:
+    """
+    Describes every result more than threshold (a fraction) slower than
+    its baseline.  Results missing from the baseline are not compared.
+    """
+    regressions:list[str] = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        expected = baseline[key]["mips"]
+        if result.mips < expected * (1 - threshold):
+            regressions.append(f"{key}: {result.mips:.3f} MIPS, baseline {expected:.3f} MIPS ({result.mips / expected - 1:+.1%})")
+    return regressions
+
+
+def render(results:dict[str, Result]) -> str:
+    lines = [f"{'benchmark':<32}{'instructions':>14}{'seconds':>10}{'MIPS':>10}"]
+    for key, result in results.items():
+        lines.append(f"{key:<32}{result.steps:>14}{result.seconds:>10.3f}{result.mips:>10.3f}")
+    return "\n".join(lines)
+
+
+def save(results:dict[str, Result], path:str):
+    with open(path, "w") as fp:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": {key: asdict(result) for key, result in results.items()},
+        }, fp, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs the guest workloads in benchmarks/ on each engine configuration and reports MIPS.",
+        usage="riscv-bench [--engines ...] [--save results.json] [--baseline baseline.json]"
+    )
+    parser.add_argument("--programs", default=str(BENCHMARK_DIR), help="Directory of .asm workloads to run, benchmarks/ in the working directory by default.")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES), help="Engine configurations to run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark, the fastest one is kept.")
+    parser.add_argument("--save", default=None, help="Path to write the results to as a JSON baseline.")
+    parser.add_argument("--baseline", default=None, help="Path to a JSON baseline to compare the results against.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Fraction a result may be slower than its baseline before it counts as a regression.")
+    args = parser.parse_args()
+
+    programs = load_programs(Path(args.programs))
+    if not programs:
+        parser.error(f"No .asm workloads in {args.programs}, run from the root of a checkout or pass --programs")
+    results = run_benchmarks(programs, args.engines, args.repeat)
+    print(render(results))
+    if args.save is not None:
+        save(results, args.save)
+    if args.baseline is not None:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)["results"]
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            print("\n".join(f"  {regression}" for regression in regressions))
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import time
+
+from datapath import EXIT_BUDGET, EXIT_TIMEOUT
+from fast_datapath import FastDataPath
+from block_translator import BlockTranslator, TranslatedBlock
+from memory import Word
+from program_loader import LoadedProgram
+
+
+class BlockDataPath(FastDataPath):
+    """
+    Block translating engine.
+
+    Straight-line basic blocks are translated once into compiled Python
+    functions (see BlockTranslator) and cached by their start PC, so run()
+    costs roughly one Python call per block instead of one step per
+    instruction.  step() still executes a single instruction.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.blocks:dict[Word, TranslatedBlock] = {}
+        # Start PCs of the blocks covering each instruction memory slot
+        self.slot_blocks:dict[int, set[Word]] = {}
+        self.translator = BlockTranslator(
+            self.instruction_memory,
+            self.memory.memory.read_word,
+            self.memory.memory.write_word,
+            self.fpu.update_word,
+            self.invalidate
+        )
+
+    def load_program(self, prog: list[str]):
+        super().load_program(prog)
+        self.blocks = {}
+        self.slot_blocks = {}
+
+    def load_image(self, program: LoadedProgram):
+        super().load_image(program)
+        self.blocks = {}
+        self.slot_blocks = {}
+
+    def invalidate(self, start:Word, end:Word):
+        """
+        Drops the predecoded instructions and translated blocks overlapping [start, end).
+        """
+        super().invalidate(start, end)
+        for slot in range(start // 4, (end + 3) // 4):
+            for block_start in self.slot_blocks.pop(slot, ()):
+                self.blocks.pop(block_start, None)
+
+    def run_loop(self, limit:int, deadline:float|None):
+        if self.displaying or self.trace is not None:
+            return super().run_loop(limit, deadline)
+        if self.profiler is not None and self.instruction_memory.shared is not None:
+            # A block counts its instructions only once it ends, so code it
+            # overwrites would be profiled as the new instructions
+            return super().run_loop(limit, deadline)
+
+        blocks = self.blocks
+        translator = self.translator
+        progress = [0, 0]
+        post_mortem = self.post_mortem
+        profiler = self.profiler
+        # The step limit, or the next deadline check when it comes first
+        checkpoint = limit if deadline is None else min(limit, self.step_count + self.deadline_interval)
+        while True:
+            if self.step_count >= checkpoint:
+                if self.step_count >= limit:
+                    self.exit_reason = EXIT_BUDGET
+                    return
+                if time.monotonic() >= deadline:
+                    self.exit_reason = EXIT_TIMEOUT
+                    return
+                checkpoint = min(limit, self.step_count + self.deadline_interval)
+
+            pc = self.pc.value
+            block = blocks.get(pc)
+            if block is None:
+                block = translator.translate(pc)
+                if block is None:
+                    # End of the program, a system instruction or an
+                    # instruction that fails to decode
+                    if not self.step():
+                        return
+                    continue
+                blocks[pc] = block
+                for slot in range(pc // 4, pc // 4 + block.length):
+                    self.slot_blocks.setdefault(slot, set()).add(pc)
+            if self.step_count + block.length > limit:
+                # Step the last instructions of the budget one at a time
+                if not self.step():
+                    return
+                continue
+
+            try:
+                next_pc = block.function(self.rv32i_register_file.registers, self.rv32f_register_file.registers, progress)
+            except Exception:
+                # Leave the PC on the instruction that raised
+                self.pc.value = (pc + 4 * progress[0]) & 0xFFFFFFFF
+                self.step_count += progress[0]
+                if post_mortem is not None and progress[0]:
+                    post_mortem.record_block(self.step_count - 1, pc, progress[0])
+                if profiler is not None and progress[0]:
+                    profiler.count_block(pc, progress[0], self.pc.value)
+                raise
+            self.pc.value = next_pc
+            executed = block.length
+            if progress[1]:
+                # The block overwrote itself and stopped early
+                executed = progress[1]
+                progress[1] = 0
+            self.step_count += executed
+            if post_mortem is not None:
+                post_mortem.record_block(self.step_count - 1, pc, executed)
+            if profiler is not None:
+                profiler.count_block(pc, executed, next_pc)
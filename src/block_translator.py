@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from typing import Callable
+
+import rv32i_alu_control as ac
+from memory import MASK32, Word
+from instruction_memory import InstructionMemory
+from decoded_instruction import DecodedInstruction, SRC1_INT_RS1, SRC1_PC, SRC1_ZERO
+
+# Longest run of instructions translated into one block
+MAX_BLOCK_LENGTH = 256
+
+# RV32IALU operations that are inlined as Python expressions,
+# anything else calls the RV32IALU word function.
+INLINE_ALU_EXPRESSIONS = {
+    ac.CTRL_ALU_ADD: "(({a}) + ({b})) & 0xFFFFFFFF",
+    ac.CTRL_ALU_SUB: "(({a}) - ({b})) & 0xFFFFFFFF",
+    ac.CTRL_ALU_AND: "({a}) & ({b})",
+    ac.CTRL_ALU_OR: "({a}) | ({b})",
+    ac.CTRL_ALU_XOR: "({a}) ^ ({b})",
+    ac.CTRL_ALU_SLL: "(({a}) << (({b}) & 0x1F)) & 0xFFFFFFFF",
+    ac.CTRL_ALU_SRL: "({a}) >> (({b}) & 0x1F)",
+    ac.CTRL_ALU_SLTU: "1 if ({a}) < ({b}) else 0",
+}
+
+
+@dataclass(slots=True)
+class TranslatedBlock:
+    start:Word
+    # Address one past the last instruction in the block
+    end:Word
+    length:int
+    source:str
+    # Called with the integer and float register lists and a two element
+    # progress list, returns the next PC.  When an instruction raises,
+    # progress[0] holds the index of that instruction in the block.  When a
+    # store overwrites the block itself the block returns early with the
+    # number of instructions it ran in progress[1].
+    function:Callable[[list[Word], list[Word], list[int]], Word]
+
+
+class BlockTranslator:
+    """
+    Finds the straight-line basic block starting at a PC, from there up to
+    and including the next branch or jump, and compiles it once into a
+    Python function that updates the register files directly.
+    """
+
+    def __init__(self, instruction_memory:InstructionMemory, read_word:Callable, write_word:Callable, fpu_update:Callable, invalidate:Callable):
+        self.instruction_memory = instruction_memory
+        self.read_word = read_word
+        self.write_word = write_word
+        self.fpu_update = fpu_update
+        self.invalidate = invalidate
+
+    def collect(self, start:Word) -> list[DecodedInstruction]:
+        """
+        Returns the predecoded instructions of the block at start.
+        The block stops before an instruction that fails to decode so
+        that instruction raises when it is stepped, and before a system
+        instruction so the engine can halt on it.
+        """
+        block:list[DecodedInstruction] = []
+        pc = start
+        while len(block) < MAX_BLOCK_LENGTH:
+            try:
+                decoded = self.instruction_memory.get_decoded(pc)
+            except (ValueError, RuntimeError):
+                break
+            if decoded is None or decoded.System:
+                break
+            block.append(decoded)
+            if decoded.Branch or decoded.Jump:
+                break
+            pc = (pc + 4) & MASK32
+        return block
+
+    def translate(self, start:Word) -> TranslatedBlock|None:
+        block = self.collect(start)
+        if not block:
+            return None
+
+        namespace = {
+            "_read": self.read_word,
+            "_write": self.write_word,
+            "_fpu": self.fpu_update,
+            "_invalidate": self.invalidate,
+        }
+        # Stores can only overwrite instructions when code and data share one address space
+        text = (self.instruction_memory.base, self.instruction_memory.text_end) if self.instruction_memory.shared is not None else None
+        lines = ["def _block(x, f, _p):"]
+        pc = start
+        next_pc = start
+        for index, decoded in enumerate(block):
+            lines.append(f"    # 0x{pc:08X}: 0x{decoded.word:08X}")
+            lines.extend("    " + line for line in self.translate_instruction(decoded, index, pc, text, namespace, start, start + 4 * len(block)))
+            pc = (pc + 4) & MASK32
+            next_pc = pc
+
+        last = block[-1]
+        if not (last.Branch or last.Jump):
+            lines.append(f"    return {next_pc}")
+
+        source = "\n".join(lines) + "\n"
+        code = compile(source, f"<block 0x{start:08X}>", "exec")
+        exec(code, namespace)
+        return TranslatedBlock(start, next_pc, len(block), source, namespace["_block"])
+
+    @staticmethod
+    def translate_instruction(decoded:DecodedInstruction, index:int, pc:Word, text:tuple[Word, Word]|None, namespace:dict, block_start:Word, block_end:Word) -> list[str]:
+        lines:list[str] = []
+        register_file = "f" if decoded.RegFileSel else "x"
+        read_data_1 = f"{register_file}[{decoded.rs1}]"
+        read_data_2 = f"{register_file}[{decoded.rs2}]"
+        rd = decoded.rd
+
+        writes_back = decoded.FPRegWrite or decoded.IntToFP or ((decoded.RegWrite or decoded.FPToInt) and rd != 0)
+        # Jumps write back the link address, jalr also needs rs1 + imm as its target
+        needs_result = (writes_back and not decoded.Jump) or decoded.MemRead or decoded.MemWrite or decoded.Branch or decoded.JumpReg
+
+        if decoded.fpu_op is not None:
+            namespace[f"_fpu_op_{index}"] = decoded.fpu_op
+            lines.append(f"_p[0] = {index}")
+            lines.append(f"_r = _fpu(_fpu_op_{index}, {read_data_1}, {read_data_2})[1]")
+        elif needs_result:
+            if decoded.src1 == SRC1_ZERO:
+                alu_src1 = "0"
+            elif decoded.src1 == SRC1_PC:
+                alu_src1 = str(pc)
+            elif decoded.src1 == SRC1_INT_RS1:
+                alu_src1 = f"x[{decoded.rs1}]"
+            else:
+                alu_src1 = read_data_1
+            alu_src2 = read_data_2 if decoded.imm is None else str(decoded.imm)
+
+            expression = INLINE_ALU_EXPRESSIONS.get(decoded.alu_op)
+            if expression is None:
+                namespace[f"_alu_{index}"] = decoded.alu_function
+                lines.append(f"_r = _alu_{index}({alu_src1}, {alu_src2})")
+            else:
+                lines.append("_r = " + expression.format(a=alu_src1, b=alu_src2))
+
+        write_back = str((pc + 4) & MASK32) if decoded.Jump else "_r"
+        if decoded.MemRead:
+            lines.append(f"_p[0] = {index}")
+            lines.append("_m = _read(_r)")
+            if decoded.MemToReg:
+                write_back = "_m"
+        if decoded.MemWrite:
+            lines.append(f"_p[0] = {index}")
+            lines.append(f"_write(_r, {read_data_2})")
+            if text is not None:
+                # A word store overlapping [text base, text end)
+                lines.append(f"if {text[0] - 4} < _r < {text[1]}:")
+                lines.append("    _invalidate(_r, _r + 4)")
+                if not (decoded.Branch or decoded.Jump):
+                    # The rest of this block is stale once it is overwritten
+                    lines.append(f"    if {block_start} <= _r < {block_end}:")
+                    lines.append(f"        _p[1] = {index + 1}")
+                    lines.append(f"        return {(pc + 4) & MASK32}")
+
+        if decoded.FPRegWrite:
+            lines.append(f"f[{rd}] = {write_back}")
+        elif decoded.RegWrite and rd != 0:
+            lines.append(f"x[{rd}] = {write_back}")
+
+        if decoded.FPToInt and rd != 0:
+            lines.append(f"x[{rd}] = {write_back}")
+        elif decoded.IntToFP:
+            lines.append(f"f[{rd}] = {write_back}")
+
+        if decoded.JumpReg:
+            lines.append("return _r & 0xFFFFFFFE")
+        elif decoded.Jump:
+            lines.append(f"return {(pc + decoded.jump_offset) & MASK32}")
+        elif decoded.Branch:
+            taken, not_taken = (pc + decoded.branch_offset) & MASK32, (pc + 4) & MASK32
+            if decoded.BranchNotZero:
+                taken, not_taken = not_taken, taken
+            lines.append(f"return {taken} if _r == 0 else {not_taken}")
+
+        return lines
@@ -0,0 +1,65 @@
+"""
+On disk checkpoints of a DataPath.Snapshot.
+
+A checkpoint is the CHECKPOINT_MAGIC header, a HEADER struct (pc, step
+count, page count), both register files as 32 little endian words each,
+then every non zero page as its page number followed by its PAGE_SIZE
+bytes:
+
+    riscv-sim program.asm --halt_on_ecall --save_checkpoint booted.ckpt
+    riscv-sim program.asm --checkpoint booted.ckpt
+"""
+import struct
+
+from datapath import DataPath
+from paged_memory import PAGE_SIZE
+
+CHECKPOINT_MAGIC = b"RVCKPT01"
+
+# pc, step count, page count
+HEADER = struct.Struct("<IQI")
+REGISTERS = struct.Struct("<32I")
+PAGE_NUMBER = struct.Struct("<I")
+
+
+def save_checkpoint(snapshot:DataPath.Snapshot, path:str):
+    zero_page = bytes(PAGE_SIZE)
+    pages = {number: page for number, page in sorted(snapshot.pages.items()) if page != zero_page}
+    with open(path, "wb") as fp:
+        fp.write(CHECKPOINT_MAGIC)
+        fp.write(HEADER.pack(snapshot.pc, snapshot.step_count, len(pages)))
+        fp.write(REGISTERS.pack(*snapshot.rv32i_registers))
+        fp.write(REGISTERS.pack(*snapshot.rv32f_registers))
+        for number, page in pages.items():
+            fp.write(PAGE_NUMBER.pack(number))
+            fp.write(page)
+
+
+def load_checkpoint(path:str) -> DataPath.Snapshot:
+    """
+    Reads a checkpoint written by save_checkpoint, raises ValueError if
+    the file is not one or is cut short.
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    if data[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a checkpoint file")
+    offset = len(CHECKPOINT_MAGIC)
+    expected = offset + HEADER.size + 2 * REGISTERS.size
+    if len(data) < expected:
+        raise ValueError(f"Checkpoint {path} is truncated")
+    pc, step_count, page_count = HEADER.unpack_from(data, offset)
+    offset += HEADER.size
+    rv32i_registers = REGISTERS.unpack_from(data, offset)
+    offset += REGISTERS.size
+    rv32f_registers = REGISTERS.unpack_from(data, offset)
+    offset += REGISTERS.size
+    if len(data) != offset + page_count * (PAGE_NUMBER.size + PAGE_SIZE):
+        raise ValueError(f"Checkpoint {path} holds {page_count} pages but is {len(data)} bytes long")
+    pages:dict[int, bytes] = {}
+    for _ in range(page_count):
+        number, = PAGE_NUMBER.unpack_from(data, offset)
+        offset += PAGE_NUMBER.size
+        pages[number] = data[offset:offset + PAGE_SIZE]
+        offset += PAGE_SIZE
+    return DataPath.Snapshot(pc, rv32i_registers, rv32f_registers, pages, step_count)
@@ -1,4 +1,4 @@
-from memory import Bit, Bits, Bitx32, Bitx7, bin_str_to_bits, bin_to_dec, sign_extend, shift_left_1, shift_left_2
+from memory import Bit, Bits, Bitx32, Bitx7, Word, bin_str_to_bits, bin_to_dec, int_to_bits, sign_extend, shift_left_1, shift_left_2, word_sign_extend
 
 # LSB first
 OPCODE_LOAD = (1,1,0,0,0,0,0)
@@ -10,7 +10,7 @@ OPCODE_AUIPC = (1,1,1,0,1,0,0)
 OPCODE_BRANCH = (1,1,0,0,0,1,1)
 OPCODE_JALR = (1,1,1,0,0,1,1)
 OPCODE_JAL = (1,1,1,1,0,1,1)
-OPCODE_SYSTEM = (1,1,0,0,0,1,1)
+OPCODE_SYSTEM = (1,1,0,0,1,1,1)
 OPCODE_MISC = (1,1,1,1,0,0,0)
 OPCODE_FP = (1,1,0,0,1,0,1)
 OPCODE_FLW = (1,1,1,0,0,0,0) # Load Float
@@ -44,6 +44,25 @@ J_TYPE_OPCODES = {
     (1, 1, 1, 1, 0, 1, 1),
 }
 
+# Packed opcodes
+OPCODE_LOAD_WORD = 0x03
+OPCODE_STORE_WORD = 0x23
+OPCODE_I_TYPE_WORD = 0x13
+OPCODE_R_TYPE_WORD = 0x33
+OPCODE_LUI_WORD = 0x37
+OPCODE_AUIPC_WORD = 0x17
+OPCODE_BRANCH_WORD = 0x63
+OPCODE_JALR_WORD = 0x67
+OPCODE_JAL_WORD = 0x6F
+OPCODE_SYSTEM_WORD = 0x73
+OPCODE_MISC_WORD = 0x0F
+OPCODE_FP_WORD = 0x53
+OPCODE_FLW_WORD = 0x07
+OPCODE_FSW_WORD = 0x27
+
+# Every 7 bit opcode as an LSB-first tuple, indexed by its packed value.
+OPCODE_BITS:tuple[Bitx7,...] = tuple(int_to_bits(opcode, 7) for opcode in range(128))
+
 class ControlUnit:
     def __init__(self):
         self.reset()
@@ -61,13 +80,13 @@ class ControlUnit:
 
     @staticmethod
     def get_imm_b(instruction: Bits) -> Bitx32:
-        # B-type
+        # B-type, imm[12|10:5] in bits 25-31 and imm[4:1|11] in bits 7-11
         imm = (
-            instruction[7],
+            0,
             *instruction[8:12],
             *instruction[25:31],
-            instruction[31],
-            0
+            instruction[7],
+            instruction[31]
         )
         return sign_extend(imm, 32)
 
@@ -78,16 +97,54 @@ class ControlUnit:
 
     @staticmethod
     def get_imm_j(instruction: Bits) -> Bitx32:
-        # J-type
+        # J-type, imm[20|10:1|11|19:12] in bits 12-31
         imm = (
+            0,
+            *instruction[21:31],
             instruction[20],
             *instruction[12:20],
-            *instruction[21:31],
-            instruction[31],
-            0
+            instruction[31]
         )
         return sign_extend(imm, 32)
 
+    @staticmethod
+    def get_imm_i_word(instruction: Word) -> Word:
+        # I-type
+        return word_sign_extend(instruction >> 20, 12)
+
+    @staticmethod
+    def get_imm_s_word(instruction: Word) -> Word:
+        # S-type
+        imm = ((instruction >> 7) & 0x1F) | ((instruction >> 25) << 5)
+        return word_sign_extend(imm, 12)
+
+    @staticmethod
+    def get_imm_b_word(instruction: Word) -> Word:
+        # B-type
+        imm = (
+            (((instruction >> 8) & 0xF) << 1)
+            | (((instruction >> 25) & 0x3F) << 5)
+            | (((instruction >> 7) & 0x1) << 11)
+            | (((instruction >> 31) & 0x1) << 12)
+        )
+        return word_sign_extend(imm, 13)
+
+    @staticmethod
+    def get_imm_u_word(instruction: Word) -> Word:
+        # U-type
+        return instruction & 0xFFFFF000
+
+    @staticmethod
+    def get_imm_j_word(instruction: Word) -> Word:
+        # J-type
+        imm = (
+            (((instruction >> 21) & 0x3FF) << 1)
+            | (((instruction >> 20) & 0x1) << 11)
+            | (((instruction >> 12) & 0xFF) << 12)
+            | (((instruction >> 31) & 0x1) << 20)
+        )
+        return word_sign_extend(imm, 21)
+
     def reset(self):
         self.RegDst = 0
         self.ALUSrc = 0
@@ -97,7 +154,10 @@ class ControlUnit:
         self.MemWrite = 0
         self.Branch = 0
         self.Jump = 0
+        self.JumpReg = 0
         self.ALUOp = (0, 0)  # 2-bit tuple
+        # ecall, ebreak and the CSR instructions, the engines can halt on them
+        self.System = 0
         
         # RV32F Signals
         self.FPUOp = 0
@@ -151,9 +211,11 @@ class ControlUnit:
             self.RegWrite = 1
             self.ALUOp = (0, 0)  # 00
 
-        # JALR
+        # JALR, the RV32IALU computes the target rs1 + imm
         elif opcode == OPCODE_JALR:
             self.Jump = 1
+            self.JumpReg = 1
+            self.ALUSrc = 1
             self.RegWrite = 1
             self.ALUOp = (0, 0)  # 00
 
@@ -194,6 +256,7 @@ class ControlUnit:
 
         # SYSTEM (ECALL, EBREAK, CSR instructions)
         elif opcode == OPCODE_SYSTEM:
+            self.System = 1
             self.RegWrite = 0
             self.ALUOp = (0, 0)
 
@@ -204,3 +267,9 @@ class ControlUnit:
 
         else:
             raise ValueError(f"Unknown opcode: {opcode}")
+
+    def decode_word(self, opcode: int):
+        """
+        Decodes a packed 7 bit opcode.
+        """
+        self.decode(OPCODE_BITS[opcode & 0x7F])
@@ -1,20 +1,44 @@
 from dataclasses import dataclass
-from fpu import FPU
+import sys
+import time
+
+from fpu import MODE_FLOAT, FPU
 from fpu_control import FPUControl
 from memory_unit import MemoryUnit
+from program_loader import LoadedProgram
+from profiler import Profiler
+from step_trace import PostMortemBuffer, TRACE_FP_WRITE, TRACE_INT_WRITE, TraceSink
+from decoded_instruction import SRC1_INT_RS1
 from rv32f_register_file import RV32FRegisterFile
 from rv32i_register_file import RV32IRegisterFile
 from instruction_memory import InstructionMemory, PC
-from rv32i_alu import RV32IALU
-from rv32i_alu_control import RV32IALUControl
-from memory import Bit, Bitx32, bin_str_to_bits, bin_to_dec, bin_to_hex, dec_to_hex, int_to_bits, Bits, repr_bits, shift_left_1, shift_left_2, sign_extend, slice_bits
+from rv32i_alu import MODE_GATE, RV32IALU
+from rv32i_alu_control import CTRL_ALU_ADD, RV32IALUControl
+from memory import MASK32, Bit, Bitx32, Word, bin_str_to_bits, bin_to_dec, bits_to_uint32, bin_to_hex, dec_to_hex, int_to_bits, Bits, repr_bits, shift_left_1, shift_left_2, sign_extend, slice_bits, word_field
 from gates import high_level_mux
+import gates
 from control_unit import (
-    OPCODE_AUIPC, OPCODE_FLW, OPCODE_FSW, OPCODE_LUI, OPCODE_STORE, ControlUnit,
+    OPCODE_AUIPC, OPCODE_FLW, OPCODE_FSW, OPCODE_LUI, OPCODE_STORE, OPCODE_BITS, ControlUnit,
+    OPCODE_AUIPC_WORD, OPCODE_FLW_WORD, OPCODE_FSW_WORD, OPCODE_LUI_WORD, OPCODE_STORE_WORD,
     R_TYPE_OPCODES, I_TYPE_OPCODES, S_TYPE_OPCODES, B_TYPE_OPCODES, U_TYPE_OPCODES, J_TYPE_OPCODES
 )
 
+# Why run returned
+EXIT_END = "end"          # the PC ran past the end of the program
+EXIT_ECALL = "ecall"
+EXIT_EBREAK = "ebreak"
+EXIT_BUDGET = "budget"    # max_steps instructions ran
+EXIT_TIMEOUT = "timeout"  # the timeout passed
+EXIT_ERROR = "error"      # the program raised, reported by runners that catch it
+
+ECALL_WORD = 0x00000073
+EBREAK_WORD = 0x00100073
+
+
 class DataPath:
+    # Instructions run between checks of the run deadline
+    deadline_interval = 64
+
     @dataclass
     class Config:
         show_immediate_values:bool = False
@@ -24,6 +48,48 @@ class DataPath:
         show_memory:bool = False
         show_reads:bool = False
         show_writes:bool = False
+        packed_words:bool = False
+        alu_mode:str = MODE_GATE
+        gate_decoder:bool = False
+        memory_image:str|None = None
+        unified_memory:bool = False
+        post_mortem_size:int = 64
+        post_mortem_path:str|None = None
+        fpu_mode:str = MODE_FLOAT
+
+    @dataclass
+    class State:
+        """
+        Architectural state as packed ints, independent of the engine.
+        """
+        pc:int
+        rv32i_registers:tuple[int, ...]
+        rv32f_registers:tuple[int, ...]
+        memory:dict[int, int]
+
+    @dataclass
+    class Snapshot:
+        """
+        Machine state to restore later: the PC, both register files as
+        packed ints, the memory pages (shared copy on write with the
+        machine while it uses paged memory) and the step count.  The
+        program in a separate instruction memory is not part of it.
+        """
+        pc:int
+        rv32i_registers:tuple[int, ...]
+        rv32f_registers:tuple[int, ...]
+        pages:dict[int, bytes]
+        step_count:int
+
+    @dataclass
+    class ExitStatus:
+        """
+        How a run ended, one of the EXIT_* reasons, with the step count
+        and the PC it stopped at.
+        """
+        reason:str
+        step_count:int
+        pc:int
 
     def __init__(self,
             show_immediate_values:bool = False,
@@ -32,8 +98,47 @@ class DataPath:
             show_step:bool = False,
             show_memory:bool = False,
             show_reads:bool = False,
-            show_writes:bool = False
+            show_writes:bool = False,
+            packed_words:bool = False,
+            alu_mode:str = MODE_GATE,
+            gate_decoder:bool = False,
+            memory_image:str|None = None,
+            unified_memory:bool = False,
+            trace:TraceSink|None = None,
+            post_mortem_size:int = 64,
+            post_mortem_path:str|None = None,
+            profile:bool = False,
+            fpu_mode:str = MODE_FLOAT
         ):
+        """
+        packed_words runs every component on plain 32-bit ints instead of
+        LSB-first bit tuples, bits are only built for display.
+
+        alu_mode runs the RV32IALU bit by bit through gates ('gate') or
+        on whole words ('word').
+
+        gate_decoder routes register addresses through the gate-level
+        decoder5x32 instead of looking them up directly.
+
+        memory_image backs the Memory Unit with a memory mapped file at
+        that path, an existing image is used as the initial memory.
+
+        unified_memory fetches instructions from the Memory Unit, so the
+        program is loaded once into one address space shared by code and
+        data and stores can modify the program.
+
+        trace receives a record for every executed instruction, see step_trace.py.
+
+        post_mortem_size is the number of most recent instructions kept in
+        an always-on ring buffer (0 turns it off).  When run raises they are
+        added to the exception as a note, or written as a binary trace to
+        post_mortem_path when it is given.
+
+        profile counts executed instructions per PC in self.profiler, see profiler.py.
+
+        fpu_mode runs the FPU arithmetic on host floats ('float') or on the
+        fields of the words ('reference'), see fpu.py.
+        """
         self.config = self.Config(
             show_immediate_values,
             show_rv32i_registers,
@@ -41,180 +146,593 @@ class DataPath:
             show_step,
             show_memory,
             show_reads,
-            show_writes
+            show_writes,
+            packed_words,
+            alu_mode,
+            gate_decoder,
+            memory_image,
+            unified_memory,
+            post_mortem_size,
+            post_mortem_path,
+            fpu_mode
         )
-        self.pc = PC(int_to_bits(0, 32))
-        self.rv32i_register_file = RV32IRegisterFile()
-        self.rv32f_register_file = RV32FRegisterFile()
-        self.instruction_memory = InstructionMemory()
-        self.rv32i_alu = RV32IALU()
+        self.pc = PC(0 if packed_words else int_to_bits(0, 32), packed=packed_words)
+        self.rv32i_register_file = RV32IRegisterFile(packed=packed_words, gate_decoder=gate_decoder)
+        self.rv32f_register_file = RV32FRegisterFile(packed=packed_words, gate_decoder=gate_decoder)
+        self.rv32i_alu = RV32IALU(alu_mode)
         self.alu_control = RV32IALUControl()
-        self.fpu = FPU()
+        self.fpu = FPU(fpu_mode)
         self.fpu_control = FPUControl()
         self.control = ControlUnit()
-        self.memory = MemoryUnit(memory_in_megabytes=4096)
+        self.memory = MemoryUnit(memory_in_megabytes=4096, packed=packed_words, image_path=memory_image)
+        self.instruction_memory = InstructionMemory(packed=packed_words, shared=self.memory.memory if unified_memory else None)
+        self.step_count = 0
+        self.trace = trace
+        self.post_mortem = PostMortemBuffer(post_mortem_size) if post_mortem_size else None
+        self.profiler = Profiler(self.instruction_memory) if profile else None
+        # Set by run, step stops on ecall and ebreak while it is on
+        self.halt_on_ecall = False
+        self.exit_reason = EXIT_END
 
     def load_program(self, prog: list[str]):
         self.instruction_memory.load(prog)
+        if self.profiler is not None:
+            self.profiler.reset()
 
-    def run(self):
-        step_count = 0
-        while instruction := self.instruction_memory.get_instruction(self.pc.value):
-            if self.config.show_step:
-                print(f"STEP #{step_count} {{")
+    def load_image(self, program:LoadedProgram):
+        """
+        Loads a program from program_loader, its segments go straight into
+        the Memory Unit and the PC is set to its entry point.
+        """
+        for segment in program.segments:
+            self.memory.memory.write_bytes(segment.address, segment.data)
+            if segment.memory_size > len(segment.data):
+                self.memory.memory.clear(segment.address + len(segment.data), segment.memory_size - len(segment.data))
+        if self.config.unified_memory and program.segments:
+            # The text is already in memory with the segments
+            self.instruction_memory.map_text(program.text_base, len(program.instructions))
+        else:
+            self.instruction_memory.load_words(program.instructions, program.text_base)
+        if self.profiler is not None:
+            self.profiler.reset()
+        self.pc.value = program.entry if self.config.packed_words else int_to_bits(program.entry, 32)
 
-            pc_current = self.pc.value
-            _, pc_plus_4 = self.rv32i_alu.op_add(pc_current, int_to_bits(4, 32))
+    def invalidate(self, start:Word, end:Word):
+        """
+        Drops anything cached from the instructions overlapping [start, end).
+        """
+        if self.profiler is not None:
+            self.profiler.retire(start, end)
+        self.instruction_memory.invalidate(start, end)
 
-            # Decode opcode (LSB-first)
-            opcode = instruction[0:7]
-            self.control.decode(opcode)
+    def state(self) -> State:
+        if self.config.packed_words:
+            return self.State(
+                self.pc.value,
+                tuple(self.rv32i_register_file.registers),
+                tuple(self.rv32f_register_file.registers),
+                self.memory.nonzero_bytes()
+            )
+        return self.State(
+            bin_to_dec(self.pc.value),
+            tuple(bin_to_dec(register.read_bits()) for register in self.rv32i_register_file.registers),
+            tuple(bin_to_dec(register.read_bits()) for register in self.rv32f_register_file.registers),
+            self.memory.nonzero_bytes()
+        )
 
-            # Extract registers
-            rd  = slice_bits(instruction, 7, 11)
-            rs1 = slice_bits(instruction, 15, 19)
-            rs2 = slice_bits(instruction, 20, 24)
-            funct7 = instruction[25:32]
+    def snapshot(self) -> Snapshot:
+        """
+        Captures the machine state, see restore.
+        """
+        if self.config.packed_words:
+            pc = self.pc.value
+            rv32i_registers = tuple(self.rv32i_register_file.registers)
+            rv32f_registers = tuple(self.rv32f_register_file.registers)
+        else:
+            pc = bin_to_dec(self.pc.value)
+            rv32i_registers = tuple(bin_to_dec(register.read_bits()) for register in self.rv32i_register_file.registers)
+            rv32f_registers = tuple(bin_to_dec(register.read_bits()) for register in self.rv32f_register_file.registers)
+        return self.Snapshot(pc, rv32i_registers, rv32f_registers, self.memory.memory.snapshot(), self.step_count)
 
-            if self.config.show_step:
-                print("\tpc", bin_to_hex(self.pc.value))
-                print("\trd", repr_bits(rd))
-                print("\trs1", repr_bits(rs1))
-                print("\trs2", repr_bits(rs2))
+    def restore(self, snapshot:Snapshot):
+        """
+        Puts the machine back in the state of a snapshot, which stays
+        usable for more restores.  The program loaded in a separate
+        instruction memory is kept, it should be the one the snapshot was
+        taken with.
+        """
+        packed = self.config.packed_words
+        self.pc.value = snapshot.pc if packed else int_to_bits(snapshot.pc, 32)
+        for register_file, values in ((self.rv32i_register_file, snapshot.rv32i_registers), (self.rv32f_register_file, snapshot.rv32f_registers)):
+            if packed:
+                register_file.registers[:] = values
+            else:
+                for register, value in zip(register_file.registers, values):
+                    register.write_bits(int_to_bits(value, 32))
+        self.memory.memory.restore(snapshot.pages)
+        self.step_count = snapshot.step_count
+        if self.instruction_memory.shared is not None:
+            # The code in memory may differ from what was decoded
+            self.invalidate(self.instruction_memory.base, self.instruction_memory.text_end)
 
-            if self.control.RegFileSel:
+    def run(self, max_steps:int|None = None, timeout:float|None = None, halt_on_ecall:bool = False) -> ExitStatus:
+        """
+        Runs until the PC passes the end of the program, or one of the
+        limits is reached: max_steps more instructions, timeout seconds
+        of wall time (checked every deadline_interval instructions), or
+        an ecall or ebreak when halt_on_ecall is set.  A halting ecall or
+        ebreak has executed, the PC is on the instruction after it.
 
-                fp_read_data_1, fp_read_data_2 = self.rv32f_register_file.update(
-                    rs1, rs2, rd, bin_str_to_bits("0"*32), 0
-                )
-                read_data_1 = fp_read_data_1
-                read_data_2 = fp_read_data_2
+        Returns the exit reason with the final step count.  Errors in the
+        guest program still raise.
+        """
+        self.halt_on_ecall = halt_on_ecall
+        self.exit_reason = EXIT_END
+        limit = self.step_count + max_steps if max_steps is not None else sys.maxsize
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            self.run_loop(limit, deadline)
+        except Exception as error:
+            self.report_post_mortem(error)
+            raise
+        pc = self.pc.value if self.config.packed_words else bin_to_dec(self.pc.value)
+        return self.ExitStatus(self.exit_reason, self.step_count, pc)
 
-            else:
-                # Read registers (no write)
-                read_data_1, read_data_2 = self.rv32i_register_file.update(
-                    rs1, rs2, rd, bin_str_to_bits("0"*32), 0
-                )
+    def run_loop(self, limit:int, deadline:float|None):
+        step = self.step
+        while True:
+            checkpoint = limit if deadline is None else min(limit, self.step_count + self.deadline_interval)
+            for _ in range(checkpoint - self.step_count):
+                if not step():
+                    return
+            if self.step_count >= limit:
+                self.exit_reason = EXIT_BUDGET
+                return
+            if time.monotonic() >= deadline:
+                self.exit_reason = EXIT_TIMEOUT
+                return
+
+    def system_halts(self, word:Word) -> bool:
+        """
+        Whether an executed system instruction stops the run, ecall and
+        ebreak do while halt_on_ecall is set.  Sets the exit reason.
+        """
+        if not self.halt_on_ecall or word not in (ECALL_WORD, EBREAK_WORD):
+            return False
+        self.exit_reason = EXIT_ECALL if word == ECALL_WORD else EXIT_EBREAK
+        return True
+
+    def report_post_mortem(self, error:Exception):
+        """
+        Adds the last executed instructions to an exception raised by run.
+        """
+        if self.post_mortem is None:
+            return
+        pc = self.pc.value if self.config.packed_words else bin_to_dec(self.pc.value)
+        kept = min(self.step_count, self.post_mortem.capacity)
+        if self.config.post_mortem_path is not None:
+            self.post_mortem.dump(self.config.post_mortem_path, self.step_count)
+            error.add_note(f"Stopped at pc 0x{pc:08X}, the last {kept} instructions were written to {self.config.post_mortem_path}")
+        else:
+            error.add_note(f"Stopped at pc 0x{pc:08X}, the last {kept} instructions were:\n" + self.post_mortem.render(self.step_count))
+
+    def step(self) -> bool:
+        """
+        Executes the instruction at the PC.
+        Returns False once the PC runs past the end of the program.
+        """
+        if self.profiler is not None:
+            return self.step_profiled()
+        if self.trace is not None:
+            return self.step_traced()
+        return self.execute()
+
+    def step_profiled(self) -> bool:
+        """
+        Executes the instruction at the PC like step and counts it in the profiler.
+        """
+        pc = self.pc.value if self.config.packed_words else bin_to_dec(self.pc.value)
+        if self.instruction_memory.shared is not None:
+            # Code can change, keep the instruction that runs for retire
+            try:
+                self.instruction_memory.get_decoded(pc)
+            except (ValueError, RuntimeError):
+                # Let the engine raise its own error
+                pass
+        step = self.step_count
+        running = self.step_traced() if self.trace is not None else self.execute()
+        if self.step_count != step:
+            # Also counts an ecall or ebreak that halted
+            self.profiler.count(pc, self.pc.value if self.config.packed_words else bin_to_dec(self.pc.value))
+        return running
+
+    def register_value(self, float_register:bool, index:int) -> Word:
+        register_file = self.rv32f_register_file if float_register else self.rv32i_register_file
+        if self.config.packed_words:
+            return register_file.registers[index]
+        return bin_to_dec(register_file.registers[index].read_bits())
+
+    def step_traced(self) -> bool:
+        """
+        Executes the instruction at the PC like step and writes its trace record.
+        """
+        pc = self.pc.value if self.config.packed_words else bin_to_dec(self.pc.value)
+        try:
+            decoded = self.instruction_memory.get_decoded(pc)
+        except (ValueError, RuntimeError):
+            # Let the engine raise its own error
+            return self.execute()
+        if decoded is None:
+            return False
+
+        rd = decoded.rd
+        flags = decoded.trace_flags
+        mem_address = 0
+        mem_data = 0
+        if decoded.MemRead or decoded.MemWrite:
+            # Loads and stores add their immediate to the first source
+            base = self.register_value(decoded.RegFileSel and decoded.src1 != SRC1_INT_RS1, decoded.rs1)
+            mem_address = (base + decoded.imm) & MASK32
+            if decoded.MemWrite:
+                mem_data = self.register_value(decoded.RegFileSel, decoded.rs2)
+
+        step = self.step_count
+        running = self.execute()
+
+        if decoded.MemRead:
+            mem_data = self.memory.read_word(mem_address)
+        rd_value = 0
+        if flags & TRACE_FP_WRITE:
+            rd_value = self.register_value(True, rd)
+        elif flags & TRACE_INT_WRITE:
+            rd_value = self.register_value(False, rd)
+        next_pc = self.pc.value if self.config.packed_words else bin_to_dec(self.pc.value)
+        self.trace.record(step, pc, decoded.word, next_pc, rd_value, mem_address, mem_data, rd, flags)
+        return running
+
+    def execute(self) -> bool:
+        """
+        Executes the instruction at the PC without tracing it.
+        """
+        instruction = self.instruction_memory.get_instruction(self.pc.value)
+        if instruction is None:
+            return False
+        if self.config.packed_words:
+            self.step_word(instruction)
+        else:
+            self.step_bits(instruction)
+        self.step_count += 1
+        if self.control.System:
+            return not self.system_halts(instruction if self.config.packed_words else bits_to_uint32(instruction))
+        return True
+
+    def step_bits(self, instruction:Bitx32):
+        if self.config.show_step:
+            print(f"STEP #{self.step_count} {{")
+
+        pc_current = self.pc.value
+        _, pc_plus_4 = self.rv32i_alu.update(CTRL_ALU_ADD, pc_current, int_to_bits(4, 32))
 
-            # Immediate generation
-            imm_i = self.control.get_imm_i(instruction)
-            imm_s = self.control.get_imm_s(instruction)
-            imm_b = self.control.get_imm_b(instruction)
-            imm_u = self.control.get_imm_u(instruction)
-            imm_j = self.control.get_imm_j(instruction)
-
-            if self.config.show_step and self.config.show_immediate_values:
-                if opcode in I_TYPE_OPCODES:
-                    print("I-Type immediate\n\tBIN:", repr_bits(imm_i), "\n\tdec:", bin_to_dec(imm_i))
-                if opcode in S_TYPE_OPCODES:
-                    print("S-Type immediate\n\tBIN:", repr_bits(imm_s), "\n\tdec:", bin_to_dec(imm_s))
-                if opcode in B_TYPE_OPCODES:
-                    print("B-Type immediate\n\tBIN:", repr_bits(imm_b), "\n\tdec:", bin_to_dec(imm_b))
-                if opcode in U_TYPE_OPCODES:
-                    print("U-Type immediate\n\tBIN:", repr_bits(imm_u), "\n\tdec:", bin_to_dec(imm_u))
-                if opcode in J_TYPE_OPCODES:
-                    print("J-Type immediate\n\tBIN:", repr_bits(imm_j), "\n\tdec:", bin_to_dec(imm_j))
-            
-            if self.control.FPUOp:
-                # FPU operation
-                fpu_op = self.fpu_control.update(
-                    self.control.ALUOp,
-                    funct7,
-                    instruction[12:15],
-                    rs2
+        # Decode opcode (LSB-first)
+        opcode = instruction[0:7]
+        self.control.decode(opcode)
+
+        # Extract registers
+        rd  = slice_bits(instruction, 7, 11)
+        rs1 = slice_bits(instruction, 15, 19)
+        rs2 = slice_bits(instruction, 20, 24)
+        funct7 = instruction[25:32]
+
+        if self.config.show_step:
+            print("\tpc", bin_to_hex(self.pc.value))
+            print("\trd", repr_bits(rd))
+            print("\trs1", repr_bits(rs1))
+            print("\trs2", repr_bits(rs2))
+
+        if self.control.RegFileSel:
+
+            fp_read_data_1, fp_read_data_2 = self.rv32f_register_file.update(
+                rs1, rs2, rd, bin_str_to_bits("0"*32), 0
+            )
+            read_data_1 = fp_read_data_1
+            read_data_2 = fp_read_data_2
+
+        else:
+            # Read registers (no write)
+            read_data_1, read_data_2 = self.rv32i_register_file.update(
+                rs1, rs2, rd, bin_str_to_bits("0"*32), 0
+            )
+
+        # Immediate generation
+        imm_i = self.control.get_imm_i(instruction)
+        imm_s = self.control.get_imm_s(instruction)
+        imm_b = self.control.get_imm_b(instruction)
+        imm_u = self.control.get_imm_u(instruction)
+        imm_j = self.control.get_imm_j(instruction)
+
+        if self.config.show_step and self.config.show_immediate_values:
+            if opcode in I_TYPE_OPCODES:
+                print("I-Type immediate\n\tBIN:", repr_bits(imm_i), "\n\tdec:", bin_to_dec(imm_i))
+            if opcode in S_TYPE_OPCODES:
+                print("S-Type immediate\n\tBIN:", repr_bits(imm_s), "\n\tdec:", bin_to_dec(imm_s))
+            if opcode in B_TYPE_OPCODES:
+                print("B-Type immediate\n\tBIN:", repr_bits(imm_b), "\n\tdec:", bin_to_dec(imm_b))
+            if opcode in U_TYPE_OPCODES:
+                print("U-Type immediate\n\tBIN:", repr_bits(imm_u), "\n\tdec:", bin_to_dec(imm_u))
+            if opcode in J_TYPE_OPCODES:
+                print("J-Type immediate\n\tBIN:", repr_bits(imm_j), "\n\tdec:", bin_to_dec(imm_j))
+        
+        if self.control.FPUOp:
+            # FPU operation
+            fpu_op = self.fpu_control.update(
+                self.control.ALUOp,
+                funct7,
+                instruction[12:15],
+                rs2
+            )
+            zero_flag, execution_result = self.fpu.update(fpu_op, read_data_1, read_data_2)
+        else:
+            # RV32IALU operation
+            # RV32IALU source selection
+            # Handle LUI/AUIPC specially
+            if opcode == OPCODE_LUI:
+                # imm_u is passthrough
+                alu_src1 = int_to_bits(0, 32)
+                alu_src2 = imm_u
+            elif opcode == OPCODE_AUIPC:
+                # AUIPC
+                alu_src1 = pc_current
+                alu_src2 = imm_u
+            elif opcode == OPCODE_STORE:
+                alu_src1 = read_data_1
+                alu_src2 = imm_s
+            elif opcode == OPCODE_FLW or opcode == OPCODE_FSW:
+                # FLW and FSW use rs1 (integer register) for address calculation
+                int_read_data_1, _ = self.rv32i_register_file.update(
+                    rs1, rs2, rd, bin_str_to_bits("0"*32), 0
                 )
-                zero_flag, execution_result = self.fpu.update(fpu_op, read_data_1, read_data_2)
+                alu_src1 = int_read_data_1
+                alu_src2 = imm_s if opcode == OPCODE_FSW else imm_i
             else:
-                # RV32IALU operation
-                # RV32IALU source selection
-                # Handle LUI/AUIPC specially
-                if opcode == OPCODE_LUI:
-                    # imm_u is passthrough
-                    alu_src1 = int_to_bits(0, 32)
-                    alu_src2 = imm_u
-                elif opcode == OPCODE_AUIPC:
-                    # AUIPC
-                    alu_src1 = pc_current
-                    alu_src2 = imm_u
-                elif opcode == OPCODE_STORE or opcode == OPCODE_FSW:
-                    alu_src1 = read_data_1
-                    alu_src2 = imm_s
-                elif opcode == OPCODE_FLW:
-                    # FLW uses rs1 (integer register) for address calculation
-                    int_read_data_1, _ = self.rv32i_register_file.update(
-                        rs1, rs2, rd, bin_str_to_bits("0"*32), 0
-                    )
-                    alu_src1 = int_read_data_1
-                    alu_src2 = imm_i
-                else:
-                    alu_src1 = read_data_1
-                    alu_src2 = high_level_mux(read_data_2, imm_i, self.control.ALUSrc)
-
-                # RV32IALU operation
-                alu_op = self.alu_control.update(
-                    self.control.ALUOp,
-                    instruction[12:15],
-                    instruction[30]
+                alu_src1 = read_data_1
+                alu_src2 = high_level_mux(read_data_2, imm_i, self.control.ALUSrc)
+
+            # RV32IALU operation, bit 30 only selects SUB/SRA for
+            # register operands and for srai
+            alu_op = self.alu_control.update(
+                self.control.ALUOp,
+                instruction[12:15],
+                gates.and_gate(
+                    instruction[30],
+                    gates.or_gate(gates.not_gate(self.control.ALUSrc), int(instruction[12:15] == (1, 0, 1)))
                 )
+            )
+
+            zero_flag, execution_result = self.rv32i_alu.update(alu_op, alu_src1, alu_src2)
+
+        # Memory access
+        mem_data = bin_str_to_bits("0"*32)
+        if self.control.MemRead:
+            mem_data = self.memory.read(execution_result)
+            if self.config.show_reads:
+                print(f"MEMORY READ at: 0x{bin_to_hex(execution_result)}  data: 0x{bin_to_hex(mem_data)}")
+        if self.control.MemWrite:
+            write_data = read_data_2 if self.control.RegFileSel else read_data_2
+            if self.config.show_writes:
+                print(f"MEMORY WRITE at: 0x{bin_to_hex(execution_result)}  data: 0x{bin_to_hex(write_data)}")
+            self.memory.write(execution_result, write_data)
+            if self.instruction_memory.shared is not None:
+                address = bin_to_dec(execution_result)
+                if self.instruction_memory.overwritten_by(address):
+                    self.invalidate(address, address + 4)
+
+        # Write-back data selection
+        if self.control.FPMemToReg:
+            # FP load
+            write_back_data = mem_data
+        elif self.control.MemToReg:
+            # int load
+            write_back_data = mem_data
+        elif self.control.Jump:
+            # Link register
+            write_back_data = pc_plus_4
+        else:
+            # Execution result
+            write_back_data = execution_result
+
+        if self.control.FPRegWrite:
+            # Write to RV32F register file
+            self.rv32f_register_file.update(rs1, rs2, rd, write_back_data, 1)
+        elif self.control.RegWrite:
+            # Write to RV32I register file
+            self.rv32i_register_file.update(rs1, rs2, rd, write_back_data, 1)
+
+        if self.control.FPToInt:
+            # Transfer from FP register to Int register
+            self.rv32i_register_file.update(rs1, rs2, rd, write_back_data, 1)
+        elif self.control.IntToFP:
+            # Transfer from Int register to FP register
+            self.rv32f_register_file.update(rs1, rs2, rd, write_back_data, 1)
+
+        if self.post_mortem is not None:
+            self.post_mortem.record(
+                self.step_count,
+                bin_to_dec(pc_current),
+                bin_to_dec(instruction),
+                bin_to_dec(write_data if self.control.MemWrite else write_back_data),
+                bin_to_dec(execution_result) if self.control.MemRead or self.control.MemWrite else 0
+            )
+
+        # Branch and jump logic, bne/blt/bltu branch when the zero flag is
+        # clear (funct3 bit 0 xor bit 2), beq/bge/bgeu when it is set
+        funct3 = instruction[12:15]
+        branch_taken = gates.and_gate(
+            self.control.Branch,
+            gates.xor_gate(zero_flag, gates.xor_gate(funct3[0], funct3[2]))
+        )
+        pc_branch = self.rv32i_alu.update(CTRL_ALU_ADD, pc_current, imm_b)[1]
+        next_pc = high_level_mux(pc_plus_4, pc_branch, branch_taken)
+
+        # jal jumps relative to the pc, jalr to rs1 + imm with bit 0 cleared
+        pc_jump = high_level_mux(
+            self.rv32i_alu.update(CTRL_ALU_ADD, pc_current, imm_j)[1],
+            (0, *execution_result[1:]),
+            self.control.JumpReg
+        )
+        self.pc.value = high_level_mux(next_pc, pc_jump, self.control.Jump)
 
-                zero_flag, execution_result = self.rv32i_alu.update(alu_op, alu_src1, alu_src2)
-
-            # Memory access
-            mem_data = bin_str_to_bits("0"*32)
-            if self.control.MemRead:
-                mem_data = self.memory.read(execution_result)
-                if self.config.show_reads:
-                    print(f"MEMORY READ at: 0x{bin_to_hex(execution_result)}  data: 0x{bin_to_hex(mem_data)}")
-            if self.control.MemWrite:
-                write_data = read_data_2 if self.control.RegFileSel else read_data_2
-                if self.config.show_writes:
-                    print(f"MEMORY WRITE at: 0x{bin_to_hex(execution_result)}  data: 0x{bin_to_hex(write_data)}")
-                self.memory.write(execution_result, write_data)
-
-            # Write-back data selection
-            if self.control.FPMemToReg:
-                # FP load
-                write_back_data = mem_data
-            elif self.control.MemToReg:
-                # int load
-                write_back_data = mem_data
+        if self.config.show_step:
+            if self.config.show_rv32i_registers:
+                print("Integer Register File:")
+                print(repr(self.rv32i_register_file))
+            if self.config.show_rv32f_registers:
+                print("Floating-Point Register File:")
+                print(repr(self.rv32f_register_file))
+
+            if self.config.show_memory:
+                print("Memory Unit:")
+                print(repr(self.memory))
+            print("}")
+
+    def step_word(self, instruction:Word):
+        """
+        Packed word version of step_bits, the bit tuple helpers are only
+        used to display values.
+        """
+        if self.config.show_step:
+            print(f"STEP #{self.step_count} {{")
+
+        pc_current = self.pc.value
+        _, pc_plus_4 = self.rv32i_alu.update_word(CTRL_ALU_ADD, pc_current, 4)
+
+        # Decode opcode
+        opcode = instruction & 0x7F
+        self.control.decode_word(opcode)
+
+        # Extract registers
+        rd  = word_field(instruction, 7, 11)
+        rs1 = word_field(instruction, 15, 19)
+        rs2 = word_field(instruction, 20, 24)
+        funct3 = word_field(instruction, 12, 14)
+        funct7 = instruction >> 25
+
+        if self.config.show_step:
+            print("\tpc", bin_to_hex(int_to_bits(pc_current, 32)))
+            print("\trd", repr_bits(int_to_bits(rd, 5)))
+            print("\trs1", repr_bits(int_to_bits(rs1, 5)))
+            print("\trs2", repr_bits(int_to_bits(rs2, 5)))
+
+        if self.control.RegFileSel:
+            read_data_1, read_data_2 = self.rv32f_register_file.update_word(rs1, rs2, rd, 0, 0)
+        else:
+            # Read registers (no write)
+            read_data_1, read_data_2 = self.rv32i_register_file.update_word(rs1, rs2, rd, 0, 0)
+
+        # Immediate generation
+        imm_i = self.control.get_imm_i_word(instruction)
+        imm_s = self.control.get_imm_s_word(instruction)
+        imm_b = self.control.get_imm_b_word(instruction)
+        imm_u = self.control.get_imm_u_word(instruction)
+        imm_j = self.control.get_imm_j_word(instruction)
+
+        if self.config.show_step and self.config.show_immediate_values:
+            opcode_bits = OPCODE_BITS[opcode]
+            for opcodes, name, imm in (
+                (I_TYPE_OPCODES, "I", imm_i),
+                (S_TYPE_OPCODES, "S", imm_s),
+                (B_TYPE_OPCODES, "B", imm_b),
+                (U_TYPE_OPCODES, "U", imm_u),
+                (J_TYPE_OPCODES, "J", imm_j),
+            ):
+                if opcode_bits in opcodes:
+                    print(f"{name}-Type immediate\n\tBIN:", repr_bits(int_to_bits(imm, 32)), "\n\tdec:", imm)
+
+        if self.control.FPUOp:
+            # FPU operation
+            fpu_op = self.fpu_control.update_word(self.control.ALUOp, funct7, funct3, rs2)
+            zero_flag, execution_result = self.fpu.update_word(fpu_op, read_data_1, read_data_2)
+        else:
+            # RV32IALU source selection
+            if opcode == OPCODE_LUI_WORD:
+                alu_src1 = 0
+                alu_src2 = imm_u
+            elif opcode == OPCODE_AUIPC_WORD:
+                alu_src1 = pc_current
+                alu_src2 = imm_u
+            elif opcode == OPCODE_STORE_WORD:
+                alu_src1 = read_data_1
+                alu_src2 = imm_s
+            elif opcode == OPCODE_FLW_WORD or opcode == OPCODE_FSW_WORD:
+                # FLW and FSW use rs1 (integer register) for address calculation
+                alu_src1 = self.rv32i_register_file.registers[rs1]
+                alu_src2 = imm_s if opcode == OPCODE_FSW_WORD else imm_i
             else:
-                # Execution result
-                write_back_data = execution_result
-
-            if self.control.FPRegWrite:
-                # Write to RV32F register file
-                self.rv32f_register_file.update(rs1, rs2, rd, write_back_data, 1)
-            elif self.control.RegWrite:
-                # Write to RV32I register file
-                self.rv32i_register_file.update(rs1, rs2, rd, write_back_data, 1)
-
-            if self.control.FPToInt:
-                # Transfer from FP register to Int register
-                self.rv32i_register_file.update(rs1, rs2, rd, write_back_data, 1)
-            elif self.control.IntToFP:
-                # Transfer from Int register to FP register
-                self.rv32f_register_file.update(rs1, rs2, rd, write_back_data, 1)
-
-            # Branch and jump logic
-            branch_taken = self.control.Branch and zero_flag
-            pc_branch = self.rv32i_alu.op_add(pc_current, imm_b)[1]
-            next_pc = high_level_mux(pc_plus_4, pc_branch, branch_taken)
-
-            pc_jump = self.rv32i_alu.op_add(pc_current, imm_j)[1]
-            self.pc.value = high_level_mux(next_pc, pc_jump, self.control.Jump)
-
-            if self.config.show_step:
-                if self.config.show_rv32i_registers:
-                    print("Integer Register File:")
-                    print(repr(self.rv32i_register_file))
-                if self.config.show_rv32f_registers:
-                    print("Floating-Point Register File:")
-                    print(repr(self.rv32f_register_file))
-
-                if self.config.show_memory:
-                    print("Memory Unit:")
-                    print(repr(self.memory))
-                print("}")
-
-            step_count += 1
+                alu_src1 = read_data_1
+                alu_src2 = imm_i if self.control.ALUSrc else read_data_2
+
+            funct7_bit_30 = (instruction >> 30) & 1 if not self.control.ALUSrc or funct3 == 0b101 else 0
+            alu_op = self.alu_control.update_word(self.control.ALUOp, funct3, funct7_bit_30)
+            zero_flag, execution_result = self.rv32i_alu.update_word(alu_op, alu_src1, alu_src2)
+
+        # Memory access
+        mem_data = 0
+        if self.control.MemRead:
+            mem_data = self.memory.read_word(execution_result)
+            if self.config.show_reads:
+                print(f"MEMORY READ at: 0x{execution_result:08X}  data: 0x{mem_data:08X}")
+        if self.control.MemWrite:
+            if self.config.show_writes:
+                print(f"MEMORY WRITE at: 0x{execution_result:08X}  data: 0x{read_data_2:08X}")
+            self.memory.write_word(execution_result, read_data_2)
+            if self.instruction_memory.overwritten_by(execution_result):
+                self.invalidate(execution_result, execution_result + 4)
+
+        # Write-back data selection
+        if self.control.FPMemToReg or self.control.MemToReg:
+            write_back_data = mem_data
+        elif self.control.Jump:
+            write_back_data = pc_plus_4
+        else:
+            write_back_data = execution_result
+
+        if self.control.FPRegWrite:
+            self.rv32f_register_file.update_word(rs1, rs2, rd, write_back_data, 1)
+        elif self.control.RegWrite:
+            self.rv32i_register_file.update_word(rs1, rs2, rd, write_back_data, 1)
+
+        if self.control.FPToInt:
+            self.rv32i_register_file.update_word(rs1, rs2, rd, write_back_data, 1)
+        elif self.control.IntToFP:
+            self.rv32f_register_file.update_word(rs1, rs2, rd, write_back_data, 1)
+
+        if self.post_mortem is not None:
+            self.post_mortem.record(
+                self.step_count,
+                pc_current,
+                instruction,
+                read_data_2 if self.control.MemWrite else write_back_data,
+                execution_result if self.control.MemRead or self.control.MemWrite else 0
+            )
+
+        # Branch and jump logic
+        if self.control.JumpReg:
+            self.pc.value = execution_result & ~1
+        elif self.control.Jump:
+            self.pc.value = (pc_current + imm_j) & MASK32
+        elif self.control.Branch and zero_flag ^ ((funct3 ^ (funct3 >> 2)) & 1):
+            self.pc.value = (pc_current + imm_b) & MASK32
+        else:
+            self.pc.value = pc_plus_4
+
+        if self.config.show_step:
+            if self.config.show_rv32i_registers:
+                print("Integer Register File:")
+                print(repr(self.rv32i_register_file))
+            if self.config.show_rv32f_registers:
+                print("Floating-Point Register File:")
+                print(repr(self.rv32f_register_file))
+
+            if self.config.show_memory:
+                print("Memory Unit:")
+                print(repr(self.memory))
+            print("}")
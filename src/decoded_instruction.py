@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Callable
+
+from memory import Bit, Bitx4, Bitx5, Word
+from control_unit import (
+    ControlUnit, OPCODE_AUIPC_WORD, OPCODE_FLW_WORD, OPCODE_FSW_WORD, OPCODE_LUI_WORD, OPCODE_STORE_WORD
+)
+from rv32i_alu import WORD_OPERATIONS
+from rv32i_alu_control import RV32IALUControl
+from fpu_control import FPUControl
+from step_trace import signal_flags
+
+# First RV32IALU source
+SRC1_ZERO = 0
+SRC1_PC = 1
+SRC1_READ_DATA_1 = 2
+SRC1_INT_RS1 = 3 # FLW and FSW read their base from the integer register file
+
+
+@dataclass(slots=True)
+class DecodedInstruction:
+    """
+    An instruction after it has been through the ControlUnit and the
+    RV32IALU/FPU controls, so executing it only needs a dispatch.
+    """
+    word:Word
+    opcode:int
+    rd:int
+    rs1:int
+    rs2:int
+    # The one immediate the instruction uses as its second RV32IALU source, None for rs2
+    imm:Word|None
+    src1:int
+    alu_op:Bitx4|None
+    alu_function:Callable[[Word, Word], Word]|None
+    fpu_op:Bitx5|None
+    branch_offset:Word
+    jump_offset:Word
+    # Flags of the instruction's step trace records
+    trace_flags:int
+
+    # Control signals
+    RegFileSel:Bit
+    MemRead:Bit
+    MemWrite:Bit
+    MemToReg:Bit
+    RegWrite:Bit
+    FPRegWrite:Bit
+    FPToInt:Bit
+    IntToFP:Bit
+    Branch:Bit
+    # bne, blt and bltu branch when the RV32IALU result is not zero
+    BranchNotZero:Bit
+    Jump:Bit
+    # jalr jumps to its RV32IALU result instead of pc + jump_offset
+    JumpReg:Bit
+    System:Bit
+
+    _control = ControlUnit()
+    _alu_control = RV32IALUControl()
+    _fpu_control = FPUControl()
+
+    @classmethod
+    def from_word(cls, word:Word) -> "DecodedInstruction":
+        """
+        Raises the same errors as the ControlUnit and controls would when
+        the instruction is executed.
+        """
+        control = cls._control
+        opcode = word & 0x7F
+        control.decode_word(opcode)
+
+        rd = (word >> 7) & 0x1F
+        rs1 = (word >> 15) & 0x1F
+        rs2 = (word >> 20) & 0x1F
+        funct3 = (word >> 12) & 0x7
+
+        alu_op = None
+        alu_function = None
+        fpu_op = None
+        imm = None
+        src1 = SRC1_READ_DATA_1
+        if control.FPUOp:
+            fpu_op = cls._fpu_control.update_word(control.ALUOp, word >> 25, funct3, rs2)
+        else:
+            if opcode == OPCODE_LUI_WORD:
+                src1 = SRC1_ZERO
+                imm = control.get_imm_u_word(word)
+            elif opcode == OPCODE_AUIPC_WORD:
+                src1 = SRC1_PC
+                imm = control.get_imm_u_word(word)
+            elif opcode == OPCODE_STORE_WORD:
+                imm = control.get_imm_s_word(word)
+            elif opcode == OPCODE_FSW_WORD:
+                src1 = SRC1_INT_RS1
+                imm = control.get_imm_s_word(word)
+            elif opcode == OPCODE_FLW_WORD:
+                src1 = SRC1_INT_RS1
+                imm = control.get_imm_i_word(word)
+            elif control.ALUSrc:
+                imm = control.get_imm_i_word(word)
+
+            funct7_bit_30 = (word >> 30) & 1 if not control.ALUSrc or funct3 == 0b101 else 0
+            alu_op = cls._alu_control.update_word(control.ALUOp, funct3, funct7_bit_30)
+            alu_function = WORD_OPERATIONS[alu_op]
+
+        return cls(
+            word=word,
+            opcode=opcode,
+            rd=rd,
+            rs1=rs1,
+            rs2=rs2,
+            imm=imm,
+            src1=src1,
+            alu_op=alu_op,
+            alu_function=alu_function,
+            fpu_op=fpu_op,
+            branch_offset=control.get_imm_b_word(word),
+            jump_offset=control.get_imm_j_word(word),
+            trace_flags=signal_flags(control, rd),
+            RegFileSel=control.RegFileSel,
+            MemRead=control.MemRead,
+            MemWrite=control.MemWrite,
+            MemToReg=control.MemToReg or control.FPMemToReg,
+            RegWrite=control.RegWrite,
+            FPRegWrite=control.FPRegWrite,
+            FPToInt=control.FPToInt,
+            IntToFP=control.IntToFP,
+            Branch=control.Branch,
+            BranchNotZero=(funct3 ^ (funct3 >> 2)) & 1,
+            Jump=control.Jump,
+            JumpReg=control.JumpReg,
+            System=control.System,
+        )
@@ -1,4 +1,4 @@
-from memory import Bit, Bitx32
+from memory import Bit, Bitx5, Bitx32, int_to_bits
 import gates as g
 
 def decoder2x4(data_0:Bit, data_1:Bit, power:Bit = None) -> tuple[Bit,Bit,Bit,Bit]:
@@ -69,6 +69,21 @@ def decoder5x32(data_0: Bit, data_1: Bit, data_2: Bit, data_3: Bit, data_4: Bit,
 
 
 
+# decoder5x32 output for every 5 bit address (LSB-first), built once from the gates.
+DECODER5X32_TABLE:tuple[Bitx32, ...] = tuple(decoder5x32(*int_to_bits(address, 5)) for address in range(32))
+
+# Register index for every 5 bit address, the same as
+# one_hot_to_decimal(decoder5x32(*address)) without evaluating any gates.
+REGISTER_INDEX:dict[Bitx5, int] = {
+    int_to_bits(address, 5): DECODER5X32_TABLE[address].index(1) for address in range(32)
+}
+
+def decoder5x32_table(data_0: Bit, data_1: Bit, data_2: Bit, data_3: Bit, data_4: Bit) -> Bitx32:
+    """
+    Table lookup version of decoder5x32 with power on.
+    """
+    return DECODER5X32_TABLE[data_0 | (data_1 << 1) | (data_2 << 2) | (data_3 << 3) | (data_4 << 4)]
+
 def one_hot_to_decimal(one_hot:tuple[Bit,...]) -> int:
     for b_n, bit in enumerate(one_hot):
         if bit:
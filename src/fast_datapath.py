@@ -0,0 +1,144 @@
+from datapath import DataPath
+from fpu import MODE_FLOAT
+from memory import MASK32
+from decoded_instruction import SRC1_INT_RS1, SRC1_PC, SRC1_READ_DATA_1, SRC1_ZERO
+from step_trace import TraceSink
+
+class FastDataPath(DataPath):
+    """
+    Functional execution engine.
+
+    Runs the same RV32I/RV32F semantics as the gate-level DataPath and
+    exposes the same architectural state (pc, register files, memory),
+    but works on packed ints with native integer arithmetic instead of
+    routing values through gates.py.  Each instruction memory slot goes
+    through the control unit and ALU/FPU controls once, on its first
+    fetch, so both engines always agree and each step only dispatches.
+
+    Speedup target: at least 100x the instructions per second of the
+    gate-level DataPath on the programs in tests/test_data/asm.
+
+    When any of the show_* flags are set each step falls back to the
+    packed DataPath step so the printed output is identical.
+    """
+
+    deadline_interval = 4096
+
+    def __init__(self,
+            show_immediate_values:bool = False,
+            show_rv32i_registers:bool = False,
+            show_rv32f_registers:bool = False,
+            show_step:bool = False,
+            show_memory:bool = False,
+            show_reads:bool = False,
+            show_writes:bool = False,
+            memory_image:str|None = None,
+            unified_memory:bool = False,
+            trace:TraceSink|None = None,
+            post_mortem_size:int = 64,
+            post_mortem_path:str|None = None,
+            profile:bool = False,
+            fpu_mode:str = MODE_FLOAT
+        ):
+        super().__init__(
+            show_immediate_values,
+            show_rv32i_registers,
+            show_rv32f_registers,
+            show_step,
+            show_memory,
+            show_reads,
+            show_writes,
+            packed_words=True,
+            memory_image=memory_image,
+            unified_memory=unified_memory,
+            trace=trace,
+            post_mortem_size=post_mortem_size,
+            post_mortem_path=post_mortem_path,
+            profile=profile,
+            fpu_mode=fpu_mode
+        )
+        self.displaying = show_step or show_reads or show_writes
+
+    def execute(self) -> bool:
+        if self.displaying:
+            return super().execute()
+
+        pc = self.pc.value
+        instruction_memory = self.instruction_memory
+        decoded = instruction_memory.get_decoded(pc)
+        if decoded is None:
+            return False
+
+        int_registers = self.rv32i_register_file.registers
+        float_registers = self.rv32f_register_file.registers
+
+        if decoded.RegFileSel:
+            read_data_1 = float_registers[decoded.rs1]
+            read_data_2 = float_registers[decoded.rs2]
+        else:
+            read_data_1 = int_registers[decoded.rs1]
+            read_data_2 = int_registers[decoded.rs2]
+
+        if decoded.fpu_op is not None:
+            result = self.fpu.update_word(decoded.fpu_op, read_data_1, read_data_2)[1]
+        else:
+            src1 = decoded.src1
+            if src1 == SRC1_READ_DATA_1:
+                alu_src1 = read_data_1
+            elif src1 == SRC1_ZERO:
+                alu_src1 = 0
+            elif src1 == SRC1_PC:
+                alu_src1 = pc
+            else:
+                alu_src1 = int_registers[decoded.rs1]
+            imm = decoded.imm
+            result = decoded.alu_function(alu_src1, read_data_2 if imm is None else imm)
+
+        # Memory access and write back
+        address = result
+        if decoded.Jump:
+            # Link register
+            result = (pc + 4) & MASK32
+        if decoded.MemRead:
+            mem_data = self.memory.read_word(address)
+            if decoded.MemToReg:
+                result = mem_data
+        if decoded.MemWrite:
+            self.memory.write_word(address, read_data_2)
+            if instruction_memory.shared is not None and instruction_memory.base - 4 < address < instruction_memory.text_end:
+                self.invalidate(address, address + 4)
+
+        rd = decoded.rd
+        if decoded.FPRegWrite:
+            float_registers[rd] = result
+        elif decoded.RegWrite and rd != 0:
+            int_registers[rd] = result
+
+        if decoded.FPToInt and rd != 0:
+            int_registers[rd] = result
+        elif decoded.IntToFP:
+            float_registers[rd] = result
+
+        post_mortem = self.post_mortem
+        if post_mortem is not None:
+            # PostMortemBuffer.record written out, the call costs more than the stores
+            slot = self.step_count & post_mortem.mask
+            post_mortem.pcs[slot] = pc
+            post_mortem.instructions[slot] = decoded.word
+            post_mortem.values[slot] = read_data_2 if decoded.MemWrite else result
+            post_mortem.addresses[slot] = address
+
+        # Branch and jump logic, the zero flag is the execution result being 0
+        if decoded.JumpReg:
+            self.pc.value = address & ~1
+        elif decoded.Jump:
+            self.pc.value = (pc + decoded.jump_offset) & MASK32
+        elif decoded.Branch and (address != 0) == decoded.BranchNotZero:
+            self.pc.value = (pc + decoded.branch_offset) & MASK32
+        else:
+            self.pc.value = (pc + 4) & MASK32
+
+        self.step_count += 1
+        if decoded.System:
+            return not self.system_halts(decoded.word)
+        return True
@@ -0,0 +1,239 @@
+"""
+Fork server.
+
+Loads a program once, runs it to its first ecall or ebreak (the end of
+its init phase) and then forks a child per input.  Each child starts from
+the warm interpreter and machine state through the OS's copy on write, so
+imports, assembly, block translation and the init phase are paid once:
+
+    riscv-fork-server program.asm inputs/ --max_steps 100000 > results.jsonl
+
+A child writes its input into guest memory as a little endian length
+word at the input address followed by the input bytes, resumes the run
+and reports the result back over a pipe.
+"""
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+import argparse
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+
+from batch import ENGINES, load_source, memory_digest
+from datapath import EXIT_EBREAK, EXIT_ECALL, EXIT_ERROR, EXIT_TIMEOUT, DataPath
+from mapped_memory import MappedMemory
+
+# Where a child writes its input, the length word comes first
+DEFAULT_INPUT_ADDRESS = 0x0100_0000
+
+# Warm up stops on these
+MARKERS = (EXIT_ECALL, EXIT_EBREAK)
+
+# Wall time in seconds after which the parent kills a child that hasn't
+# reported, whatever limits the child runs with
+DEFAULT_KILL_AFTER = 60.0
+
+
+@dataclass
+class ForkResult:
+    exit_reason:str
+    step_count:int
+    pc:int
+    rv32i_registers:list[int]
+    rv32f_registers:list[int]
+    # sha256 of the non zero memory bytes, the same digest as riscv-batch
+    memory_digest:str
+    seconds:float
+    error:str|None = None
+
+
+class ForkServer:
+    """
+    Runs inputs in forked children of a warmed up DataPath.  The DataPath
+    itself never runs past the marker, so every child starts from the
+    same state.
+    """
+
+    def __init__(self,
+            dp:DataPath,
+            input_address:int = DEFAULT_INPUT_ADDRESS,
+            max_steps:int|None = None,
+            timeout:float|None = None,
+            halt_on_ecall:bool = False,
+            kill_after:float|None = DEFAULT_KILL_AFTER
+        ):
+        """
+        max_steps, timeout and halt_on_ecall limit each child's run after
+        the marker, as in DataPath.run.
+
+        kill_after is the parent's own deadline per child in seconds of
+        wall time, a child that hasn't reported by then is killed and
+        reported as EXIT_TIMEOUT.  None waits for as long as it takes.
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("The fork server needs os.fork, which this platform does not have")
+        if isinstance(dp.memory.memory, MappedMemory):
+            raise ValueError("The fork server can't use a memory image, the children would all write to the same mapped file")
+        self.dp = dp
+        self.input_address = input_address
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.halt_on_ecall = halt_on_ecall
+        self.kill_after = kill_after
+
+    def warm_up(self, max_steps:int|None = None, timeout:float|None = None) -> DataPath.ExitStatus:
+        """
+        Runs the program to its first ecall or ebreak.  Raises
+        RuntimeError if it stops anywhere else.
+        """
+        status = self.dp.run(max_steps, timeout, halt_on_ecall=True)
+        if status.reason not in MARKERS:
+            raise RuntimeError(f"The program stopped on {status.reason} at pc 0x{status.pc:08X} before reaching an ecall or ebreak")
+        return status
+
+    def execute(self, data:bytes) -> ForkResult:
+        """
+        Runs one input on self.dp, in the child.
+        """
+        dp = self.dp
+        start = time.perf_counter()
+        error = None
+        try:
+            dp.memory.memory.write_bytes(self.input_address, struct.pack("<I", len(data)) + data)
+            exit_reason = dp.run(self.max_steps, self.timeout, self.halt_on_ecall).reason
+        except Exception as e:
+            exit_reason = EXIT_ERROR
+            error = f"{type(e).__name__}: {e}"
+        state = dp.state()
+        return ForkResult(
+            exit_reason,
+            dp.step_count,
+            state.pc,
+            list(state.rv32i_registers),
+            list(state.rv32f_registers),
+            memory_digest(dp),
+            time.perf_counter() - start,
+            error
+        )
+
+    def run(self, data:bytes) -> ForkResult:
+        """
+        Runs one input in a forked child and returns its result.  A child
+        that dies without reporting is an EXIT_ERROR result, one that
+        doesn't report within kill_after seconds is killed and is an
+        EXIT_TIMEOUT result.
+        """
+        start = time.perf_counter()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # The child must never return into the caller's code
+            status = 1
+            try:
+                os.close(read_fd)
+                with os.fdopen(write_fd, "wb") as fp:
+                    fp.write(json.dumps(asdict(self.execute(data))).encode())
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        try:
+            payload = self.receive(read_fd, start)
+        finally:
+            os.close(read_fd)
+        if payload is None:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            return ForkResult(
+                EXIT_TIMEOUT, 0, 0, [], [], "", time.perf_counter() - start,
+                f"The child was killed after {self.kill_after} seconds without a result"
+            )
+        _, wait_status = os.waitpid(pid, 0)
+        if not payload:
+            return ForkResult(
+                EXIT_ERROR, 0, 0, [], [], "", time.perf_counter() - start,
+                f"The child exited with status {os.waitstatus_to_exitcode(wait_status)} without a result"
+            )
+        return ForkResult(**json.loads(payload))
+
+    def receive(self, read_fd:int, start:float) -> bytes|None:
+        """
+        Reads the child's result until it closes the pipe, None if that
+        doesn't happen within kill_after seconds of start.
+        """
+        chunks:list[bytes] = []
+        while True:
+            if self.kill_after is None:
+                remaining = None
+            else:
+                remaining = start + self.kill_after - time.perf_counter()
+                if remaining <= 0:
+                    return None
+            if not select.select([read_fd], [], [], remaining)[0]:
+                return None
+            chunk = os.read(read_fd, 1 << 16)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def run_all(self, inputs:Iterable[bytes]) -> Iterator[ForkResult]:
+        for data in inputs:
+            yield self.run(data)
+
+
+def find_inputs(paths:list[str]) -> list[Path]:
+    """
+    The given files, with every file in a given directory in name order.
+    """
+    inputs:list[Path] = []
+    for path in map(Path, paths):
+        inputs.extend(sorted(child for child in path.iterdir() if child.is_file()) if path.is_dir() else [path])
+    return inputs
+
+
+def write_results(inputs:list[Path], results:Iterable[ForkResult], output:TextIO):
+    for path, result in zip(inputs, results):
+        output.write(json.dumps({"input": str(path), **asdict(result)}) + "\n")
+        output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs a program to its first ecall or ebreak once, then forks a child per input file from that state and writes one JSON Lines result per input.",
+        usage="riscv-fork-server {program file} {input files or directories} [--max_steps N] [--timeout seconds]"
+    )
+    parser.add_argument("source", help="Path to input assembly, hex, flat binary (.bin) or RV32 ELF file.")
+    parser.add_argument("inputs", nargs="+", help="Input files, or directories of input files, to run one child each.")
+    parser.add_argument("--engine", choices=list(ENGINES), default="block", help="Execution engine.")
+    parser.add_argument("--input_address", type=lambda value: int(value, 0), default=DEFAULT_INPUT_ADDRESS, help="Guest address of the input length word, the input bytes follow it.")
+    parser.add_argument("--max_steps", type=int, default=None, help="Instruction budget of each child after the marker.")
+    parser.add_argument("--timeout", type=float, default=None, help="Wall time limit of each child in seconds.")
+    parser.add_argument("--halt_on_ecall", action="store_true", help="Flag to stop the children at their next ecall or ebreak.")
+    parser.add_argument("--kill_after", type=float, default=DEFAULT_KILL_AFTER, help="Seconds of wall time after which a child that hasn't reported is killed, whatever its other limits.")
+    parser.add_argument("-o", "--output", default=None, help="Path to write the results to, standard output by default.")
+    args = parser.parse_args()
+
+    dp = ENGINES[args.engine](post_mortem_size=0)
+    load_source(dp, args.source)
+    server = ForkServer(dp, args.input_address, args.max_steps, args.timeout, args.halt_on_ecall, args.kill_after)
+    try:
+        server.warm_up()
+    except RuntimeError as error:
+        parser.exit(1, f"{error}\n")
+    inputs = find_inputs(args.inputs)
+    results = server.run_all(path.read_bytes() for path in inputs)
+    if args.output is None:
+        write_results(inputs, results, sys.stdout)
+    else:
+        with open(args.output, "w") as fp:
+            write_results(inputs, results, fp)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,52 @@
-from memory import Bit, Bits, Bitx32, Bitx5, bin_to_dec, dec_to_bin, hex_to_bin, shift_left, shift_right, sign_extend
+from memory import Bit, Bits, Bitx32, Bitx5, Word, bin_to_dec, bits_to_uint32, dec_to_bin, hex_to_bin, int_to_bits, shift_left, shift_right, sign_extend
 from rv32i_alu import RV32IALU
 
 import fpu_control as fc
 import gates as g
 
+import struct
+
 
 BIAS = 127
 MANTISSA_BITS = 23
 EXP_BITS = 8
 SIGN_BIT = 1
 
+# FPU modes
+MODE_REFERENCE = "reference" # Field by field integer algorithm
+MODE_FLOAT = "float" # Host floats through struct bit casts for normal numbers
+
+# Bit casts between two words and the single precision floats they hold,
+# and from a double to its bits
+WORD_PAIR = struct.Struct("<2I")
+FLOAT_PAIR = struct.Struct("<2f")
+DOUBLE = struct.Struct("<d")
+DOUBLE_BITS = struct.Struct("<Q")
+
+# Difference between the double and single precision exponent biases
+DOUBLE_BIAS_OFFSET = 1023 - BIAS
+
 class FPU:
-    def __init__(self):
-        pass
+    def __init__(self, mode: str = MODE_FLOAT):
+        """
+        mode selects how the arithmetic is computed, both modes match bit
+        for bit.  'float' runs normal operands through host floats and
+        falls back to the 'reference' algorithm for zeros, subnormals,
+        infinities, NaNs and results outside the normal range.
+        """
+        if mode not in (MODE_REFERENCE, MODE_FLOAT):
+            raise ValueError(f"Unknown FPU mode '{mode}', expected '{MODE_REFERENCE}' or '{MODE_FLOAT}'")
+        self.mode = mode
     
     def update(self, operation: Bitx5, read_data_1: Bitx32, read_data_2: Bitx32) -> tuple[Bit, Bitx32]:
         """
         Returns Zero bit signal and 32-bit FPU result.
         Zero bit is 1 for comparison operations that are true.
         """
+        if self.mode == MODE_FLOAT:
+            zero, res = self.update_word(operation, bits_to_uint32(read_data_1), bits_to_uint32(read_data_2))
+            return zero, int_to_bits(res, 32)
+
         match operation:
             case fc.CTRL_FPU_ADD:
                 return self.op_add(read_data_1, read_data_2)
@@ -28,6 +56,23 @@ class FPU:
                 return self.op_mul(read_data_1, read_data_2)
             case _:
                 raise RuntimeError(f"FPU Operation not supported {operation}")
+
+    def update_word(self, operation: Bitx5, read_data_1: Word, read_data_2: Word) -> tuple[Bit, Word]:
+        """
+        Packed word version of update.
+        Returns Zero bit signal and 32-bit FPU result as an unsigned int.
+        """
+        fast = self.mode == MODE_FLOAT
+        match operation:
+            case fc.CTRL_FPU_ADD:
+                res = self.op_add_float(read_data_1, read_data_2) if fast else self.op_add_word(read_data_1, read_data_2)
+            case fc.CTRL_FPU_SUB:
+                res = self.op_sub_float(read_data_1, read_data_2) if fast else self.op_sub_word(read_data_1, read_data_2)
+            case fc.CTRL_FPU_MUL:
+                res = self.op_mul_float(read_data_1, read_data_2) if fast else self.op_mul_word(read_data_1, read_data_2)
+            case _:
+                raise RuntimeError(f"FPU Operation not supported {operation}")
+        return int(res == 0), res
     
     @staticmethod
     def compute_zero(res: Bitx32) -> Bit:
@@ -60,21 +105,49 @@ class FPU:
         result = mantissa_bits + exp_bits + sign_bit
         return result
 
+    @staticmethod
+    def extract_fields_word(word: Word) -> tuple[int, int, int]:
+        return word >> 31, (word >> 23) & 0xFF, word & 0x7FFFFF
+
+    @staticmethod
+    def pack_fields_word(sign: int, exponent: int, mantissa: int) -> Word:
+        # Same clamping as pack_fields
+        sign = 1 if sign else 0
+        exponent = max(0, min(255, exponent))
+        return (sign << 31) | (exponent << 23) | (mantissa & 0x7FFFFF)
+
+    # The bit tuple operations convert at the edges and share the packed algorithm.
+
     @classmethod
     def op_add(cls, read_data_1: Bitx32, read_data_2: Bitx32) -> tuple[Bit, Bitx32]:
-        sign1, exp1, mant1 = cls.extract_fields(read_data_1)
-        sign2, exp2, mant2 = cls.extract_fields(read_data_2)
+        res = cls.op_add_word(bits_to_uint32(read_data_1), bits_to_uint32(read_data_2))
+        return int(res == 0), int_to_bits(res, 32)
+
+    @classmethod
+    def op_sub(cls, read_data_1: Bitx32, read_data_2: Bitx32) -> tuple[Bit, Bitx32]:
+        res = cls.op_sub_word(bits_to_uint32(read_data_1), bits_to_uint32(read_data_2))
+        return int(res == 0), int_to_bits(res, 32)
+
+    @classmethod
+    def op_mul(cls, read_data_1: Bitx32, read_data_2: Bitx32) -> tuple[Bit, Bitx32]:
+        res = cls.op_mul_word(bits_to_uint32(read_data_1), bits_to_uint32(read_data_2))
+        return int(res == 0), int_to_bits(res, 32)
+
+    @classmethod
+    def op_add_word(cls, read_data_1: Word, read_data_2: Word) -> Word:
+        sign1, exp1, mant1 = cls.extract_fields_word(read_data_1)
+        sign2, exp2, mant2 = cls.extract_fields_word(read_data_2)
         
         # Handle special cases: zero, infinity, NaN
         if exp1 == 0 and mant1 == 0:
-            return cls.compute_zero(read_data_2), read_data_2
+            return read_data_2
         if exp2 == 0 and mant2 == 0:
-            return cls.compute_zero(read_data_1), read_data_1
+            return read_data_1
         if exp1 == 255 or exp2 == 255:
             if exp1 == 255:
-                return cls.compute_zero(read_data_1), read_data_1
+                return read_data_1
             else:
-                return cls.compute_zero(read_data_2), read_data_2
+                return read_data_2
         
         # Implicit 1
         if exp1 == 0:
@@ -117,8 +190,8 @@ class FPU:
         
         # Handle zero
         if sig_result == 0:
-            result = cls.pack_fields(0, 0, 0)
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(0, 0, 0)
+            return result
         
         # Normalize: shift left until bit 23 is set
         while sig_result < (1 << 23) and exp_result > 0:
@@ -132,43 +205,43 @@ class FPU:
         
         # Check for overflow
         if exp_result >= 255:
-            result = cls.pack_fields(sign_result, 255, 0)  # Infinity
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(sign_result, 255, 0)  # Infinity
+            return result
         
         # Check for underflow
         if exp_result <= 0:
-            result = cls.pack_fields(sign_result, 0, 0)  # Zero
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(sign_result, 0, 0)  # Zero
+            return result
         
         # Remove implicit 1 and pack
         mant_result = sig_result & 0x7FFFFF
-        result = cls.pack_fields(sign_result, exp_result, mant_result)
-        return cls.compute_zero(result), result
+        result = cls.pack_fields_word(sign_result, exp_result, mant_result)
+        return result
         
     @classmethod
-    def op_sub(cls, read_data_1: Bitx32, read_data_2: Bitx32) -> tuple[Bit, Bitx32]:
+    def op_sub_word(cls, read_data_1: Word, read_data_2: Word) -> Word:
         # Flip the sign of the second operand
-        sign2, exp2, mant2 = cls.extract_fields(read_data_2)
-        flipped = cls.pack_fields(1 - sign2, exp2, mant2)
-        return cls.op_add(read_data_1, flipped)
+        sign2, exp2, mant2 = cls.extract_fields_word(read_data_2)
+        flipped = cls.pack_fields_word(1 - sign2, exp2, mant2)
+        return cls.op_add_word(read_data_1, flipped)
     
     @classmethod
-    def op_mul(cls, read_data_1: Bitx32, read_data_2: Bitx32) -> tuple[Bit, Bitx32]:
-        sign1, exp1, mant1 = cls.extract_fields(read_data_1)
-        sign2, exp2, mant2 = cls.extract_fields(read_data_2)
+    def op_mul_word(cls, read_data_1: Word, read_data_2: Word) -> Word:
+        sign1, exp1, mant1 = cls.extract_fields_word(read_data_1)
+        sign2, exp2, mant2 = cls.extract_fields_word(read_data_2)
         
         sign_result = sign1 ^ sign2
         
         # Special cases
         if (exp1 == 0 and mant1 == 0) or (exp2 == 0 and mant2 == 0):
             # Zero
-            result = cls.pack_fields(sign_result, 0, 0)
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(sign_result, 0, 0)
+            return result
         
         if exp1 == 255 or exp2 == 255:
             # Infinity or NaN
-            result = cls.pack_fields(sign_result, 255, 0)
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(sign_result, 255, 0)
+            return result
         
         # Implicit 1 for normalized numbers
         if exp1 == 0:
@@ -200,15 +273,70 @@ class FPU:
         
         # Check for overflow
         if exp_result >= 255:
-            result = cls.pack_fields(sign_result, 255, 0)  # Infinity
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(sign_result, 255, 0)  # Infinity
+            return result
         
         # Check for underflow
         if exp_result <= 0:
-            result = cls.pack_fields(sign_result, 0, 0) # Zero
-            return cls.compute_zero(result), result
+            result = cls.pack_fields_word(sign_result, 0, 0) # Zero
+            return result
         
         # Remove implicit 1 and pack result
         mant_result = sig_result & 0x7FFFFF
-        result = cls.pack_fields(sign_result, exp_result, mant_result)
-        return cls.compute_zero(result), result
\ No newline at end of file
+        result = cls.pack_fields_word(sign_result, exp_result, mant_result)
+        return result
+
+    # The float operations compute exactly in doubles and truncate toward
+    # zero when casting back, which is how the reference rounds.
+
+    @staticmethod
+    def double_to_word(value: float) -> Word|None:
+        """
+        The single precision pattern of a double truncated toward zero,
+        None if it isn't a normal single precision number.
+        """
+        bits = DOUBLE_BITS.unpack(DOUBLE.pack(value))[0]
+        exponent = ((bits >> 52) & 0x7FF) - DOUBLE_BIAS_OFFSET
+        if 0 < exponent < 255:
+            return (bits >> 63) << 31 | exponent << 23 | (bits >> 29) & 0x7FFFFF
+        return None
+
+    @classmethod
+    def op_add_float(cls, read_data_1: Word, read_data_2: Word) -> Word:
+        exp1 = (read_data_1 >> 23) & 0xFF
+        exp2 = (read_data_2 >> 23) & 0xFF
+        if 0 < exp1 < 255 and 0 < exp2 < 255:
+            # The reference truncates the smaller operand while aligning it,
+            # clearing the same mantissa bits keeps the sum exact in a double
+            word1, word2 = read_data_1, read_data_2
+            shift = exp1 - exp2
+            if shift > 0:
+                if shift > MANTISSA_BITS:
+                    return read_data_1
+                word2 = word2 >> shift << shift
+            elif shift < 0:
+                if shift < -MANTISSA_BITS:
+                    return read_data_2
+                word1 = word1 >> -shift << -shift
+            value1, value2 = FLOAT_PAIR.unpack(WORD_PAIR.pack(word1, word2))
+            res = cls.double_to_word(value1 + value2)
+            if res is not None:
+                return res
+        return cls.op_add_word(read_data_1, read_data_2)
+
+    @classmethod
+    def op_sub_float(cls, read_data_1: Word, read_data_2: Word) -> Word:
+        # Flip the sign of the second operand
+        return cls.op_add_float(read_data_1, read_data_2 ^ 0x80000000)
+
+    @classmethod
+    def op_mul_float(cls, read_data_1: Word, read_data_2: Word) -> Word:
+        exp1 = (read_data_1 >> 23) & 0xFF
+        exp2 = (read_data_2 >> 23) & 0xFF
+        if 0 < exp1 < 255 and 0 < exp2 < 255:
+            # A product of two 24-bit significands fits a double's 53
+            value1, value2 = FLOAT_PAIR.unpack(WORD_PAIR.pack(read_data_1, read_data_2))
+            res = cls.double_to_word(value1 * value2)
+            if res is not None:
+                return res
+        return cls.op_mul_word(read_data_1, read_data_2)
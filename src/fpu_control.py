@@ -1,4 +1,5 @@
-from memory import Bitx2, Bitx5, Bitx7, Bitx3
+from memory import Bitx2, Bitx5, Bitx7, Bitx3, int_to_bits
+from rv32i_alu_control import FUNCT3_BITS
 
 # FPU Control signals (5-bit tuples)
 CTRL_FPU_ADD = (0, 0, 0, 0, 0)
@@ -22,19 +23,24 @@ CTRL_FPU_MV_X_W = (1, 1, 1, 0, 0)
 CTRL_FPU_MV_W_X = (1, 1, 1, 0, 1)
 CTRL_FPU_CLASS = (1, 1, 1, 1, 0)
 
-# funct7 values for RV32F instructions
-FUNCT7_FADD = (0, 0, 0, 0, 0, 0, 0)
-FUNCT7_FSUB = (0, 0, 0, 0, 1, 0, 0)
-FUNCT7_FMUL = (0, 0, 0, 1, 0, 0, 0)
-FUNCT7_FDIV = (0, 0, 0, 1, 1, 0, 0)
-FUNCT7_FSQRT = (0, 1, 0, 1, 1, 0, 0)
-FUNCT7_FSGNJ = (0, 0, 1, 0, 0, 0, 0)
-FUNCT7_FMIN_MAX = (0, 0, 1, 0, 1, 0, 0)
-FUNCT7_FCMP = (0, 1, 0, 1, 0, 0, 0)
-FUNCT7_FCVT_W = (0, 0, 0, 0, 0, 1, 1)
-FUNCT7_FCVT_S = (0, 0, 0, 1, 0, 1, 1)
-FUNCT7_FMV_X_W = (0, 0, 0, 1, 1, 1, 1)
-FUNCT7_FCLASS = (0, 0, 0, 1, 1, 1, 1)
+# funct7 values for RV32F instructions (LSB-first)
+FUNCT7_FADD = (0, 0, 0, 0, 0, 0, 0)      # 0000000
+FUNCT7_FSUB = (0, 0, 1, 0, 0, 0, 0)      # 0000100
+FUNCT7_FMUL = (0, 0, 0, 1, 0, 0, 0)      # 0001000
+FUNCT7_FDIV = (0, 0, 1, 1, 0, 0, 0)      # 0001100
+FUNCT7_FSQRT = (0, 0, 1, 1, 0, 1, 0)     # 0101100
+FUNCT7_FSGNJ = (0, 0, 0, 0, 1, 0, 0)     # 0010000
+FUNCT7_FMIN_MAX = (0, 0, 1, 0, 1, 0, 0)  # 0010100
+FUNCT7_FCMP = (0, 0, 0, 0, 1, 0, 1)      # 1010000
+FUNCT7_FCVT_W = (0, 0, 0, 0, 0, 1, 1)    # 1100000
+FUNCT7_FCVT_S = (0, 0, 0, 1, 0, 1, 1)    # 1101000
+FUNCT7_FMV_X_W = (0, 0, 0, 0, 1, 1, 1)   # 1110000, shared with fclass.s
+FUNCT7_FCLASS = FUNCT7_FMV_X_W
+FUNCT7_FMV_W_X = (0, 0, 0, 1, 1, 1, 1)   # 1111000
+
+# Every funct7 and rs2 value as an LSB-first tuple, indexed by its packed value.
+FUNCT7_BITS:tuple[Bitx7,...] = tuple(int_to_bits(funct7, 7) for funct7 in range(128))
+RS2_BITS:tuple[Bitx5,...] = tuple(int_to_bits(rs2, 5) for rs2 in range(32))
 
 
 class FPUControl:
@@ -100,15 +106,15 @@ class FPUControl:
             elif rs2 == (1, 0, 0, 0, 0):
                 return CTRL_FPU_CVT_S_WU
         
-        elif funct7 == FUNCT7_FMV_X_W:            
+        elif funct7 == FUNCT7_FMV_X_W:
             if funct3 == (0, 0, 0) and rs2 == (0, 0, 0, 0, 0):
                 return CTRL_FPU_MV_X_W
-        
-        elif funct7 == FUNCT7_FCLASS:
-            if funct3 == (1, 0, 0) and rs2 == (0, 0, 0, 0, 0):
-                return CTRL_FPU_MV_W_X
-            elif funct3 == (0, 0, 0) and rs2 == (0, 0, 0, 0, 0):
+            elif funct3 == (1, 0, 0) and rs2 == (0, 0, 0, 0, 0):
                 return CTRL_FPU_CLASS
+
+        elif funct7 == FUNCT7_FMV_W_X:
+            if funct3 == (0, 0, 0) and rs2 == (0, 0, 0, 0, 0):
+                return CTRL_FPU_MV_W_X
         
         raise RuntimeError(
             f"Unsupported FPUControl input:\n"
@@ -116,4 +122,10 @@ class FPUControl:
             f"funct7: {funct7}\n"
             f"funct3: {funct3}\n"
             f"rs2: {rs2}"
-        )
\ No newline at end of file
+        )
+
+    def update_word(self, ALUOp: Bitx2, funct7: int, funct3: int, rs2: int):
+        """
+        Same as update but takes packed funct7, funct3 and rs2 fields.
+        """
+        return self.update(ALUOp, FUNCT7_BITS[funct7 & 0x7F], FUNCT3_BITS[funct3 & 0x7], RS2_BITS[rs2 & 0x1F])
@@ -0,0 +1,412 @@
+"""
+Coverage guided fuzzer for the emulator's decode and execute paths.
+
+Generates programs of random valid RV32I/RV32F instruction words and runs
+them on the functional engine.  Coverage is the set of ControlUnit.decode
+branches (opcodes), RV32IALUControl outputs and FPUControl outputs of the
+instructions that executed.  A program that reaches new coverage joins
+the corpus and is cross-checked against the gate-level DataPath.  A
+program that crashes the emulator, or that the two engines disagree on,
+is shrunk to a minimal program and kept with its crash:
+
+    riscv-fuzz fuzz_dir --iterations 10000 --seed 1
+
+The fuzz directory holds corpus/ and crashes/ of flat binaries that
+riscv-sim runs directly, a text file with the error next to each crash,
+and coverage.json with how many programs reached each coverage point.
+"""
+from pathlib import Path
+from typing import Callable
+
+import argparse
+import hashlib
+import json
+import random
+
+from datapath import DataPath
+from decoded_instruction import DecodedInstruction
+from fast_datapath import FastDataPath
+from memory import Word
+from program_loader import words_from_bytes
+import control_unit as cu
+import fpu_control as fc
+import rv32i_alu_control as ac
+
+# Coverage point names by opcode and control output
+OPCODE_NAMES:dict[int, str] = {
+    value: name[len("OPCODE_"):-len("_WORD")].lower() for name, value in vars(cu).items() if name.startswith("OPCODE_") and name.endswith("_WORD")
+}
+ALU_NAMES:dict[tuple, str] = {value: name[len("CTRL_ALU_"):].lower() for name, value in vars(ac).items() if name.startswith("CTRL_ALU_")}
+FPU_NAMES:dict[tuple, str] = {value: name[len("CTRL_FPU_"):].lower() for name, value in vars(fc).items() if name.startswith("CTRL_FPU_")}
+
+# Every coverage point a program can reach
+COVERAGE_POINTS:tuple[str, ...] = (
+    tuple(f"decode:{name}" for name in OPCODE_NAMES.values())
+    + tuple(f"alu:{name}" for name in ALU_NAMES.values())
+    + tuple(f"fpu:{name}" for name in FPU_NAMES.values())
+)
+
+# Errors of the guest program rather than of the emulator
+GUEST_FAULTS = ("Memory address out of bounds",)
+
+NOP = 0x00000013
+
+
+## INSTRUCTION GENERATION
+
+def r_type(opcode:int, rd:int, funct3:int, rs1:int, rs2:int, funct7:int) -> Word:
+    return (funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def i_type(opcode:int, rd:int, funct3:int, rs1:int, imm:int) -> Word:
+    return ((imm & 0xFFF) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def s_type(opcode:int, funct3:int, rs1:int, rs2:int, imm:int) -> Word:
+    return (((imm >> 5) & 0x7F) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | ((imm & 0x1F) << 7) | opcode
+
+def b_type(funct3:int, rs1:int, rs2:int, imm:int) -> Word:
+    return (
+        (((imm >> 12) & 1) << 31) | (((imm >> 5) & 0x3F) << 25) | (rs2 << 20) | (rs1 << 15)
+        | (funct3 << 12) | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 1) << 7) | cu.OPCODE_BRANCH_WORD
+    )
+
+def j_type(rd:int, imm:int) -> Word:
+    return (
+        (((imm >> 20) & 1) << 31) | (((imm >> 1) & 0x3FF) << 21) | (((imm >> 11) & 1) << 20)
+        | (((imm >> 12) & 0xFF) << 12) | (rd << 7) | cu.OPCODE_JAL_WORD
+    )
+
+def funct7_word(funct7:tuple) -> int:
+    return sum(bit << i for i, bit in enumerate(funct7))
+
+# funct7, funct3 choices and rs2 choices of every RV32F operation, None is any
+FP_OPERATIONS:tuple[tuple[int, tuple[int, ...]|None, tuple[int, ...]|None], ...] = (
+    (funct7_word(fc.FUNCT7_FADD), None, None),
+    (funct7_word(fc.FUNCT7_FSUB), None, None),
+    (funct7_word(fc.FUNCT7_FMUL), None, None),
+    (funct7_word(fc.FUNCT7_FDIV), None, None),
+    (funct7_word(fc.FUNCT7_FSQRT), None, (0,)),
+    (funct7_word(fc.FUNCT7_FSGNJ), (0, 1, 2), None),
+    (funct7_word(fc.FUNCT7_FMIN_MAX), (0, 1), None),
+    (funct7_word(fc.FUNCT7_FCMP), (0, 1, 2), None),
+    (funct7_word(fc.FUNCT7_FCVT_W), None, (0, 1)),
+    (funct7_word(fc.FUNCT7_FCVT_S), None, (0, 1)),
+    (funct7_word(fc.FUNCT7_FMV_X_W), (0, 1), (0,)),
+    (funct7_word(fc.FUNCT7_FMV_W_X), (0,), (0,)),
+)
+
+# Rounding modes, 5 and 6 are reserved
+ROUNDING_MODES = (0, 1, 2, 3, 4, 7)
+
+
+def random_instruction(rng:random.Random, length:int) -> Word:
+    """
+    A random valid instruction of the RV32I/RV32F subset the emulator
+    decodes: word loads and stores, and jumps and branches that land on
+    an instruction of a program of the given length.
+    """
+    rd, rs1, rs2 = rng.randrange(32), rng.randrange(32), rng.randrange(32)
+    # Branch and jump targets on an instruction, up to one past the end
+    target = 4 * rng.randint(-length, length)
+    kind = rng.randrange(13)
+    if kind == 0:
+        funct3 = rng.randrange(8)
+        funct7 = rng.choice((0, 0x20)) if funct3 in (0, 5) else 0
+        return r_type(cu.OPCODE_R_TYPE_WORD, rd, funct3, rs1, rs2, funct7)
+    if kind == 1:
+        funct3 = rng.randrange(8)
+        if funct3 == 1:
+            return i_type(cu.OPCODE_I_TYPE_WORD, rd, funct3, rs1, rng.randrange(32))
+        if funct3 == 5:
+            return i_type(cu.OPCODE_I_TYPE_WORD, rd, funct3, rs1, rng.choice((0, 0x400)) | rng.randrange(32))
+        return i_type(cu.OPCODE_I_TYPE_WORD, rd, funct3, rs1, rng.randrange(4096))
+    if kind == 2:
+        return i_type(cu.OPCODE_LOAD_WORD, rd, 2, rs1, rng.randrange(4096))
+    if kind == 3:
+        return s_type(cu.OPCODE_STORE_WORD, 2, rs1, rs2, rng.randrange(4096))
+    if kind == 4:
+        return b_type(rng.choice((0, 1, 4, 5, 6, 7)), rs1, rs2, target)
+    if kind == 5:
+        return j_type(rd, target)
+    if kind == 6:
+        return i_type(cu.OPCODE_JALR_WORD, rd, 0, rs1, rng.randrange(4096))
+    if kind == 7:
+        return (rng.randrange(1 << 20) << 12) | (rd << 7) | rng.choice((cu.OPCODE_LUI_WORD, cu.OPCODE_AUIPC_WORD))
+    if kind == 8:
+        funct7, funct3s, rs2s = rng.choice(FP_OPERATIONS)
+        funct3 = rng.choice(funct3s) if funct3s is not None else rng.choice(ROUNDING_MODES)
+        return r_type(cu.OPCODE_FP_WORD, rd, funct3, rs1, rng.choice(rs2s) if rs2s is not None else rs2, funct7)
+    if kind == 9:
+        return i_type(cu.OPCODE_FLW_WORD, rd, 2, rs1, rng.randrange(4096))
+    if kind == 10:
+        return s_type(cu.OPCODE_FSW_WORD, 2, rs1, rs2, rng.randrange(4096))
+    if kind == 11:
+        return rng.choice((0x00000073, 0x00100073))
+    # fence
+    return 0x0FF0000F
+
+
+def random_program(rng:random.Random, length:int) -> list[Word]:
+    return [random_instruction(rng, length) for _ in range(length)]
+
+
+def mutate(rng:random.Random, words:list[Word]) -> list[Word]:
+    """
+    Replaces, inserts, deletes or swaps instructions of a corpus program.
+    """
+    words = list(words)
+    for _ in range(rng.randint(1, 4)):
+        choice = rng.randrange(4)
+        index = rng.randrange(len(words)) if words else 0
+        if choice == 0 and words:
+            words[index] = random_instruction(rng, len(words))
+        elif choice == 1 or not words:
+            words.insert(index, random_instruction(rng, len(words) + 1))
+        elif choice == 2 and len(words) > 1:
+            del words[index]
+        elif words:
+            other = rng.randrange(len(words))
+            words[index], words[other] = words[other], words[index]
+    return words
+
+
+## RUNNING
+
+def coverage_of(decoded:DecodedInstruction) -> list[str]:
+    points = [f"decode:{OPCODE_NAMES[decoded.opcode]}"]
+    if decoded.alu_op is not None:
+        points.append(f"alu:{ALU_NAMES[decoded.alu_op]}")
+    if decoded.fpu_op is not None:
+        points.append(f"fpu:{FPU_NAMES[decoded.fpu_op]}")
+    return points
+
+
+def run_program(engine:Callable[[], DataPath], words:list[Word], max_steps:int) -> tuple[DataPath, str|None]:
+    """
+    Runs the program within max_steps, returns the DataPath and the
+    error it raised as "{type}: {message}", None if it didn't raise.
+    """
+    dp = engine()
+    dp.load_program([f"{word:08X}" for word in words])
+    try:
+        dp.run(max_steps)
+    except Exception as e:
+        return dp, f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+    return dp, None
+
+
+def program_id(words:list[Word]) -> str:
+    return hashlib.sha1(program_bytes(words)).hexdigest()[:16]
+
+
+def program_bytes(words:list[Word]) -> bytes:
+    return b"".join(word.to_bytes(4, "little") for word in words)
+
+
+class Fuzzer:
+    """
+    Fuzzing campaign state, kept in a directory between campaigns.
+    """
+
+    def __init__(self,
+            directory:str,
+            seed:int|None = None,
+            max_steps:int = 200,
+            program_length:int = 16,
+            engine:Callable[[], DataPath] = lambda: FastDataPath(post_mortem_size=0),
+            reference:Callable[[], DataPath]|None = lambda: DataPath(post_mortem_size=0),
+            cross_check_rate:float = 0.05
+        ):
+        """
+        engine runs every program, reference (None to turn it off)
+        cross-checks every program that reaches new coverage and a
+        cross_check_rate fraction of the others.
+        """
+        self.directory = Path(directory)
+        self.rng = random.Random(seed)
+        self.max_steps = max_steps
+        self.program_length = program_length
+        self.engine = engine
+        self.reference = reference
+        self.cross_check_rate = cross_check_rate
+        self.coverage:dict[str, int] = {}
+        self.corpus:list[list[Word]] = []
+        # Shrunk program and error of every crash by its signature
+        self.crashes:dict[str, list[Word]] = {}
+        self.executions = 0
+        self.load()
+
+    def load(self):
+        coverage_path = self.directory / "coverage.json"
+        if coverage_path.exists():
+            self.coverage = json.loads(coverage_path.read_text())
+        for path in sorted((self.directory / "corpus").glob("*.bin")):
+            self.corpus.append(words_from_bytes(path.read_bytes()))
+        for path in sorted((self.directory / "crashes").glob("*.bin")):
+            self.crashes[path.with_suffix(".txt").read_text().strip()] = words_from_bytes(path.read_bytes())
+
+    def save_coverage(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / "coverage.json").write_text(json.dumps(dict(sorted(self.coverage.items())), indent=2))
+
+    def add_to_corpus(self, words:list[Word]):
+        self.corpus.append(words)
+        corpus = self.directory / "corpus"
+        corpus.mkdir(parents=True, exist_ok=True)
+        (corpus / f"{program_id(words)}.bin").write_bytes(program_bytes(words))
+
+    def add_crash(self, signature:str, words:list[Word]):
+        self.crashes[signature] = words
+        crashes = self.directory / "crashes"
+        crashes.mkdir(parents=True, exist_ok=True)
+        name = hashlib.sha1(signature.encode()).hexdigest()[:16]
+        (crashes / f"{name}.bin").write_bytes(program_bytes(words))
+        (crashes / f"{name}.txt").write_text(signature + "\n")
+
+    def execute(self, words:list[Word], cross_check:bool = False) -> tuple[set[str], str|None]:
+        """
+        Runs one program, returns the coverage it reached and its crash
+        signature, None when it ran fine.
+        """
+        dp, error = self.run(words)
+        return self.run_coverage(dp), self.signature(words, dp, error, cross_check)
+
+    def run(self, words:list[Word]) -> tuple[DataPath, str|None]:
+        self.executions += 1
+        return run_program(self.engine, words, self.max_steps)
+
+    @staticmethod
+    def run_coverage(dp:DataPath) -> set[str]:
+        return {point for decoded in dp.instruction_memory.decoded if decoded is not None for point in coverage_of(decoded)}
+
+    def signature(self, words:list[Word], dp:DataPath, error:str|None, cross_check:bool) -> str|None:
+        """
+        The crash signature of a run of words on the engine, cross_check
+        also compares it with a run on the reference engine.
+        """
+        if error is not None and not error.split(": ", 1)[-1].startswith(GUEST_FAULTS):
+            return error
+        if cross_check and self.reference is not None:
+            return self.cross_check(words, dp, error)
+        return None
+
+    def cross_check(self, words:list[Word], dp:DataPath, error:str|None) -> str|None:
+        """
+        Runs the program on the reference engine and names what differs
+        from dp, None when they agree.
+        """
+        reference, reference_error = run_program(self.reference, words, self.max_steps)
+        if reference_error != error:
+            return f"mismatch: error {error} on the engine, {reference_error} on the reference"
+        state, reference_state = dp.state(), reference.state()
+        for field in ("pc", "rv32i_registers", "rv32f_registers", "memory"):
+            if getattr(state, field) != getattr(reference_state, field):
+                return f"mismatch: {field}"
+        if dp.step_count != reference.step_count:
+            return "mismatch: step_count"
+        return None
+
+    def crash_signature(self, words:list[Word], cross_check:bool) -> str|None:
+        return self.execute(words, cross_check)[1]
+
+    def shrink(self, words:list[Word], signature:str) -> list[Word]:
+        """
+        Removes chunks of instructions, halving the chunk size down to
+        single instructions, then replaces the remaining instructions
+        with nops, keeping every change that still crashes the same way.
+        Both passes repeat until neither changes the program, a nop can
+        make an instruction it stood in for removable.
+        """
+        cross_check = signature.startswith("mismatch")
+        still_crashes = lambda candidate: self.crash_signature(candidate, cross_check) == signature
+        while True:
+            shrunk = words
+            chunk = max(len(words) // 2, 1)
+            while True:
+                index = 0
+                while index < len(words):
+                    candidate = words[:index] + words[index + chunk:]
+                    if candidate and still_crashes(candidate):
+                        words = candidate
+                    else:
+                        index += chunk
+                if chunk == 1:
+                    break
+                chunk //= 2
+            for index, word in enumerate(words):
+                if word != NOP and still_crashes(words[:index] + [NOP] + words[index + 1:]):
+                    words = words[:index] + [NOP] + words[index + 1:]
+            if words == shrunk:
+                return words
+
+    def fuzz_one(self, words:list[Word]) -> str|None:
+        """
+        Runs one program, keeps it when it reaches new coverage and
+        shrinks and keeps it when it is a new crash.  Returns its crash
+        signature.
+        """
+        dp, error = self.run(words)
+        coverage = self.run_coverage(dp)
+        signature = self.signature(words, dp, error, False)
+        new = coverage - self.coverage.keys()
+        for point in coverage:
+            self.coverage[point] = self.coverage.get(point, 0) + 1
+        if signature is None and (new or self.rng.random() < self.cross_check_rate):
+            # The gate-level engine is slow, cross-check the programs that
+            # do something new and a sample of the others, against the run
+            # that just happened
+            signature = self.signature(words, dp, error, True)
+            if signature is None and new:
+                self.add_to_corpus(words)
+        if signature is not None and signature not in self.crashes:
+            self.add_crash(signature, self.shrink(words, signature))
+        return signature
+
+    def fuzz(self, iterations:int) -> int:
+        """
+        Runs iterations programs, mutated from the corpus or new when the
+        corpus is empty or at random, and returns the number of new crashes.
+        """
+        known = len(self.crashes)
+        for _ in range(iterations):
+            if self.corpus and self.rng.random() < 0.8:
+                words = mutate(self.rng, self.rng.choice(self.corpus))
+            else:
+                words = random_program(self.rng, self.program_length)
+            self.fuzz_one(words)
+        self.save_coverage()
+        return len(self.crashes) - known
+
+    def report(self) -> str:
+        reached = [point for point in COVERAGE_POINTS if point in self.coverage]
+        missing = [point for point in COVERAGE_POINTS if point not in self.coverage]
+        lines = [
+            f"{self.executions} programs run, {len(self.corpus)} in the corpus, {len(self.crashes)} crashes",
+            f"Coverage {len(reached)}/{len(COVERAGE_POINTS)}" + (f", not reached: {', '.join(missing)}" if missing else ""),
+        ]
+        lines.extend(f"  {signature} ({len(words)} instructions)" for signature, words in self.crashes.items())
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fuzzes the emulator with random valid RV32I/RV32F programs, keeping a coverage guided corpus and shrunk crashes in a directory.",
+        usage="riscv-fuzz {fuzz directory} [--iterations N] [--seed N]"
+    )
+    parser.add_argument("directory", help="Directory for the corpus, crashes and coverage map, reused between campaigns.")
+    parser.add_argument("--iterations", type=int, default=1000, help="Programs to run.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for a reproducible campaign.")
+    parser.add_argument("--max_steps", type=int, default=200, help="Instruction budget per program.")
+    parser.add_argument("--program_length", type=int, default=16, help="Instructions in a new random program.")
+    parser.add_argument("--cross_check_rate", type=float, default=0.05, help="Fraction of the programs without new coverage to cross-check against the gate-level DataPath.")
+    parser.add_argument("--no_cross_check", action="store_true", help="Flag to not cross-check new corpus programs against the gate-level DataPath.")
+    args = parser.parse_args()
+
+    fuzzer = Fuzzer(args.directory, args.seed, args.max_steps, args.program_length, cross_check_rate=args.cross_check_rate)
+    if args.no_cross_check:
+        fuzzer.reference = None
+    fuzzer.fuzz(args.iterations)
+    print(fuzzer.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+from contextlib import contextmanager
+from itertools import product
+from typing import Iterator
+import os
+
 from memory import Bit
 
 # This module is where all of the low level bitwise
@@ -5,26 +10,44 @@ from memory import Bit
 
 GROUND = 0
 
+# Every transistor gate also takes NumPy bool arrays as bit slices, one
+# element per bit or per simulated instance, and then returns bool arrays.
+# An array has no single truth value, so pmos, nmos and the not, nand and
+# nor pull downs check for one by class, which keeps the scalar path as fast
+# as plain branching, and switch every element at once instead.  The table
+# backend takes scalar bits only.
+try:
+    from numpy import ndarray
+except ImportError:
+    # No bit slices without NumPy, no class is None
+    ndarray = None
+
 def pmos(control:Bit, data:Bit) -> Bit:
+    if control.__class__ is ndarray:
+        return (control == 0) & (data != 0)
     if not control:
         return data
     return GROUND
 
 def nmos(control:Bit, data:Bit) -> Bit:
+    if control.__class__ is ndarray:
+        return (control != 0) & (data != 0)
     if control:
         return data
     return GROUND
 
-def not_gate(data:Bit, power:Bit = None) -> Bit:
+def transistor_not_gate(data:Bit, power:Bit = None) -> Bit:
     power = power if power != None else 1
     pmos_out:Bit = pmos(data, power)
     grounded:Bit = nmos(data, pmos_out)
 
+    if grounded.__class__ is ndarray:
+        return (grounded == 0) & (pmos_out != 0)
     if grounded:
         return GROUND
     return pmos_out
 
-def nand_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+def transistor_nand_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
     power = power if power != None else 1
     pmos_out_a = pmos(data_a, power)
     pmos_out_b = pmos(data_b, power)
@@ -33,11 +56,13 @@ def nand_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
     nmos_out_a = nmos(data_a, pmos_combined)
     grounded = nmos(data_b, nmos_out_a)
 
+    if grounded.__class__ is ndarray:
+        return (grounded == 0) & (pmos_combined != 0)
     if grounded:
         return GROUND
     return pmos_combined
 
-def nor_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+def transistor_nor_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
     power = power if power != None else 1
     pmos_out_a = pmos(data_a, power)
     pmos_out_b = pmos(data_b, pmos_out_a)
@@ -46,73 +71,75 @@ def nor_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
     nmos_out_b = nmos(data_b, pmos_out_b)
     grounded = nmos_out_a | nmos_out_b
 
+    if grounded.__class__ is ndarray:
+        return (grounded == 0) & (pmos_out_b != 0)
     if grounded:
         return GROUND
     return pmos_out_b
 
-def and_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+def transistor_and_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
     power = power if power != None else 1
-    nand_out = nand_gate(data_a, data_b, power)
-    return not_gate(nand_out, power)
+    nand_out = transistor_nand_gate(data_a, data_b, power)
+    return transistor_not_gate(nand_out, power)
 
-def or_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+def transistor_or_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
     power = power if power != None else 1
-    nor_out = nor_gate(data_a, data_b, power)
-    return not_gate(nor_out, power)
+    nor_out = transistor_nor_gate(data_a, data_b, power)
+    return transistor_not_gate(nor_out, power)
 
-def mux_gate(data_a:Bit, data_b:Bit, control:Bit, power:Bit = None) -> Bit:
+def transistor_mux_gate(data_a:Bit, data_b:Bit, control:Bit, power:Bit = None) -> Bit:
     power = power if power != None else 1
-    not_control_out = not_gate(control, power)
-    a_and_control_out = and_gate(data_a, not_control_out, power)
-    b_and_control_out = and_gate(data_b, control, power)
+    not_control_out = transistor_not_gate(control, power)
+    a_and_control_out = transistor_and_gate(data_a, not_control_out, power)
+    b_and_control_out = transistor_and_gate(data_b, control, power)
     
-    a_and_control_out_or_b_and_control_out_out = or_gate(a_and_control_out, b_and_control_out, power)
+    a_and_control_out_or_b_and_control_out_out = transistor_or_gate(a_and_control_out, b_and_control_out, power)
     
     return a_and_control_out_or_b_and_control_out_out
 
-def one_bit_adder(data_a:Bit, data_b:Bit, carry_in:Bit, power:Bit = None) -> tuple[Bit, Bit]:
+def transistor_one_bit_adder(data_a:Bit, data_b:Bit, carry_in:Bit, power:Bit = None) -> tuple[Bit, Bit]:
     power = power if power != None else 1
-    a_xor_b = xor_gate(data_a, data_b, power)
-    sum_bit = xor_gate(a_xor_b, carry_in, power)
+    a_xor_b = transistor_xor_gate(data_a, data_b, power)
+    sum_bit = transistor_xor_gate(a_xor_b, carry_in, power)
 
-    a_and_b = and_gate(data_a, data_b, power)
-    a_and_cin = and_gate(data_a, carry_in, power)
-    b_and_cin = and_gate(data_b, carry_in, power)
-    carry_out = or_gate(or_gate(a_and_b, a_and_cin, power), b_and_cin, power)
+    a_and_b = transistor_and_gate(data_a, data_b, power)
+    a_and_cin = transistor_and_gate(data_a, carry_in, power)
+    b_and_cin = transistor_and_gate(data_b, carry_in, power)
+    carry_out = transistor_or_gate(transistor_or_gate(a_and_b, a_and_cin, power), b_and_cin, power)
 
     return sum_bit, carry_out
 
-def xor_gate(data_a: Bit, data_b: Bit, power: Bit = None) -> Bit:
+def transistor_xor_gate(data_a: Bit, data_b: Bit, power: Bit = None) -> Bit:
     """
     XOR implemented from primitive gates:
       XOR = (a OR b) AND NOT(a AND b)
     """
     power = power if power is not None else 1
-    a_or_b = or_gate(data_a, data_b, power)
-    a_and_b = and_gate(data_a, data_b, power)
-    not_a_and_b = not_gate(a_and_b, power)
-    return and_gate(a_or_b, not_a_and_b, power)
+    a_or_b = transistor_or_gate(data_a, data_b, power)
+    a_and_b = transistor_and_gate(data_a, data_b, power)
+    not_a_and_b = transistor_not_gate(a_and_b, power)
+    return transistor_and_gate(a_or_b, not_a_and_b, power)
 
-def xnor_gate(data_a: Bit, data_b: Bit, power: Bit = None) -> Bit:
+def transistor_xnor_gate(data_a: Bit, data_b: Bit, power: Bit = None) -> Bit:
     """
     XNOR = NOT(XOR)
     """
     power = power if power is not None else 1
-    return not_gate(xor_gate(data_a, data_b, power), power)
+    return transistor_not_gate(transistor_xor_gate(data_a, data_b, power), power)
 
-def and3_gate(a: Bit, b: Bit, c: Bit, power: Bit = None) -> Bit:
+def transistor_and3_gate(a: Bit, b: Bit, c: Bit, power: Bit = None) -> Bit:
     """
     3-input AND built from 2-input AND.
     """
     power = power if power is not None else 1
-    return and_gate(and_gate(a, b, power), c, power)
+    return transistor_and_gate(transistor_and_gate(a, b, power), c, power)
 
-def or3_gate(a: Bit, b: Bit, c: Bit, power: Bit = None) -> Bit:
+def transistor_or3_gate(a: Bit, b: Bit, c: Bit, power: Bit = None) -> Bit:
     """
     3-input OR built from 2-input OR.
     """
     power = power if power is not None else 1
-    return or_gate(or_gate(a, b, power), c, power)
+    return transistor_or_gate(transistor_or_gate(a, b, power), c, power)
 
 def high_level_mux(in_0:tuple[Bit,...], in_1:tuple[Bit,...], control_bit:Bit) -> tuple[Bit,...]:
     if control_bit:
@@ -156,4 +183,126 @@ def high_level_min(in_0: tuple[Bit,...], in_1: tuple[Bit,...], signed: bool = Fa
             else:
                 return in_0 if in_0[i] < in_1[i] else in_1
 
-    return in_0 # equal
\ No newline at end of file
+    return in_0 # equal
+
+
+## GATE BACKENDS
+
+# The transistor backend builds every gate out of pmos/nmos calls, the
+# table backend answers every gate from a truth table generated from the
+# transistor gates.  The transistor_* gates only call each other, so they
+# stay the reference model whichever backend is active.  The public gate
+# names are bound to the active backend's gates, modules built on top of
+# this one (adders, decoders, latches) call the gates through the module,
+# so they pick up whichever backend is active.  The backend is a process
+# wide setting, use_backend returns the previous one so it can be restored.
+
+BACKEND_TRANSISTOR = "transistor"
+BACKEND_TABLE = "table"
+
+TABLE_GATE_INPUTS:dict[str, int] = {
+    "not_gate": 1,
+    "nand_gate": 2,
+    "nor_gate": 2,
+    "and_gate": 2,
+    "or_gate": 2,
+    "xor_gate": 2,
+    "xnor_gate": 2,
+    "and3_gate": 3,
+    "or3_gate": 3,
+    "mux_gate": 3,
+    "one_bit_adder": 3,
+}
+
+TRANSISTOR_GATES = {name: globals()["transistor_" + name] for name in TABLE_GATE_INPUTS}
+
+def truth_table(gate, inputs:int) -> dict[tuple[Bit, ...], Bit|tuple[Bit, Bit]]:
+    """
+    Every output of gate keyed by its inputs followed by power.
+    """
+    return {
+        bits: gate(*bits) for bits in product((0, 1), repeat=inputs + 1)
+    }
+
+_NOT_TABLE = truth_table(transistor_not_gate, 1)
+_NAND_TABLE = truth_table(transistor_nand_gate, 2)
+_NOR_TABLE = truth_table(transistor_nor_gate, 2)
+_AND_TABLE = truth_table(transistor_and_gate, 2)
+_OR_TABLE = truth_table(transistor_or_gate, 2)
+_XOR_TABLE = truth_table(transistor_xor_gate, 2)
+_XNOR_TABLE = truth_table(transistor_xnor_gate, 2)
+_AND3_TABLE = truth_table(transistor_and3_gate, 3)
+_OR3_TABLE = truth_table(transistor_or3_gate, 3)
+_MUX_TABLE = truth_table(transistor_mux_gate, 3)
+_ADDER_TABLE = truth_table(transistor_one_bit_adder, 3)
+
+def table_not_gate(data:Bit, power:Bit = None) -> Bit:
+    return _NOT_TABLE[data, 1 if power is None else power]
+
+def table_nand_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+    return _NAND_TABLE[data_a, data_b, 1 if power is None else power]
+
+def table_nor_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+    return _NOR_TABLE[data_a, data_b, 1 if power is None else power]
+
+def table_and_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+    return _AND_TABLE[data_a, data_b, 1 if power is None else power]
+
+def table_or_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+    return _OR_TABLE[data_a, data_b, 1 if power is None else power]
+
+def table_xor_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+    return _XOR_TABLE[data_a, data_b, 1 if power is None else power]
+
+def table_xnor_gate(data_a:Bit, data_b:Bit, power:Bit = None) -> Bit:
+    return _XNOR_TABLE[data_a, data_b, 1 if power is None else power]
+
+def table_and3_gate(a:Bit, b:Bit, c:Bit, power:Bit = None) -> Bit:
+    return _AND3_TABLE[a, b, c, 1 if power is None else power]
+
+def table_or3_gate(a:Bit, b:Bit, c:Bit, power:Bit = None) -> Bit:
+    return _OR3_TABLE[a, b, c, 1 if power is None else power]
+
+def table_mux_gate(data_a:Bit, data_b:Bit, control:Bit, power:Bit = None) -> Bit:
+    return _MUX_TABLE[data_a, data_b, control, 1 if power is None else power]
+
+def table_one_bit_adder(data_a:Bit, data_b:Bit, carry_in:Bit, power:Bit = None) -> tuple[Bit, Bit]:
+    return _ADDER_TABLE[data_a, data_b, carry_in, 1 if power is None else power]
+
+TABLE_GATES = {name: globals()["table_" + name] for name in TABLE_GATE_INPUTS}
+
+GATE_BACKENDS = {
+    BACKEND_TRANSISTOR: TRANSISTOR_GATES,
+    BACKEND_TABLE: TABLE_GATES,
+}
+
+_backend = BACKEND_TRANSISTOR
+
+def use_backend(backend:str) -> str:
+    """
+    Switches every gate in this module to the given backend and returns
+    the previous backend.  This is process wide.
+    """
+    global _backend
+    if backend not in GATE_BACKENDS:
+        raise ValueError(f"Unknown gate backend '{backend}', expected one of {', '.join(GATE_BACKENDS)}")
+    globals().update(GATE_BACKENDS[backend])
+    previous, _backend = _backend, backend
+    return previous
+
+@contextmanager
+def backend(name:str) -> Iterator[None]:
+    """
+    Uses the given backend inside a with block and restores the previous one after it.
+    """
+    previous = use_backend(name)
+    try:
+        yield
+    finally:
+        use_backend(previous)
+
+def get_backend() -> str:
+    return _backend
+
+# Select the backend at import time with RISCV_SIM_GATES=table
+use_backend(os.environ.get("RISCV_SIM_GATES", BACKEND_TRANSISTOR))
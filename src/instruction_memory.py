@@ -1,31 +1,129 @@
-from memory import Bitx32, dec_to_bin, bin_to_dec, hex_to_bin, hex_endian_swap
+from memory import Bitx32, Word, bits_to_uint32, dec_to_bin, bin_to_dec, hex_to_bin, hex_endian_swap, word_to_bits
+from decoded_instruction import DecodedInstruction
+from paged_memory import PagedMemory
+from mapped_memory import MappedMemory
+
+import struct
 
 
 class PC:
-    value:Bitx32
+    value:Bitx32|Word
+
+    def __init__(self, initial_value:int|Bitx32, packed:bool = False):
+        """
+        In packed mode the value is kept as a plain int.
+        """
+        if packed:
+            self.value = initial_value if isinstance(initial_value, int) else bin_to_dec(initial_value)
+        else:
+            self.value = dec_to_bin(initial_value, 32) if isinstance(initial_value, int) else initial_value
 
-    def __init__(self, initial_value:int|Bitx32):
-        self.value = dec_to_bin(initial_value) if isinstance(initial_value, int) else initial_value
-    
-    def update(self, new_address:Bitx32):
+    def update(self, new_address:Bitx32|Word):
         self.value = new_address
         return new_address
 
 class InstructionMemory:
 
-    memory:list[Bitx32]
+    memory:list[Bitx32]|list[Word]
+    # Predecoded form of each slot, built on first fetch
+    decoded:list[DecodedInstruction|None]
+
+    def __init__(self, packed:bool = False, shared:PagedMemory|MappedMemory|None = None):
+        """
+        In packed mode instructions are stored and fetched as plain ints.
 
-    def __init__(self):
+        With a shared memory (the Memory Unit's backing store) there is
+        one address space: loading writes the instructions into it, and
+        fetch reads them back from it, so stores can modify code.  The
+        instruction memory then only keeps the text range and the
+        predecoded instructions.
+        """
+        self.packed = packed
+        self.shared = shared
         self.memory = []
+        self.decoded = []
+        # Address of the first instruction
+        self.base:Word = 0
 
     def load(self, hex_data:list[str]):
+        if self.shared is not None:
+            self.load_words([int(instr_hex.strip().lower().replace("0x", ""), 16) & 0xFFFFFFFF for instr_hex in hex_data])
+            return
+        self.base = 0
         self.memory = []
         for instr_hex in hex_data:
-            self.memory.append(hex_to_bin(instr_hex, 32))
-            
+            if self.packed:
+                self.memory.append(int(instr_hex.strip().lower().replace("0x", ""), 16) & 0xFFFFFFFF)
+            else:
+                self.memory.append(hex_to_bin(instr_hex, 32))
+        self.decoded = [None] * len(self.memory)
+
+    def load_words(self, words:list[Word], base:Word = 0):
+        """
+        Loads already packed instruction words with the first one at base.
+        """
+        if self.shared is not None:
+            self.shared.write_bytes(base, struct.pack(f"<{len(words)}I", *words))
+            self.map_text(base, len(words))
+            return
+        self.base = base
+        self.memory = list(words) if self.packed else [word_to_bits(word) for word in words]
+        self.decoded = [None] * len(self.memory)
+
+    def map_text(self, base:Word, length:int):
+        """
+        Makes length words of the shared memory starting at base the
+        program text, without writing them.
+        """
+        self.base = base
+        self.decoded = [None] * length
+
+    @property
+    def text_end(self) -> int:
+        """
+        Address one past the last instruction.
+        """
+        return self.base + len(self.decoded) * 4
+
+    def overwritten_by(self, address:Word) -> bool:
+        """
+        Whether a word stored at a packed address overlaps an instruction
+        fetched from the shared memory.
+        """
+        return self.shared is not None and self.base - 4 < address < self.text_end
+
+    def get_decoded(self, address:Word) -> DecodedInstruction|None:
+        """
+        Fetches the predecoded instruction at a packed address, decoding
+        the slot on its first fetch.
+        """
+        slot = (address - self.base) >> 2
+        if slot < 0 or slot >= len(self.decoded):
+            return None
+        decoded = self.decoded[slot]
+        if decoded is None:
+            if self.shared is not None:
+                word = self.shared.read_word(address)
+            else:
+                instruction = self.memory[slot]
+                word = instruction if self.packed else bits_to_uint32(instruction)
+            decoded = self.decoded[slot] = DecodedInstruction.from_word(word)
+        return decoded
+
+    def invalidate(self, start:Word, end:Word):
+        """
+        Drops the predecoded form of every slot overlapping [start, end).
+        """
+        for slot in range(max(start - self.base, 0) // 4, min((end - self.base + 3) // 4, len(self.decoded))):
+            self.decoded[slot] = None
+
 
-    def get_instruction(self, address:Bitx32) -> Bitx32:
-        dec_addr = bin_to_dec(address) // 4
-        if dec_addr < len(self.memory):
+    def get_instruction(self, address:Bitx32|Word) -> Bitx32|Word|None:
+        packed_address = address if self.packed else bin_to_dec(address)
+        dec_addr = (packed_address - self.base) >> 2
+        if 0 <= dec_addr < len(self.decoded):
+            if self.shared is not None:
+                word = self.shared.read_word(packed_address)
+                return word if self.packed else word_to_bits(word)
             return self.memory[dec_addr]
-        return None
\ No newline at end of file
+        return None
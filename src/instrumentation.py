@@ -0,0 +1,129 @@
+"""
+Host side timers around the emulator's own stages.
+"""
+from dataclasses import dataclass
+from typing import Callable
+
+import time
+
+# Stage name to the (component attribute, method) pairs timed as that stage
+STAGES:dict[str, tuple[tuple[str, str], ...]] = {
+    "fetch": (("instruction_memory", "get_instruction"), ("instruction_memory", "get_decoded")),
+    "decode": (("control", "decode"), ("control", "decode_word")),
+    "alu control": (("alu_control", "update"), ("alu_control", "update_word"), ("fpu_control", "update"), ("fpu_control", "update_word")),
+    "register files": (
+        ("rv32i_register_file", "update"), ("rv32i_register_file", "update_word"),
+        ("rv32f_register_file", "update"), ("rv32f_register_file", "update_word"),
+    ),
+    "alu": (("rv32i_alu", "update"), ("rv32i_alu", "update_word")),
+    "fpu": (("fpu", "update"), ("fpu", "update_word")),
+    "memory": (("memory", "read"), ("memory", "write"), ("memory", "read_word"), ("memory", "write_word")),
+}
+
+
+@dataclass(slots=True)
+class StageCounter:
+    calls:int = 0
+    nanoseconds:int = 0
+    # Set while a call of this stage is being timed, so a stage method
+    # calling another one of the same stage (update -> update_word) is
+    # only counted once
+    active:bool = False
+
+
+class Instrumentation:
+    """
+    Opt-in call counters and timers around the components of a DataPath.
+
+    Attaching replaces the stage methods on the component instances with
+    timed wrappers, detaching removes them again, so an uninstrumented
+    run pays nothing.  Used as a context manager it also measures the
+    wall time and the guest instructions executed in between:
+
+        with Instrumentation(dp) as instrumentation:
+            dp.run()
+        print(instrumentation.report())
+
+    The functional engines skip most of these stages (they dispatch on
+    predecoded instructions and compute inline), and the block engine
+    binds its memory accessors when it is created, so the breakdown is
+    mostly meaningful for the gate-level and packed DataPath.
+    """
+
+    def __init__(self, datapath):
+        self.datapath = datapath
+        self.counters:dict[str, StageCounter] = {stage: StageCounter() for stage in STAGES}
+        self.wrapped:list[tuple[object, str]] = []
+        self.wall_nanoseconds = 0
+        self.instructions = 0
+        self._start_ns = 0
+        self._start_steps = 0
+
+    def _wrap(self, counter:StageCounter, function:Callable) -> Callable:
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            if counter.active:
+                return function(*args, **kwargs)
+            counter.active = True
+            counter.calls += 1
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter.nanoseconds += perf_counter_ns() - start
+                counter.active = False
+        return timed
+
+    def attach(self):
+        for stage, methods in STAGES.items():
+            for component_name, method_name in methods:
+                component = getattr(self.datapath, component_name)
+                method = getattr(component, method_name, None)
+                if method is None:
+                    continue
+                setattr(component, method_name, self._wrap(self.counters[stage], method))
+                self.wrapped.append((component, method_name))
+        self._start_steps = self.datapath.step_count
+        self._start_ns = time.perf_counter_ns()
+
+    def detach(self):
+        self.wall_nanoseconds += time.perf_counter_ns() - self._start_ns
+        self.instructions += self.datapath.step_count - self._start_steps
+        for component, method_name in self.wrapped:
+            # Drop the instance attribute so the class method is used again
+            delattr(component, method_name)
+        self.wrapped = []
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+    def report(self) -> str:
+        """
+        Host time per stage, in total and per guest instruction.  "other"
+        is the wall time spent outside every stage (the datapath itself).
+        """
+        instructions = self.instructions or 1
+        wall = self.wall_nanoseconds or 1
+        lines = [
+            f"Guest instructions: {self.instructions}  wall time: {self.wall_nanoseconds / 1e9:.3f} s"
+            f"  ({self.wall_nanoseconds / 1e3 / instructions:.2f} us per instruction)",
+            "",
+            f"  {'stage':<16}{'calls':>12}{'total ms':>12}{'us/instr':>12}{'share':>9}",
+        ]
+        timed = 0
+        for stage, counter in self.counters.items():
+            timed += counter.nanoseconds
+            lines.append(
+                f"  {stage:<16}{counter.calls:>12}{counter.nanoseconds / 1e6:>12.2f}"
+                f"{counter.nanoseconds / 1e3 / instructions:>12.2f}{100 * counter.nanoseconds / wall:>8.1f}%"
+            )
+        other = max(self.wall_nanoseconds - timed, 0)
+        lines.append(
+            f"  {'other':<16}{'':>12}{other / 1e6:>12.2f}{other / 1e3 / instructions:>12.2f}{100 * other / wall:>8.1f}%"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,196 @@
+"""
+Differential lockstep checker.
+
+Runs the same program on two engines side by side and compares the PC,
+both register files and the memory written since the last check every
+interval instructions.  The first divergence stops the run and is
+reported as a minimal diff, so the optimised engines can be checked
+against the gate-level DataPath as the reference:
+
+    riscv-lockstep program.asm --reference gate --candidate block --interval 1000
+"""
+from dataclasses import dataclass, field
+
+import argparse
+import sys
+
+from batch import load_source
+from benchmark import ENGINES
+from datapath import EXIT_BUDGET, EXIT_ERROR, DataPath
+from memory import bin_to_dec
+from paged_memory import PAGE_BITS, PagedMemory
+
+
+@dataclass
+class Divergence:
+    """
+    Where two engines first disagreed: after step_count instructions,
+    with the PC of the instruction that ran last and a line per
+    difference.
+    """
+    step_count:int
+    pc:int
+    instruction:int|None
+    differences:list[str] = field(default_factory=list)
+
+    def render(self) -> str:
+        instruction = f" (0x{self.instruction:08X})" if self.instruction is not None else ""
+        lines = [f"Diverged after {self.step_count} instructions, the last one at pc 0x{self.pc:08X}{instruction}:"]
+        lines.extend(f"  {difference}" for difference in self.differences)
+        return "\n".join(lines)
+
+
+class LockstepChecker:
+    """
+    Both engines have their program loaded and their memory paged.  Each
+    check snapshots both engines, which freezes their written pages as
+    bytes, so the pages written before the next check are the ones that
+    are bytearrays again.  Only those are compared, byte for byte.  The
+    snapshots are also the point a divergence is replayed from.  A store
+    after a check copies its page once, as for any snapshot.
+    """
+
+    # Differing bytes listed per divergence
+    max_memory_differences = 8
+
+    def __init__(self, reference:DataPath, candidate:DataPath, interval:int = 1, halt_on_ecall:bool = False):
+        for dp in (reference, candidate):
+            if not isinstance(dp.memory.memory, PagedMemory):
+                raise ValueError("The lockstep checker needs paged memory on both engines, not a memory image")
+        if interval < 1:
+            raise ValueError(f"The check interval must be at least 1, not {interval}")
+        self.reference = reference
+        self.candidate = candidate
+        self.interval = interval
+        self.halt_on_ecall = halt_on_ecall
+
+    def run(self, max_steps:int|None = None) -> Divergence|None:
+        """
+        Runs both engines until the program stops, max_steps more
+        instructions ran or they diverge.  A divergence found between
+        checks more than one instruction apart is replayed from the last
+        check one instruction at a time, so it names the first
+        instruction whose results differ.
+        """
+        limit = self.reference.step_count + max_steps if max_steps is not None else None
+        snapshots = self.reference.snapshot(), self.candidate.snapshot()
+        interval = self.interval
+        while True:
+            steps = interval if limit is None else min(interval, limit - self.reference.step_count)
+            if steps <= 0:
+                return None
+            pc = self.pc(self.reference)
+            outcomes = self.advance(self.reference, steps), self.advance(self.candidate, steps)
+            differences, checked = self.compare(*outcomes)
+            if differences:
+                if interval == 1:
+                    return Divergence(self.reference.step_count, pc, self.instruction(pc), differences)
+                self.reference.restore(snapshots[0])
+                self.candidate.restore(snapshots[1])
+                interval = 1
+                continue
+            if outcomes[0][0] != EXIT_BUDGET:
+                return None
+            snapshots = checked
+
+    def advance(self, dp:DataPath, steps:int) -> tuple[str, str|None]:
+        """
+        Runs steps instructions, returns the exit reason and the error raised.
+        """
+        try:
+            return dp.run(max_steps=steps, halt_on_ecall=self.halt_on_ecall).reason, None
+        except Exception as e:
+            return EXIT_ERROR, f"{type(e).__name__}: {e}"
+
+    @staticmethod
+    def pc(dp:DataPath) -> int:
+        return dp.pc.value if dp.config.packed_words else bin_to_dec(dp.pc.value)
+
+    def instruction(self, pc:int) -> int|None:
+        try:
+            decoded = self.reference.instruction_memory.get_decoded(pc)
+        except ValueError:
+            return None
+        return decoded.word if decoded is not None else None
+
+    def compare(self,
+            reference_outcome:tuple[str, str|None],
+            candidate_outcome:tuple[str, str|None]
+        ) -> tuple[list[str], tuple[DataPath.Snapshot, DataPath.Snapshot]]:
+        """
+        Returns the differences between the engines and the snapshots of
+        both taken for the check.
+        """
+        differences:list[str] = []
+        if reference_outcome != candidate_outcome:
+            differences.append(f"exit: {self.describe(reference_outcome)} != {self.describe(candidate_outcome)}")
+        if self.reference.step_count != self.candidate.step_count:
+            differences.append(f"step count: {self.reference.step_count} != {self.candidate.step_count}")
+        # The written pages have to be listed before the snapshots freeze them
+        written = set(self.reference.memory.memory.dirty_pages())
+        written.update(self.candidate.memory.memory.dirty_pages())
+        reference, candidate = self.reference.snapshot(), self.candidate.snapshot()
+        if reference.pc != candidate.pc:
+            differences.append(f"pc: 0x{reference.pc:08X} != 0x{candidate.pc:08X}")
+        for prefix, reference_registers, candidate_registers in (
+            ("x", reference.rv32i_registers, candidate.rv32i_registers),
+            ("f", reference.rv32f_registers, candidate.rv32f_registers)
+        ):
+            for index, (expected, actual) in enumerate(zip(reference_registers, candidate_registers)):
+                if expected != actual:
+                    differences.append(f"{prefix}{index}: 0x{expected:08X} != 0x{actual:08X}")
+        differences.extend(self.compare_pages(reference.pages, candidate.pages, written))
+        return differences, (reference, candidate)
+
+    def compare_pages(self, reference:dict[int, bytes], candidate:dict[int, bytes], page_numbers:set[int]) -> list[str]:
+        """
+        The first differing bytes of the given pages, a page missing on
+        one side is compared as zeros.
+        """
+        differences:list[str] = []
+        zero_page = bytes(1 << PAGE_BITS)
+        for page_number in sorted(page_numbers):
+            expected = reference.get(page_number, zero_page)
+            actual = candidate.get(page_number, zero_page)
+            if expected == actual:
+                continue
+            base = page_number << PAGE_BITS
+            for offset, (expected_byte, actual_byte) in enumerate(zip(expected, actual)):
+                if expected_byte != actual_byte:
+                    differences.append(f"mem[0x{base + offset:08X}]: 0x{expected_byte:02X} != 0x{actual_byte:02X}")
+                    if len(differences) == self.max_memory_differences:
+                        return differences
+        return differences
+
+    @staticmethod
+    def describe(outcome:tuple[str, str|None]) -> str:
+        reason, error = outcome
+        return reason if error is None else f"{reason} ({error})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs a program on two engines in lockstep and stops at the first instruction where their PC, registers or memory differ.",
+        usage="riscv-lockstep {program file} [--reference gate] [--candidate block] [--interval N]"
+    )
+    parser.add_argument("source", help="Path to input assembly, hex, flat binary (.bin) or RV32 ELF file.")
+    parser.add_argument("--reference", choices=list(ENGINES), default="gate", help="Engine configuration whose results count as correct.")
+    parser.add_argument("--candidate", choices=list(ENGINES), default="block", help="Engine configuration to check.")
+    parser.add_argument("--interval", type=int, default=1, help="Instructions between checks, a divergence is still narrowed down to one instruction.")
+    parser.add_argument("--max_steps", type=int, default=None, help="Stop after this many instructions.")
+    parser.add_argument("--halt_on_ecall", action="store_true", help="Flag to stop at the first ecall or ebreak.")
+    args = parser.parse_args()
+
+    reference = ENGINES[args.reference]()
+    candidate = ENGINES[args.candidate]()
+    for dp in (reference, candidate):
+        load_source(dp, args.source)
+    divergence = LockstepChecker(reference, candidate, args.interval, args.halt_on_ecall).run(args.max_steps)
+    if divergence is not None:
+        print(divergence.render())
+        sys.exit(1)
+    print(f"No divergence in {reference.step_count} instructions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,22 @@
 import argparse
 from assembler import assemble, Assembler
+from assembler.instructions import LabelToken
 
-from datapath import DataPath
+from checkpoint import load_checkpoint, save_checkpoint
+from datapath import EXIT_END, DataPath
+from fast_datapath import FastDataPath
+from block_datapath import BlockDataPath
+from program_loader import is_elf, load_file
+from instrumentation import Instrumentation
+import gates
+from step_trace import BinaryTraceSink, JsonLinesTraceSink, TraceSink
 
 def main():
     parser = argparse.ArgumentParser(
         description="An RV32I CPU Emulator with FPU extension.  It will attempt to assemble and run the provided RV32I assembly source file on the RV32I emulator.",
         usage="riscv-sim {program file path}\n  use --help for more information"
     )
-    parser.add_argument("source", help="Path to input assembly or hex file.")
+    parser.add_argument("source", help="Path to input assembly, hex, flat binary (.bin) or RV32 ELF file.")
     parser.add_argument("--assemble_only", action="store_true", help="Flag to assemble a file without running it.")
     parser.add_argument("--dont_show_steps", action="store_true", help="Flag to not show every instruction step the emulator takes.")
     parser.add_argument("--show_memory", action="store_true", help="Flag to show all the in use memory in the Memory Unit.")
@@ -17,6 +25,25 @@ def main():
     parser.add_argument("--show_immediate_values", action="store_true", help="Flag to show all possible immediate values by type after every step.")
     parser.add_argument("--show_rv32i_registers", action="store_true", help="Flag to show all RV32I registers after every step.")
     parser.add_argument("--show_rv32f_registers", action="store_true", help="Flag to show all RV32F registers after every step.")
+    parser.add_argument("--packed_words", action="store_true", help="Flag to run the emulator on packed 32-bit ints instead of bit tuples.")
+    parser.add_argument("--gates", choices=["transistor", "table"], default=None, help="Gate backend for the gate-level engine, 'transistor' builds every gate from pmos/nmos and 'table' uses truth tables.  This applies to the whole process.")
+    parser.add_argument("--alu", choices=["gate", "word"], default="gate", help="RV32IALU mode for the gate-level engine, 'gate' computes bit by bit through gates and 'word' computes whole words.")
+    parser.add_argument("--fpu", choices=["float", "reference"], default="float", help="FPU mode, 'float' computes normal numbers on host floats and 'reference' computes field by field.  Both give the same results.")
+    parser.add_argument("--gate_decoder", action="store_true", help="Flag to route register addresses through the gate-level 5x32 decoder.")
+    parser.add_argument("--memory_image", default=None, help="Path to a file to memory map as the Memory Unit, it is created sparse if it doesn't exist and kept after the run.")
+    parser.add_argument("--unified_memory", action="store_true", help="Flag to fetch instructions from the Memory Unit so code and data share one address space.")
+    parser.add_argument("--trace", default=None, help="Path to write a record of every executed instruction to, render it with riscv-trace.  Steps are not printed while tracing.")
+    parser.add_argument("--trace_format", choices=["binary", "jsonl"], default="binary", help="Format of the --trace file, fixed-size binary records or JSON Lines.")
+    parser.add_argument("--post_mortem_size", type=int, default=64, help="Number of most recent instructions kept to report when the run raises, 0 turns it off.")
+    parser.add_argument("--post_mortem", default=None, help="Path to write the most recent instructions to as a binary trace when the run raises, instead of printing them.")
+    parser.add_argument("--profile", action="store_true", help="Flag to count executed instructions per PC and print a hot-spot report after the run.")
+    parser.add_argument("--instrument", action="store_true", help="Flag to time the emulator's own stages (fetch, decode, register files, ALU, FPU, memory) and print the host time per guest instruction after the run.")
+    parser.add_argument("--max_steps", type=int, default=None, help="Stop after this many instructions.")
+    parser.add_argument("--timeout", type=float, default=None, help="Stop after this many seconds of wall time.")
+    parser.add_argument("--halt_on_ecall", action="store_true", help="Flag to stop at the first ecall or ebreak instead of running it as a no-op.")
+    parser.add_argument("--checkpoint", default=None, help="Path to a checkpoint written by --save_checkpoint to resume from, after loading the same program.")
+    parser.add_argument("--save_checkpoint", default=None, help="Path to write the machine state to when the run stops, e.g. after --halt_on_ecall stops it at the end of an init phase.")
+    parser.add_argument("--engine", choices=["gate", "functional", "block"], default="gate", help="Execution engine, 'gate' runs the gate-level datapath, 'functional' runs native integer arithmetic and 'block' runs compiled basic blocks.")
     parser.add_argument("-o", "--output", help="Path to output hex file.  This only works when the '--assemble_only' argument flag is included")
     args = parser.parse_args()
 
@@ -27,34 +54,98 @@ def main():
         ## Run the program
 
         source:str = args.source
-        show_steps:bool = not args.dont_show_steps
+        # The trace file replaces the printed steps
+        show_steps:bool = not args.dont_show_steps and args.trace is None
         show_memory:bool = args.show_memory
         show_reads:bool = args.show_reads
         show_writes:bool = args.show_writes
         show_immediate_values:bool = args.show_immediate_values
         show_rv32i_registers:bool = args.show_rv32i_registers
         show_rv32f_registers:bool = args.show_rv32f_registers
-        dp = DataPath(
-            show_immediate_values,
-            show_rv32i_registers,
-            show_rv32f_registers,
-            show_steps,
-            show_memory,
-            show_reads,
-            show_writes
-        )
+        packed_words:bool = args.packed_words
+        if args.gates is not None:
+            # The gate backend applies to the whole process
+            gates.use_backend(args.gates)
+        trace:TraceSink|None = None
+        if args.trace is not None:
+            trace = BinaryTraceSink(args.trace) if args.trace_format == "binary" else JsonLinesTraceSink(args.trace)
+        if args.engine in ("functional", "block"):
+            engine = BlockDataPath if args.engine == "block" else FastDataPath
+            dp = engine(
+                show_immediate_values,
+                show_rv32i_registers,
+                show_rv32f_registers,
+                show_steps,
+                show_memory,
+                show_reads,
+                show_writes,
+                args.memory_image,
+                args.unified_memory,
+                trace,
+                args.post_mortem_size,
+                args.post_mortem,
+                args.profile,
+                args.fpu
+            )
+        else:
+            dp = DataPath(
+                show_immediate_values,
+                show_rv32i_registers,
+                show_rv32f_registers,
+                show_steps,
+                show_memory,
+                show_reads,
+                show_writes,
+                packed_words,
+                args.alu,
+                args.gate_decoder,
+                args.memory_image,
+                args.unified_memory,
+                trace,
+                args.post_mortem_size,
+                args.post_mortem,
+                args.profile,
+                args.fpu
+            )
         code_gen:list[str] = []
+        labels:dict[str, LabelToken] = {}
         
         
-        with open(source, mode="r") as fp:
-            if source.endswith(".asm"):
-                assembler = Assembler(fp.read())
-                code_gen = assembler.parse(0x0)
+        if source.endswith(".bin") or is_elf(source):
+            # Flat binaries and ELF executables are loaded straight into memory
+            dp.load_image(load_file(source))
+        else:
+            with open(source, mode="r") as fp:
+                if source.endswith(".asm"):
+                    assembler = Assembler(fp.read())
+                    code_gen = assembler.parse(0x0)
+                    labels = assembler.parse_labels(0x0)
+                else:
+                    code_gen = fp.readlines()
+            
+            dp.load_program(code_gen)
+        if args.checkpoint is not None:
+            dp.restore(load_checkpoint(args.checkpoint))
+        instrumentation = Instrumentation(dp) if args.instrument else None
+        limits = {"max_steps": args.max_steps, "timeout": args.timeout, "halt_on_ecall": args.halt_on_ecall}
+        try:
+            if instrumentation is not None:
+                with instrumentation:
+                    status = dp.run(**limits)
             else:
-                code_gen = fp.readlines()
-        
-        dp.load_program(code_gen)
-        dp.run()
+                status = dp.run(**limits)
+            if status.reason != EXIT_END:
+                print(f"Stopped on {status.reason} at pc 0x{status.pc:08X} after {status.step_count} instructions")
+            if args.save_checkpoint is not None:
+                save_checkpoint(dp.snapshot(), args.save_checkpoint)
+        finally:
+            dp.memory.close()
+            if trace is not None:
+                trace.close()
+            if dp.profiler is not None:
+                print(dp.profiler.report(labels))
+            if instrumentation is not None:
+                print(instrumentation.report())
 
 
 
@@ -0,0 +1,158 @@
+"""
+Guest memory backed by a memory mapped sparse file.
+"""
+from memory import Word
+from paged_memory import PAGE_BITS, PAGE_MASK, PAGE_SIZE, out_of_bounds_error
+
+import mmap
+import os
+import struct
+
+_WORD = struct.Struct("<I")
+_HALF = struct.Struct("<H")
+
+
+class MappedMemory:
+    """
+    Little endian memory that maps a file of the whole address space.
+
+    The file is created sparse (or extended sparse) to the memory size, so
+    a multi gigabyte image costs nothing until the OS pages it in on
+    demand, and an existing image is usable as soon as it is mapped.
+    Writes go straight to the shared mapping so the image is kept after
+    the run for inspection or a later run.
+
+    Has the same accessors as PagedMemory.
+    """
+
+    def __init__(self, path:str, size:int):
+        self.path = path
+        self.size = size
+        self.file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        if os.fstat(self.file.fileno()).st_size < size:
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def _check_bounds(self, address:int, length:int):
+        if address < 0 or address + length > self.size:
+            raise out_of_bounds_error(address, length)
+
+    def read_word(self, address:int) -> Word:
+        self._check_bounds(address, 4)
+        return _WORD.unpack_from(self.map, address)[0]
+
+    def write_word(self, address:int, value:Word):
+        self._check_bounds(address, 4)
+        _WORD.pack_into(self.map, address, value & 0xFFFFFFFF)
+
+    def read_half(self, address:int) -> int:
+        self._check_bounds(address, 2)
+        return _HALF.unpack_from(self.map, address)[0]
+
+    def write_half(self, address:int, value:int):
+        self._check_bounds(address, 2)
+        _HALF.pack_into(self.map, address, value & 0xFFFF)
+
+    def read_byte(self, address:int) -> int:
+        self._check_bounds(address, 1)
+        return self.map[address]
+
+    def write_byte(self, address:int, value:int):
+        self._check_bounds(address, 1)
+        self.map[address] = value & 0xFF
+
+    def read_bytes(self, address:int, length:int) -> bytes:
+        self._check_bounds(address, length)
+        return self.map[address:address + length]
+
+    def write_bytes(self, address:int, data:bytes|bytearray|memoryview):
+        data = memoryview(data).cast("B")
+        self._check_bounds(address, len(data))
+        self.map[address:address + len(data)] = data
+
+    def clear(self, address:int, length:int):
+        """
+        Zeroes length bytes starting at address.
+        """
+        self._check_bounds(address, length)
+        self.map[address:address + length] = bytes(length)
+
+    def data_ranges(self) -> list[tuple[int, int]]:
+        """
+        Returns the (start, end) ranges of the image that may hold data.
+        Holes of the sparse file are skipped where the OS supports
+        SEEK_DATA/SEEK_HOLE, otherwise the whole image is one range.
+        """
+        if not hasattr(os, "SEEK_DATA"):
+            return [(0, self.size)]
+        self.map.flush()
+        fd = self.file.fileno()
+        ranges:list[tuple[int, int]] = []
+        position = 0
+        try:
+            while position < self.size:
+                try:
+                    start = os.lseek(fd, position, os.SEEK_DATA)
+                except OSError:
+                    # No data after position
+                    break
+                end = min(os.lseek(fd, start, os.SEEK_HOLE), self.size)
+                if start >= self.size:
+                    break
+                ranges.append((start, end))
+                position = end
+        except OSError:
+            return [(0, self.size)]
+        return ranges
+
+    def nonzero_bytes(self) -> dict[int, int]:
+        """
+        Returns every byte that holds a non zero value by address.
+        """
+        nonzero:dict[int, int] = {}
+        zero_page = bytes(PAGE_SIZE)
+        for start, end in self.data_ranges():
+            for page_start in range(start, end, PAGE_SIZE):
+                page = self.map[page_start:min(page_start + PAGE_SIZE, end)]
+                if page == zero_page[:len(page)]:
+                    continue
+                for offset, byte in enumerate(page):
+                    if byte:
+                        nonzero[page_start + offset] = byte
+        return nonzero
+
+    def snapshot(self) -> dict[int, bytes]:
+        """
+        Returns copies of the non zero pages keyed by page number, in the
+        same form as PagedMemory.snapshot.  A mapping can't share its
+        pages, so this copies every page that holds data.
+        """
+        pages:dict[int, bytes] = {}
+        zero_page = bytes(PAGE_SIZE)
+        for start, end in self.data_ranges():
+            for page_start in range(start & ~PAGE_MASK, end, PAGE_SIZE):
+                page = self.map[page_start:min(page_start + PAGE_SIZE, self.size)]
+                if page != zero_page[:len(page)]:
+                    pages[page_start >> PAGE_BITS] = page
+        return pages
+
+    def restore(self, pages:dict[int, bytes]):
+        """
+        Makes the image hold the pages of a snapshot, every other byte zero.
+        """
+        for start, end in self.data_ranges():
+            self.clear(start, end - start)
+        for page_number, page in pages.items():
+            self.write_bytes(page_number << PAGE_BITS, page)
+
+    def flush(self):
+        """
+        Writes dirty pages back to the image file.
+        """
+        self.map.flush()
+
+    def close(self):
+        if not self.map.closed:
+            self.map.flush()
+            self.map.close()
+            self.file.close()
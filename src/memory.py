@@ -26,6 +26,11 @@ Bitx20 = tuple[Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,B
 Bitx23 = tuple[Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit]
 Bitx24 = tuple[Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit,Bit]
 
+# Packed word mode stores a 32-bit value as a plain unsigned int
+# instead of an LSB-first bit tuple.
+Word = int
+MASK32 = 0xFFFFFFFF
+
 
 
 class Byte:
@@ -110,11 +115,12 @@ class Memory:
 
     def write_bits(self, bits:Iterable[Bit]):
         assert len(bits) == len(self), f"{len(bits)} bits != {len(self)} bits"
-        for b_n, bit in enumerate(bits):
-            self[b_n] = bit
+        for byte_n, byte in enumerate(self.memory):
+            byte.memory = [int(bool(bit)) for bit in bits[byte_n * 8:byte_n * 8 + 8]]
 
     def read_bits(self) -> tuple[Bit,...]:
-        return tuple(bit for bit in self)
+        # Same order as iterating over self, without the per bit index checks
+        return tuple(bit for byte in self.memory for bit in byte.memory)
     
     def to_hex(self) -> str:
         return bin_to_hex(self.read_bits())
@@ -251,6 +257,22 @@ def bits_to_uint32(bits: tuple[Bit, ...]) -> int:
 def int_to_bits(value:int, size:int) -> tuple[Bit,...]:
     return tuple(int(bool((value >> i) & 1)) for i in range(size))
 
+def words_to_bit_slices(words, size:int = 32) -> tuple:
+    """
+    LSB-first bit slices of a NumPy array of words, a bool array per bit
+    position holding that bit of every word, for the gates in gates.py.
+    """
+    return tuple((words >> i) & 1 != 0 for i in range(size))
+
+def bit_slices_to_words(bits:tuple):
+    """
+    The uint64 array of words held by LSB-first bit slices.
+    """
+    value = 0
+    for i, b in enumerate(bits):
+        value = value | (b.astype("uint64") << i)
+    return value
+
 def bits_to_hex_little_endian(bits: tuple[Bit, ...]) -> str:
     if len(bits) % 8 != 0:
         raise ValueError("Bit length must be a multiple of 8")
@@ -307,4 +329,43 @@ def sign_extend(bits: Bits, target_len: int = 32) -> Bitx32:
     return bits + extension
 
 def slice_bits(instr: Bits, lo: int, hi: int) -> tuple:
-    return tuple(instr[i] for i in range(lo, hi + 1))
\ No newline at end of file
+    return tuple(instr[i] for i in range(lo, hi + 1))
+
+
+## PACKED WORD UTILITY FUNCTIONS
+
+
+def word_field(word: Word, lo: int, hi: int) -> int:
+    """
+    Equivalent of `bin_to_dec(slice_bits(bits, lo, hi))` for a packed word.
+    """
+    return (word >> lo) & ((1 << (hi - lo + 1)) - 1)
+
+def word_sign_extend(value: int, size: int) -> Word:
+    """
+    Sign extends the low `size` bits of value to an unsigned 32-bit word.
+    """
+    value &= (1 << size) - 1
+    if value & (1 << (size - 1)):
+        value |= MASK32 ^ ((1 << size) - 1)
+    return value
+
+def word_to_signed(word: Word) -> int:
+    return word - (1 << 32) if word & 0x80000000 else word
+
+# LSB-first bits of every byte value and the reverse lookup
+BYTE_BITS: tuple[Bitx8, ...] = tuple(int_to_bits(byte, 8) for byte in range(256))
+BITS_BYTE: dict[Bitx8, int] = {bits: byte for byte, bits in enumerate(BYTE_BITS)}
+
+def word_to_bits(word: Word) -> Bitx32:
+    """
+    Same as int_to_bits(word, 32) using one lookup per byte.
+    """
+    return BYTE_BITS[word & 0xFF] + BYTE_BITS[(word >> 8) & 0xFF] + BYTE_BITS[(word >> 16) & 0xFF] + BYTE_BITS[(word >> 24) & 0xFF]
+
+def bits_to_word(bits: Bitx32) -> Word:
+    """
+    Same as bits_to_uint32 for 32 bits using one lookup per byte.
+    """
+    return BITS_BYTE[bits[0:8]] | (BITS_BYTE[bits[8:16]] << 8) | (BITS_BYTE[bits[16:24]] << 16) | (BITS_BYTE[bits[24:32]] << 24)
+
@@ -1,53 +1,66 @@
 """
 The memory for the system.
 """
-from memory import Bit, Bitx4, Bitx7, Bitx32, bits_to_10_tup, Memory, Byte, bin_to_dec
+from memory import Bit, Bitx4, Bitx7, Bitx32, Word, bits_to_10_tup, int_to_bits, Memory, Byte, bin_to_dec, bits_to_word, word_to_bits
+from paged_memory import PagedMemory
+from mapped_memory import MappedMemory
 
 import os
 
 class MemoryUnit:
-    def __init__(self, memory_in_megabytes:int = 1):
-        # Store pages of memory in a dict so we dont have to create a couple of gb of actual memory
-        self.memory:dict[int, Byte] = {}
+    def __init__(self, memory_in_megabytes:int = 1, packed:bool = False, image_path:str|None = None):
+        """
+        In packed mode read/write take and return packed addresses and
+        words, otherwise they take and return bits.  Both modes store
+        bytes in the same paged backing store.
+
+        With an image_path the memory is a memory mapped sparse file
+        instead, which keeps its contents after the run.
+        """
+        # Pages are allocated on first write so we dont have to create a couple of gb of actual memory
+        self.packed = packed
         self.max_address:int = memory_in_megabytes * 1_000_000
-        
-    def _get_byte(self, address: int) -> Byte:
-        """Get a byte at the given address, create it if it doesn't exist."""
-        if address not in self.memory:
-            self.memory[address] = Byte()  # Create on first access
-        return self.memory[address]
-    
+        self.memory:PagedMemory|MappedMemory
+        if image_path is None:
+            self.memory = PagedMemory(self.max_address)
+        else:
+            self.memory = MappedMemory(image_path, self.max_address)
+
     def __getitem__(self, index: int) -> Bitx32:
-        if index < 0 or index + 4 > self.max_address:
-            raise RuntimeError(f"Memory address out of bounds: {hex(index)} to {hex(index+4)}")
-        
-        res_list = []
-        # Read 4 bytes
-        for byte_offset in range(4):
-            byte = self._get_byte(index + byte_offset)
-            for bit in byte:
-                res_list.append(bit)
-        return tuple(res_list)
+        return word_to_bits(self.memory.read_word(index))
     
     def __setitem__(self, index: int, value: Bitx32):
-        if index < 0 or index + 4 > self.max_address:
-            raise RuntimeError(f"Memory address out of bounds: {hex(index)}")
-        
-        # Write 32 bits across 4 bytes
-        for b_i, bit in enumerate(value):
-            byte_addr = index + (b_i // 8)
-            bit_offset = b_i % 8
-            
-            # Get or create the byte at this address
-            byte = self._get_byte(byte_addr)
-            byte[bit_offset] = bit
+        self.memory.write_word(index, bits_to_word(value))
     
-    def read(self, address: Bitx32) -> Bitx32:
+    def read(self, address: Bitx32|Word) -> Bitx32|Word:
+        if self.packed:
+            return self.memory.read_word(address)
         return self[bin_to_dec(address)]
     
-    def write(self, address: Bitx32, value: Bitx32):
+    def write(self, address: Bitx32|Word, value: Bitx32|Word):
+        if self.packed:
+            self.memory.write_word(address, value)
+            return
         self[bin_to_dec(address)] = value
 
+    def read_word(self, address: int) -> Word:
+        return self.memory.read_word(address)
+
+    def write_word(self, address: int, value: Word):
+        self.memory.write_word(address, value)
+
+    def nonzero_bytes(self) -> dict[int, int]:
+        """
+        Returns every byte that holds a non zero value by address.
+        """
+        return self.memory.nonzero_bytes()
+
+    def close(self):
+        """
+        Flushes and releases a memory mapped image.
+        """
+        self.memory.close()
+
     def __repr__(self):
         term_size:os.terminal_size = os.get_terminal_size()
 
@@ -57,8 +70,8 @@ class MemoryUnit:
 
         last_address:int | None = None
         tup_addr_byte_buffer:list[tuple[int,Byte]] = []
-        for addr_byte in sorted(self.memory.items(), key=lambda k:k[0]):
-            addr = addr_byte[0]
+        for addr, value in self.nonzero_bytes().items():
+            addr_byte = (addr, Byte(list(int_to_bits(value, 8))))
 
             if last_address == None:
                 tup_addr_byte_buffer.append(addr_byte)
@@ -0,0 +1,197 @@
+"""
+Sparse byte addressable memory made of lazily allocated pages.
+"""
+from memory import Word
+
+import struct
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS # 4 KiB
+PAGE_MASK = PAGE_SIZE - 1
+
+_WORD = struct.Struct("<I")
+_HALF = struct.Struct("<H")
+
+
+def out_of_bounds_error(address:int, length:int) -> RuntimeError:
+    """
+    The error of an access of length bytes at address past the end of memory.
+    """
+    return RuntimeError(f"Memory address out of bounds: {hex(address)} to {hex(address+length)}")
+
+
+class PagedMemory:
+    """
+    Little endian memory backed by 4 KiB bytearray pages kept in a page
+    table keyed by page number.  A page is only allocated the first time
+    it is written, reading a page that was never written returns zeros,
+    so untouched memory costs nothing.
+
+    Pages shared with a snapshot are immutable bytes, a write copies the
+    page into a new bytearray first, so the snapshot keeps its contents.
+    """
+
+    pages:dict[int, bytearray|bytes]
+
+    def __init__(self, size:int):
+        self.size = size
+        self.pages = {}
+
+    def _check_bounds(self, address:int, length:int):
+        if address < 0 or address + length > self.size:
+            raise out_of_bounds_error(address, length)
+
+    def page(self, page_number:int) -> bytearray:
+        """
+        Returns the page with the given number for writing, allocating it
+        if it doesn't exist and copying it if it is shared with a snapshot.
+        """
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.pages[page_number] = bytearray(PAGE_SIZE)
+        elif page.__class__ is bytes:
+            page = self.pages[page_number] = bytearray(page)
+        return page
+
+    def read_word(self, address:int) -> Word:
+        self._check_bounds(address, 4)
+        offset = address & PAGE_MASK
+        if offset <= PAGE_SIZE - 4:
+            page = self.pages.get(address >> PAGE_BITS)
+            return 0 if page is None else _WORD.unpack_from(page, offset)[0]
+        return int.from_bytes(self.read_bytes(address, 4), "little")
+
+    def write_word(self, address:int, value:Word):
+        self._check_bounds(address, 4)
+        offset = address & PAGE_MASK
+        if offset <= PAGE_SIZE - 4:
+            _WORD.pack_into(self.page(address >> PAGE_BITS), offset, value & 0xFFFFFFFF)
+        else:
+            self.write_bytes(address, (value & 0xFFFFFFFF).to_bytes(4, "little"))
+
+    def read_half(self, address:int) -> int:
+        self._check_bounds(address, 2)
+        offset = address & PAGE_MASK
+        if offset <= PAGE_SIZE - 2:
+            page = self.pages.get(address >> PAGE_BITS)
+            return 0 if page is None else _HALF.unpack_from(page, offset)[0]
+        return int.from_bytes(self.read_bytes(address, 2), "little")
+
+    def write_half(self, address:int, value:int):
+        self._check_bounds(address, 2)
+        offset = address & PAGE_MASK
+        if offset <= PAGE_SIZE - 2:
+            _HALF.pack_into(self.page(address >> PAGE_BITS), offset, value & 0xFFFF)
+        else:
+            self.write_bytes(address, (value & 0xFFFF).to_bytes(2, "little"))
+
+    def read_byte(self, address:int) -> int:
+        self._check_bounds(address, 1)
+        page = self.pages.get(address >> PAGE_BITS)
+        return 0 if page is None else page[address & PAGE_MASK]
+
+    def write_byte(self, address:int, value:int):
+        self._check_bounds(address, 1)
+        self.page(address >> PAGE_BITS)[address & PAGE_MASK] = value & 0xFF
+
+    def read_bytes(self, address:int, length:int) -> bytes:
+        """
+        Reads length bytes starting at address, across pages if needed.
+        """
+        self._check_bounds(address, length)
+        data = bytearray()
+        while length > 0:
+            offset = address & PAGE_MASK
+            chunk = min(length, PAGE_SIZE - offset)
+            page = self.pages.get(address >> PAGE_BITS)
+            if page is None:
+                data += bytes(chunk)
+            else:
+                data += memoryview(page)[offset:offset + chunk]
+            address += chunk
+            length -= chunk
+        return bytes(data)
+
+    def write_bytes(self, address:int, data:bytes|bytearray|memoryview):
+        """
+        Writes data starting at address, across pages if needed.
+        """
+        data = memoryview(data).cast("B")
+        self._check_bounds(address, len(data))
+        position = 0
+        while position < len(data):
+            offset = address & PAGE_MASK
+            chunk = min(len(data) - position, PAGE_SIZE - offset)
+            self.page(address >> PAGE_BITS)[offset:offset + chunk] = data[position:position + chunk]
+            address += chunk
+            position += chunk
+
+    def clear(self, address:int, length:int):
+        """
+        Zeroes length bytes starting at address without allocating pages.
+        """
+        self._check_bounds(address, length)
+        while length > 0:
+            offset = address & PAGE_MASK
+            chunk = min(length, PAGE_SIZE - offset)
+            page_number = address >> PAGE_BITS
+            if chunk == PAGE_SIZE:
+                self.pages.pop(page_number, None)
+            elif page_number in self.pages:
+                self.page(page_number)[offset:offset + chunk] = bytes(chunk)
+            address += chunk
+            length -= chunk
+
+    def nonzero_bytes(self) -> dict[int, int]:
+        """
+        Returns every byte that holds a non zero value by address.
+        """
+        nonzero:dict[int, int] = {}
+        for page_number in sorted(self.pages):
+            page = self.pages[page_number]
+            if page.count(0) == PAGE_SIZE:
+                continue
+            base = page_number << PAGE_BITS
+            for offset, byte in enumerate(page):
+                if byte:
+                    nonzero[base + offset] = byte
+        return nonzero
+
+    def dirty_pages(self) -> list[int]:
+        """
+        Numbers of the pages written since the last snapshot, the ones
+        that are no longer shared as bytes.
+        """
+        return [page_number for page_number, page in self.pages.items() if page.__class__ is not bytes]
+
+    def snapshot(self) -> dict[int, bytes]:
+        """
+        Returns the pages as immutable bytes keyed by page number.  Pages
+        written since the last snapshot are frozen once and then shared
+        between the snapshot and this memory until either side writes.
+        """
+        for page_number, page in self.pages.items():
+            if page.__class__ is not bytes:
+                self.pages[page_number] = bytes(page)
+        return dict(self.pages)
+
+    def restore(self, pages:dict[int, bytes]):
+        """
+        Makes the memory hold the pages of a snapshot, sharing them.
+        """
+        self.pages = dict(pages)
+
+    def flush(self):
+        """
+        Nothing to write back, kept for the same interface as MappedMemory.
+        """
+
+    def close(self):
+        self.pages = {}
+
+    @property
+    def resident_bytes(self) -> int:
+        """
+        Bytes of page storage currently allocated.
+        """
+        return len(self.pages) * PAGE_SIZE
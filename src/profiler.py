@@ -0,0 +1,177 @@
+"""
+Execution profiler for guest programs.
+"""
+from array import array
+from bisect import bisect_right
+
+from assembler.instructions import LabelToken
+from control_unit import (
+    OPCODE_AUIPC_WORD, OPCODE_BRANCH_WORD, OPCODE_FLW_WORD, OPCODE_FP_WORD, OPCODE_FSW_WORD,
+    OPCODE_I_TYPE_WORD, OPCODE_JAL_WORD, OPCODE_JALR_WORD, OPCODE_LOAD_WORD, OPCODE_LUI_WORD,
+    OPCODE_MISC_WORD, OPCODE_R_TYPE_WORD, OPCODE_STORE_WORD
+)
+from decoded_instruction import DecodedInstruction
+from instruction_memory import InstructionMemory
+from memory import Word
+
+OPCODE_CLASSES = {
+    OPCODE_LOAD_WORD: "load",
+    OPCODE_STORE_WORD: "store",
+    OPCODE_I_TYPE_WORD: "alu immediate",
+    OPCODE_R_TYPE_WORD: "alu register",
+    OPCODE_LUI_WORD: "lui",
+    OPCODE_AUIPC_WORD: "auipc",
+    OPCODE_BRANCH_WORD: "branch",
+    OPCODE_JALR_WORD: "jalr",
+    OPCODE_JAL_WORD: "jal",
+    OPCODE_MISC_WORD: "misc",
+    OPCODE_FP_WORD: "fpu",
+    OPCODE_FLW_WORD: "flw",
+    OPCODE_FSW_WORD: "fsw",
+}
+
+
+class Profiler:
+    """
+    Counts how many times each instruction of the program text executed
+    and how many times each one redirected the PC (a taken branch or a
+    jump).  Everything else in the report, the opcode classes, branch and
+    memory access counts, is derived from those counters and the
+    predecoded instruction at each PC, so counting costs two array
+    updates at most per instruction.
+
+    Code can only change in unified memory.  The engine then calls retire
+    before it drops the predecoded instructions of a slot, and the counts
+    of that slot so far are kept with the instruction that produced them,
+    so the summary still classifies what actually ran.  The hot spots
+    show the word at each PC when the report is built.
+    """
+
+    def __init__(self, instruction_memory:InstructionMemory):
+        self.instruction_memory = instruction_memory
+        self.reset()
+
+    def reset(self):
+        """
+        Sizes the counters to the loaded program text and zeroes them.
+        """
+        self.base:Word = self.instruction_memory.base
+        slots = len(self.instruction_memory.decoded)
+        self.counts = array("Q", [0]) * slots
+        self.taken = array("Q", [0]) * slots
+        # Counts already kept in retired, by slot
+        self.retired_counts = array("Q", [0]) * slots
+        self.retired_taken = array("Q", [0]) * slots
+        # (instruction, count, taken) of the instructions code changes replaced
+        self.retired:list[tuple[DecodedInstruction, int, int]] = []
+
+    def count(self, pc:Word, next_pc:Word):
+        slot = (pc - self.base) >> 2
+        self.counts[slot] += 1
+        if next_pc != pc + 4:
+            self.taken[slot] += 1
+
+    def count_block(self, start:Word, length:int, next_pc:Word):
+        """
+        Counts a run of length straight-line instructions from start.
+        """
+        first = (start - self.base) >> 2
+        counts = self.counts
+        for slot in range(first, first + length):
+            counts[slot] += 1
+        if next_pc != start + 4 * length:
+            self.taken[first + length - 1] += 1
+
+    def retire(self, start:Word, end:Word):
+        """
+        Keeps the counts of the slots overlapping [start, end) with the
+        instruction currently decoded in them, before the code changes.
+        """
+        decoded = self.instruction_memory.decoded
+        first = max(start - self.base, 0) // 4
+        for slot in range(first, min((end - self.base + 3) // 4, len(decoded))):
+            count = self.counts[slot] - self.retired_counts[slot]
+            if count and decoded[slot] is not None:
+                self.retired.append((decoded[slot], count, self.taken[slot] - self.retired_taken[slot]))
+                self.retired_counts[slot] = self.counts[slot]
+                self.retired_taken[slot] = self.taken[slot]
+
+    def executed(self) -> list[tuple[Word, int]]:
+        """
+        Returns (pc, count) for every instruction that executed.
+        """
+        return [(self.base + 4 * slot, count) for slot, count in enumerate(self.counts) if count]
+
+    def summary(self) -> dict[str, int]:
+        """
+        Instruction counts by opcode class, plus the branch and memory access totals.
+        """
+        summary = {name: 0 for name in OPCODE_CLASSES.values()}
+        summary.update(other=0, total=0, branches=0, taken_branches=0, jumps=0, memory_reads=0, memory_writes=0)
+        executions = list(self.retired)
+        for pc, count in self.executed():
+            slot = (pc - self.base) >> 2
+            if count > self.retired_counts[slot]:
+                executions.append((
+                    self.instruction_memory.get_decoded(pc),
+                    count - self.retired_counts[slot],
+                    self.taken[slot] - self.retired_taken[slot]
+                ))
+        for decoded, count, taken in executions:
+            summary[OPCODE_CLASSES.get(decoded.opcode, "other")] += count
+            summary["total"] += count
+            if decoded.Branch:
+                summary["branches"] += count
+                summary["taken_branches"] += taken
+            if decoded.Jump:
+                summary["jumps"] += count
+            if decoded.MemRead:
+                summary["memory_reads"] += count
+            if decoded.MemWrite:
+                summary["memory_writes"] += count
+        return summary
+
+    def report(self, labels:dict[str, LabelToken]|None = None, top:int = 20) -> str:
+        """
+        A text hot-spot report, PCs are shown relative to the nearest
+        preceding label from the assembler's label table.
+        """
+        ordered_labels = sorted((label.address_dec, name) for name, label in (labels or {}).items())
+        label_addresses = [address for address, _ in ordered_labels]
+
+        def locate(pc:Word) -> str:
+            index = bisect_right(label_addresses, pc) - 1
+            if index < 0:
+                return f"0x{pc:08X}"
+            address, name = ordered_labels[index]
+            return name if pc == address else f"{name}+0x{pc - address:X}"
+
+        summary = self.summary()
+        total = summary["total"] or 1
+        lines = [f"Executed instructions: {summary['total']}", "", "By opcode class:"]
+        for name in list(OPCODE_CLASSES.values()) + ["other"]:
+            if summary.get(name):
+                lines.append(f"  {name:<14}{summary[name]:>12}  {100 * summary[name] / total:6.2f}%")
+        lines.append("")
+        lines.append(f"Branches: {summary['branches']}  taken: {summary['taken_branches']}  jumps: {summary['jumps']}")
+        lines.append(f"Memory reads: {summary['memory_reads']}  writes: {summary['memory_writes']}")
+
+        if ordered_labels:
+            routines:dict[str, int] = {}
+            for pc, count in self.executed():
+                index = bisect_right(label_addresses, pc) - 1
+                name = ordered_labels[index][1] if index >= 0 else "(no label)"
+                routines[name] = routines.get(name, 0) + count
+            lines.append("")
+            lines.append("By label:")
+            for name, count in sorted(routines.items(), key=lambda item: -item[1])[:top]:
+                lines.append(f"  {name:<24}{count:>12}  {100 * count / total:6.2f}%")
+
+        lines.append("")
+        lines.append("Hot spots:")
+        for pc, count in sorted(self.executed(), key=lambda item: -item[1])[:top]:
+            decoded = self.instruction_memory.get_decoded(pc)
+            slot = (pc - self.base) >> 2
+            taken = f"  taken {self.taken[slot]}" if decoded.Branch else ""
+            lines.append(f"  0x{pc:08X}  {locate(pc):<24}0x{decoded.word:08X}{count:>12}  {100 * count / total:6.2f}%{taken}")
+        return "\n".join(lines)
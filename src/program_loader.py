@@ -0,0 +1,123 @@
+"""
+Loads flat binaries and RV32 ELF executables without a hex text round trip.
+"""
+from dataclasses import dataclass, field
+from memory import Word
+
+import struct
+import sys
+
+ELF_MAGIC = b"\x7fELF"
+ELFCLASS32 = 1
+ELFDATA2LSB = 1
+EM_RISCV = 0xF3
+PT_LOAD = 1
+PF_X = 0x1
+
+# e_ident through e_shstrndx of an Elf32_Ehdr
+_ELF32_HEADER = struct.Struct("<16sHHIIIIIHHHHHH")
+# p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align
+_ELF32_PROGRAM_HEADER = struct.Struct("<IIIIIIII")
+
+
+@dataclass
+class Segment:
+    address:Word
+    # The bytes in the file, a view into the loaded file
+    data:memoryview
+    # Size in memory, the bytes past data are zero (.bss)
+    memory_size:int
+
+
+@dataclass
+class LoadedProgram:
+    entry:Word
+    # Address of the first instruction word
+    text_base:Word
+    instructions:list[Word]
+    segments:list[Segment] = field(default_factory=list)
+
+
+def words_from_bytes(data:bytes|memoryview) -> list[Word]:
+    """
+    Little endian 32-bit words of data, zero padded to a whole word.
+    """
+    data = memoryview(data).cast("B")
+    if len(data) % 4:
+        data = memoryview(bytes(data) + bytes(4 - len(data) % 4))
+    if sys.byteorder == "little":
+        return data.cast("I").tolist()
+    return [word for (word,) in struct.iter_unpack("<I", data)]
+
+
+def load_flat_binary(data:bytes|memoryview, base:Word = 0) -> LoadedProgram:
+    """
+    A raw image placed at base, every word is an instruction and the
+    whole image is also loaded into data memory.  Execution starts at base.
+    """
+    view = memoryview(data).cast("B")
+    return LoadedProgram(base, base, words_from_bytes(view), [Segment(base, view, len(view))])
+
+
+def load_elf(data:bytes|memoryview) -> LoadedProgram:
+    """
+    Reads the PT_LOAD segments of a little endian RV32 ELF executable.
+    Every segment is loaded into data memory and the executable ones
+    are also loaded into instruction memory, with any gap between them
+    filled with zero words.
+    """
+    view = memoryview(data).cast("B")
+    if len(view) < _ELF32_HEADER.size or bytes(view[:4]) != ELF_MAGIC:
+        raise ValueError("Not an ELF file.")
+    (ident, _e_type, e_machine, _e_version, e_entry, e_phoff, _e_shoff, _e_flags,
+        _e_ehsize, e_phentsize, e_phnum, _e_shentsize, _e_shnum, _e_shstrndx) = _ELF32_HEADER.unpack_from(view)
+    if ident[4] != ELFCLASS32 or ident[5] != ELFDATA2LSB:
+        raise ValueError("Only 32-bit little endian ELF files are supported.")
+    if e_machine != EM_RISCV:
+        raise ValueError(f"Not a RISC-V ELF file, e_machine is {hex(e_machine)}.")
+
+    if e_phnum and e_phentsize < _ELF32_PROGRAM_HEADER.size:
+        raise ValueError(f"Program headers of {e_phentsize} bytes are too small.")
+    if e_phnum and e_phoff + (e_phnum - 1) * e_phentsize + _ELF32_PROGRAM_HEADER.size > len(view):
+        raise ValueError("The program header table extends past the end of the file.")
+
+    segments:list[Segment] = []
+    text_segments:list[Segment] = []
+    for index in range(e_phnum):
+        (p_type, p_offset, p_vaddr, _p_paddr, p_filesz, p_memsz, p_flags,
+            _p_align) = _ELF32_PROGRAM_HEADER.unpack_from(view, e_phoff + index * e_phentsize)
+        if p_type != PT_LOAD or p_memsz == 0:
+            continue
+        if p_offset + p_filesz > len(view):
+            raise ValueError(f"Segment {index} extends past the end of the file.")
+        segment = Segment(p_vaddr, view[p_offset:p_offset + p_filesz], p_memsz)
+        segments.append(segment)
+        if p_flags & PF_X:
+            text_segments.append(segment)
+
+    if not text_segments:
+        return LoadedProgram(e_entry, e_entry, [], segments)
+
+    text_base = min(segment.address for segment in text_segments) & ~3
+    text_end = max(segment.address + segment.memory_size for segment in text_segments)
+    text = bytearray(text_end - text_base)
+    for segment in text_segments:
+        start = segment.address - text_base
+        text[start:start + len(segment.data)] = segment.data
+    return LoadedProgram(e_entry, text_base, words_from_bytes(text), segments)
+
+
+def is_elf(path:str) -> bool:
+    with open(path, "rb") as fp:
+        return fp.read(4) == ELF_MAGIC
+
+
+def load_file(path:str) -> LoadedProgram:
+    """
+    Loads an ELF executable, detected by its magic, or else a flat binary at address 0.
+    """
+    with open(path, "rb") as fp:
+        data = fp.read()
+    if data[:4] == ELF_MAGIC:
+        return load_elf(data)
+    return load_flat_binary(data)
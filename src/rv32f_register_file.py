@@ -1,17 +1,31 @@
-from memory import Bit, Bitx32, Bitx5, bin_to_dec
+from memory import Bit, Bitx32, Bitx5, Word, bin_to_dec, int_to_bits, repr_bits
 from register import Register32bit, Register16bit, Register8bit, FloatRegister32bit, Register
-from encoder_decoder import decoder5x32, one_hot_to_decimal
+from encoder_decoder import REGISTER_INDEX, decoder5x32, one_hot_to_decimal
 
 import os
 
 class RV32FRegisterFile:
 
-    def __init__(self):
-        self.registers:list[FloatRegister32bit] = [FloatRegister32bit() for _ in range(32)]
+    def __init__(self, packed:bool = False, gate_decoder:bool = False):
+        """
+        In packed mode registers are stored as plain ints and update
+        takes packed register addresses and data.
+
+        Register addresses are looked up directly unless gate_decoder is
+        set, which routes them through the gate-level decoder5x32.
+        """
+        self.packed = packed
+        self.gate_decoder = gate_decoder
+        if packed:
+            self.registers:list[Word] = [0] * 32
+        else:
+            self.registers:list[FloatRegister32bit] = [FloatRegister32bit() for _ in range(32)]
 
     def __repr__(self) -> str:
         display_list:list[str] = []
         for r_n, register in enumerate(self.registers):
+            if self.packed:
+                register = repr_bits(int_to_bits(register, 32)).rstrip()
             display_list.append(f"f{r_n:<2} {register}")
         
         lines:list[str] = []
@@ -32,14 +46,22 @@ class RV32FRegisterFile:
         return "\n".join(lines)
             
 
-    def update(self, read_reg_1_adr:Bitx5, read_reg_2_adr:Bitx5, write_reg_adr:Bitx5, write_data:Bitx32, control_reg_write:Bit) -> tuple[Bitx32, Bitx32]:
-        read_reg_1_pos_one_hot = decoder5x32(*read_reg_1_adr)
-        read_reg_2_pos_one_hot = decoder5x32(*read_reg_2_adr)
-        write_reg_pos_one_hot = decoder5x32(*write_reg_adr)
+    def update(self, read_reg_1_adr:Bitx5|int, read_reg_2_adr:Bitx5|int, write_reg_adr:Bitx5|int, write_data:Bitx32|Word, control_reg_write:Bit) -> tuple[Bitx32, Bitx32]|tuple[Word, Word]:
+        if self.packed:
+            return self.update_word(read_reg_1_adr, read_reg_2_adr, write_reg_adr, write_data, control_reg_write)
+
+        if self.gate_decoder:
+            read_reg_1_pos_one_hot = decoder5x32(*read_reg_1_adr)
+            read_reg_2_pos_one_hot = decoder5x32(*read_reg_2_adr)
+            write_reg_pos_one_hot = decoder5x32(*write_reg_adr)
 
-        read_reg_1_pos = one_hot_to_decimal(read_reg_1_pos_one_hot)
-        read_reg_2_pos = one_hot_to_decimal(read_reg_2_pos_one_hot)
-        write_reg_pos = one_hot_to_decimal(write_reg_pos_one_hot)
+            read_reg_1_pos = one_hot_to_decimal(read_reg_1_pos_one_hot)
+            read_reg_2_pos = one_hot_to_decimal(read_reg_2_pos_one_hot)
+            write_reg_pos = one_hot_to_decimal(write_reg_pos_one_hot)
+        else:
+            read_reg_1_pos = REGISTER_INDEX[read_reg_1_adr]
+            read_reg_2_pos = REGISTER_INDEX[read_reg_2_adr]
+            write_reg_pos = REGISTER_INDEX[write_reg_adr]
 
         # Read first
         read1 = self.registers[read_reg_1_pos].read_bits()
@@ -51,5 +73,13 @@ class RV32FRegisterFile:
             write_reg.write_bits(write_data)
 
         return read1, read2
-        
 
+    def update_word(self, read_reg_1_adr:int, read_reg_2_adr:int, write_reg_adr:int, write_data:Word, control_reg_write:Bit) -> tuple[Word, Word]:
+        # Read first
+        read1 = self.registers[read_reg_1_adr]
+        read2 = self.registers[read_reg_2_adr]
+
+        if control_reg_write:
+            self.registers[write_reg_adr] = write_data
+
+        return read1, read2
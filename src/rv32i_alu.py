@@ -1,16 +1,30 @@
-from memory import Bit, Bitx12, Bitx32, Bitx4, bin_to_dec, dec_to_bin
+from memory import MASK32, Bit, Bitx12, Bitx32, Bitx4, Word, bin_to_dec, bits_to_word, dec_to_bin, word_to_bits, word_to_signed
 
 import rv32i_alu_control as ac
 import gates as g
 
+# RV32IALU modes
+MODE_GATE = "gate" # Bit by bit through gates.py
+MODE_WORD = "word" # Whole words with native int operations
+
 class RV32IALU:
-    def __init__(self):
-        pass
+    def __init__(self, mode:str = MODE_GATE):
+        """
+        mode selects how update computes bit tuple results, both modes
+        match bit for bit.
+        """
+        if mode not in (MODE_GATE, MODE_WORD):
+            raise ValueError(f"Unknown RV32IALU mode '{mode}', expected '{MODE_GATE}' or '{MODE_WORD}'")
+        self.mode = mode
     
     def update(self, operation:Bitx4, read_data_1:Bitx32, read_data_2:Bitx32) -> tuple[Bit, Bitx32]:
         """
         Returns Zero bit signal and 32-bit alu result.
         """
+        if self.mode == MODE_WORD:
+            zero, res = self.update_word(operation, bits_to_word(read_data_1), bits_to_word(read_data_2))
+            return zero, word_to_bits(res)
+
         match operation:
             case ac.CTRL_ALU_ADD:
                 return self.op_add(read_data_1, read_data_2)
@@ -37,35 +51,41 @@ class RV32IALU:
             
     @staticmethod
     def compute_zero(res: Bitx32) -> Bit:
-        return int(all(b == 0 for b in res))
+        # OR of every bit rather than all(), so bit slices work too
+        any_bit:Bit = 0
+        for bit in res:
+            any_bit |= bit
+        return any_bit ^ 1
 
     @staticmethod
-    def op_add(read_data_1:Bitx32, read_data_2:Bitx32) -> tuple[Bit, Bitx32]:
+    def ripple_add(read_data_1:Bitx32, read_data_2:Bitx32, carry:Bit = 0) -> tuple[Bit, Bitx32]:
+        """
+        Ripple-carry adder, the zero signal is tracked while adding.
+
+        With bit slices (a NumPy bool array per bit position, see gates.py)
+        every position is one vector step across all the instances, and the
+        zero signal is an array too.
+        """
         res_list = [0] * 32
-        carry:Bit = 0
+        any_bit:Bit = 0
         for b_n in range(32):
             bit, carry = g.one_bit_adder(read_data_1[b_n], read_data_2[b_n], carry)
             res_list[b_n] = bit
+            any_bit |= bit
 
-        res = tuple(res_list)
-        zero = RV32IALU.compute_zero(res)
-        return zero, res
+        return any_bit ^ 1, tuple(res_list)
 
+    @staticmethod
+    def op_add(read_data_1:Bitx32, read_data_2:Bitx32) -> tuple[Bit, Bitx32]:
+        return RV32IALU.ripple_add(read_data_1, read_data_2)
 
-    @classmethod
-    def op_sub(cls, read_data_1:Bitx32, read_data_2:Bitx32):
-        # Get read_data_2 NOT
-        rd2_not_list = [0] * 32
-        for n, bit_rd2 in enumerate(read_data_2):
-            rd2_not_list[n] = int(not bit_rd2)
-        rd2_not = tuple(rd2_not_list)
 
-        # Now add 1 to it:
-        _, rd2_2s_comp = cls.op_add(rd2_not, dec_to_bin(1,32))
-        
-        return cls.op_add(read_data_1, rd2_2s_comp)
+    @staticmethod
+    def op_sub(read_data_1:Bitx32, read_data_2:Bitx32):
+        # a - b = a + NOT b + 1, the +1 is the carry in of a single ripple add
+        rd2_not = tuple(g.not_gate(bit_rd2) for bit_rd2 in read_data_2)
+        return RV32IALU.ripple_add(read_data_1, rd2_not, 1)
 
-        
     
     @staticmethod
     def op_and(read_data_1:Bitx32, read_data_2:Bitx32):
@@ -99,23 +119,24 @@ class RV32IALU:
 
     @staticmethod
     def op_sll(read_data_1:Bitx32, read_data_2:Bitx32):
-        shift = min(bin_to_dec(read_data_2[0:5]), 32)
-        res = read_data_1[shift:] + tuple(0 for _ in range(shift))
+        # Shifting left moves bits towards the end of the LSB-first tuple
+        shift = bin_to_dec(read_data_2[0:5])
+        res = tuple(0 for _ in range(shift)) + read_data_1[:32 - shift]
         zero = RV32IALU.compute_zero(res)
         return zero, res
 
     @staticmethod
     def op_srl(read_data_1:Bitx32, read_data_2:Bitx32):
-        shift = min(bin_to_dec(read_data_2[0:5]), 32)
-        res = tuple(0 for _ in range(shift)) + read_data_1[:32 - shift]
+        shift = bin_to_dec(read_data_2[0:5])
+        res = read_data_1[shift:] + tuple(0 for _ in range(shift))
         zero = RV32IALU.compute_zero(res)
         return zero, res
 
     @staticmethod
     def op_sra(read_data_1:Bitx32, read_data_2:Bitx32):
-        shift = min(bin_to_dec(read_data_2[0:5]), 32)
+        shift = bin_to_dec(read_data_2[0:5])
         sign_bit = read_data_1[31]
-        res = tuple(sign_bit for _ in range(shift)) + read_data_1[:32 - shift]
+        res = read_data_1[shift:] + tuple(sign_bit for _ in range(shift))
         zero = RV32IALU.compute_zero(res)
         return zero, res
 
@@ -139,4 +160,71 @@ class RV32IALU:
         result = 1 if val_a < val_b else 0
         res = (result,) + (0,) * 31
         zero = RV32IALU.compute_zero(res)
-        return zero, res
\ No newline at end of file
+        return zero, res
+
+    def update_word(self, operation:Bitx4, read_data_1:Word, read_data_2:Word) -> tuple[Bit, Word]:
+        """
+        Packed word version of update.
+        Returns Zero bit signal and 32-bit alu result as an unsigned int.
+        """
+        word_op = WORD_OPERATIONS.get(operation)
+        if word_op is None:
+            raise RuntimeError(f"RV32IALU Operation not supported {operation}")
+        res = word_op(read_data_1, read_data_2)
+        return int(res == 0), res
+
+    # Packed word operations, these must match the bit tuple operations above bit for bit.
+
+    @staticmethod
+    def word_add(read_data_1:Word, read_data_2:Word) -> Word:
+        return (read_data_1 + read_data_2) & MASK32
+
+    @staticmethod
+    def word_sub(read_data_1:Word, read_data_2:Word) -> Word:
+        return (read_data_1 - read_data_2) & MASK32
+
+    @staticmethod
+    def word_and(read_data_1:Word, read_data_2:Word) -> Word:
+        return read_data_1 & read_data_2
+
+    @staticmethod
+    def word_or(read_data_1:Word, read_data_2:Word) -> Word:
+        return read_data_1 | read_data_2
+
+    @staticmethod
+    def word_xor(read_data_1:Word, read_data_2:Word) -> Word:
+        return read_data_1 ^ read_data_2
+
+    @staticmethod
+    def word_sll(read_data_1:Word, read_data_2:Word) -> Word:
+        return (read_data_1 << (read_data_2 & 0x1F)) & MASK32
+
+    @staticmethod
+    def word_srl(read_data_1:Word, read_data_2:Word) -> Word:
+        return read_data_1 >> (read_data_2 & 0x1F)
+
+    @staticmethod
+    def word_sra(read_data_1:Word, read_data_2:Word) -> Word:
+        return (word_to_signed(read_data_1) >> (read_data_2 & 0x1F)) & MASK32
+
+    @staticmethod
+    def word_slt(read_data_1:Word, read_data_2:Word) -> Word:
+        return 1 if word_to_signed(read_data_1) < word_to_signed(read_data_2) else 0
+
+    @staticmethod
+    def word_sltu(read_data_1:Word, read_data_2:Word) -> Word:
+        return 1 if read_data_1 < read_data_2 else 0
+
+
+WORD_OPERATIONS = {
+    ac.CTRL_ALU_ADD: RV32IALU.word_add,
+    ac.CTRL_ALU_SUB: RV32IALU.word_sub,
+    ac.CTRL_ALU_AND: RV32IALU.word_and,
+    ac.CTRL_ALU_OR: RV32IALU.word_or,
+    ac.CTRL_ALU_XOR: RV32IALU.word_xor,
+    ac.CTRL_ALU_SLL: RV32IALU.word_sll,
+    ac.CTRL_ALU_SRL: RV32IALU.word_srl,
+    ac.CTRL_ALU_SRA: RV32IALU.word_sra,
+    ac.CTRL_ALU_SLT: RV32IALU.word_slt,
+    ac.CTRL_ALU_SLTU: RV32IALU.word_sltu,
+}
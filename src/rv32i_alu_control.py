@@ -1,4 +1,4 @@
-from memory import Bit, Bitx2, Bitx3
+from memory import Bit, Bitx2, Bitx3, int_to_bits
 
 CTRL_ALU_ADD = (0,0,0,0)
 CTRL_ALU_SUB = (0,0,0,1)
@@ -11,20 +11,25 @@ CTRL_ALU_SRA = (0,1,1,1)
 CTRL_ALU_SLT = (1,0,0,0)
 CTRL_ALU_SLTU = (1,0,0,1)
 
+# Every funct3 value as an LSB-first tuple, indexed by its packed value.
+FUNCT3_BITS:tuple[Bitx3,...] = tuple(int_to_bits(funct3, 3) for funct3 in range(8))
+
 class RV32IALUControl:
     def __init__(self):
         pass
 
     def update(self, ALUOp:Bitx2, funct3:Bitx3, funct7_bit_30:Bit):
 
+        # funct3 is LSB-first, (1,0,0) is funct3 = 0b001
         if ALUOp == (0,0):
             return CTRL_ALU_ADD
         elif ALUOp == (0,1):
-            if funct3 in {(0,0,1), (0,0,0)}:
+            # beq/bne compare with SUB, blt/bge with SLT and bltu/bgeu with SLTU
+            if funct3 in {(0,0,0), (1,0,0)}:
                 return CTRL_ALU_SUB
-            if funct3 in {(1,0,0), (1,0,1)}:
+            if funct3 in {(0,0,1), (1,0,1)}:
                 return CTRL_ALU_SLT
-            if funct3 in {(1,1,0), (1,1,1)}:
+            if funct3 in {(0,1,1), (1,1,1)}:
                 return CTRL_ALU_SLTU
         elif ALUOp == (1,0):
             if funct3 == (0,0,0):
@@ -32,23 +37,28 @@ class RV32IALUControl:
                     return CTRL_ALU_SUB
                 else:
                     return CTRL_ALU_ADD
-            if funct3 == (0,0,1):
+            if funct3 == (1,0,0):
                 return CTRL_ALU_SLL
             if funct3 == (0,1,0):
                 return CTRL_ALU_SLT
-            if funct3 == (0,1,1):
+            if funct3 == (1,1,0):
                 return CTRL_ALU_SLTU
-            if funct3 == (1,0,0):
+            if funct3 == (0,0,1):
                 return CTRL_ALU_XOR
             if funct3 == (1,0,1):
                 if funct7_bit_30:
                     return CTRL_ALU_SRA
                 else:
                     return CTRL_ALU_SRL
-            if funct3 == (1,1,0):
+            if funct3 == (0,1,1):
                 return CTRL_ALU_OR
             if funct3 == (1,1,1):
                 return CTRL_ALU_AND
             
         raise RuntimeError(f"Unsupported RV32IALUControl input:\nALUOp {ALUOp}\nfunct3{funct3}\nfunct7_bit_30{funct7_bit_30}")
-        
\ No newline at end of file
+
+    def update_word(self, ALUOp:Bitx2, funct3:int, funct7_bit_30:Bit):
+        """
+        Same as update but takes a packed funct3.
+        """
+        return self.update(ALUOp, FUNCT3_BITS[funct3 & 0x7], funct7_bit_30)
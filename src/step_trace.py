@@ -0,0 +1,296 @@
+"""
+Structured step traces.
+
+Engines write one fixed-size record per executed instruction into a
+trace sink instead of printing it.  The human readable rendering is
+done offline from the trace file with `riscv-trace {trace file}`.
+"""
+from abc import ABC, abstractmethod
+from array import array
+from typing import Iterator, NamedTuple
+
+from control_unit import ControlUnit
+
+import argparse
+import json
+import struct
+import sys
+
+TRACE_MAGIC = b"RVTRACE1"
+
+# Record flags
+TRACE_INT_WRITE = 0x1
+TRACE_FP_WRITE = 0x2
+TRACE_MEM_READ = 0x4
+TRACE_MEM_WRITE = 0x8
+# A translated block was entered, the value is its length
+TRACE_BLOCK = 0x10
+
+# step, pc, instruction, next_pc, rd_value, mem_address, mem_data, rd, flags
+RECORD = struct.Struct("<QIIIIIIBB2x")
+
+
+class TraceRecord(NamedTuple):
+    step:int
+    pc:int
+    instruction:int
+    next_pc:int
+    rd_value:int
+    mem_address:int
+    mem_data:int
+    rd:int
+    flags:int
+
+
+def signal_flags(signals, rd:int) -> int:
+    """
+    Record flags of an instruction from its ControlUnit (or
+    DecodedInstruction) signals.
+    """
+    flags = 0
+    if signals.FPRegWrite or signals.IntToFP:
+        flags |= TRACE_FP_WRITE
+    elif (signals.RegWrite or signals.FPToInt) and rd != 0:
+        flags |= TRACE_INT_WRITE
+    if signals.MemRead:
+        flags |= TRACE_MEM_READ
+    if signals.MemWrite:
+        flags |= TRACE_MEM_WRITE
+    return flags
+
+
+class TraceSink(ABC):
+    """
+    Receives one record per executed instruction.
+    """
+
+    @abstractmethod
+    def record(self, step:int, pc:int, instruction:int, next_pc:int, rd_value:int, mem_address:int, mem_data:int, rd:int, flags:int):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BinaryTraceSink(TraceSink):
+    """
+    Writes packed RECORD structs after the TRACE_MAGIC header through a large write buffer.
+    """
+
+    def __init__(self, path:str, buffer_size:int = 1 << 20):
+        self.file = open(path, "wb", buffering=buffer_size)
+        self.file.write(TRACE_MAGIC)
+        self._pack = RECORD.pack
+
+    def record(self, step, pc, instruction, next_pc, rd_value, mem_address, mem_data, rd, flags):
+        self.file.write(self._pack(step, pc, instruction, next_pc, rd_value, mem_address, mem_data, rd, flags))
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesTraceSink(TraceSink):
+    """
+    Writes one JSON object per line through a large write buffer.
+    """
+
+    def __init__(self, path:str, buffer_size:int = 1 << 20):
+        self.file = open(path, "w", buffering=buffer_size)
+
+    def record(self, step, pc, instruction, next_pc, rd_value, mem_address, mem_data, rd, flags):
+        self.file.write(
+            f'{{"step":{step},"pc":{pc},"instruction":{instruction},"next_pc":{next_pc},'
+            f'"rd_value":{rd_value},"mem_address":{mem_address},"mem_data":{mem_data},"rd":{rd},"flags":{flags}}}\n'
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class RingBufferTraceSink(TraceSink):
+    """
+    Keeps the last capacity records in a preallocated buffer.
+    """
+
+    def __init__(self, capacity:int = 4096):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.count = 0
+        self._pack_into = RECORD.pack_into
+
+    def record(self, step, pc, instruction, next_pc, rd_value, mem_address, mem_data, rd, flags):
+        self._pack_into(self.buffer, (self.count % self.capacity) * RECORD.size,
+            step, pc, instruction, next_pc, rd_value, mem_address, mem_data, rd, flags)
+        self.count += 1
+
+    def records(self) -> list[TraceRecord]:
+        """
+        Returns the kept records, oldest first.
+        """
+        kept = min(self.count, self.capacity)
+        first = self.count - kept
+        return [
+            TraceRecord._make(RECORD.unpack_from(self.buffer, (index % self.capacity) * RECORD.size))
+            for index in range(first, self.count)
+        ]
+
+    def dump(self, path:str):
+        """
+        Writes the kept records to a binary trace file.
+        """
+        with BinaryTraceSink(path) as sink:
+            for record in self.records():
+                sink.record(*record)
+
+
+class PostMortemBuffer:
+    """
+    Always-on ring of the last executed instructions, kept in preallocated
+    arrays so recording allocates nothing and its memory stays fixed
+    however long the run is.
+
+    The entry of step n is kept in slot n & mask (the capacity is rounded
+    up to a power of two), so recording stores the pc, the instruction
+    word, the value written (the store data for stores) and the memory
+    address, and nothing else.  rd and the record flags are
+    derived from the instruction word when the entries are read.  A
+    translated block is kept as one entry in the slot of its last step,
+    with an instruction word of 0 and its length as the value.
+    """
+
+    def __init__(self, capacity:int = 64):
+        capacity = 1 << max(capacity - 1, 0).bit_length()
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.pcs = array("I", bytes(4 * capacity))
+        self.instructions = array("I", bytes(4 * capacity))
+        self.values = array("I", bytes(4 * capacity))
+        self.addresses = array("I", bytes(4 * capacity))
+
+    def record(self, step:int, pc:int, instruction:int, value:int, address:int):
+        slot = step & self.mask
+        self.pcs[slot] = pc
+        self.instructions[slot] = instruction
+        self.values[slot] = value
+        self.addresses[slot] = address
+
+    def record_block(self, last_step:int, pc:int, length:int):
+        slot = last_step & self.mask
+        self.pcs[slot] = pc
+        self.instructions[slot] = 0
+        self.values[slot] = length
+        self.addresses[slot] = 0
+
+    def records(self, step_count:int) -> list[TraceRecord]:
+        """
+        Returns the entries of the last capacity steps before step_count
+        as trace records, oldest first.  The next pc of each record is the
+        pc of the one after it, 0 for the last.
+        """
+        # Walk back from the newest step, a block entry covers its length
+        kept:list[tuple[int, int]] = []
+        step = step_count - 1
+        while step >= max(step_count - self.capacity, 0):
+            slot = step & self.mask
+            if self.instructions[slot] == 0:
+                step -= self.values[slot]
+                kept.append((step + 1, slot))
+            else:
+                kept.append((step, slot))
+                step -= 1
+        kept.reverse()
+
+        control = ControlUnit()
+        records:list[TraceRecord] = []
+        for position, (step, slot) in enumerate(kept):
+            instruction = self.instructions[slot]
+            if instruction:
+                rd = (instruction >> 7) & 0x1F
+                control.decode_word(instruction & 0x7F)
+                flags = signal_flags(control, rd)
+            else:
+                rd = 0
+                flags = TRACE_BLOCK
+            value = self.values[slot]
+            address = self.addresses[slot]
+            writes_register = flags & (TRACE_INT_WRITE | TRACE_FP_WRITE | TRACE_BLOCK)
+            accesses_memory = flags & (TRACE_MEM_READ | TRACE_MEM_WRITE)
+            records.append(TraceRecord(
+                step,
+                self.pcs[slot],
+                instruction,
+                self.pcs[kept[position + 1][1]] if position + 1 < len(kept) else 0,
+                value if writes_register else 0,
+                address if accesses_memory else 0,
+                value if accesses_memory else 0,
+                rd,
+                flags
+            ))
+        return records
+
+    def render(self, step_count:int) -> str:
+        return "\n".join(render_record(record) for record in self.records(step_count))
+
+    def dump(self, path:str, step_count:int):
+        """
+        Writes the kept entries to a binary trace file.
+        """
+        with BinaryTraceSink(path) as sink:
+            for record in self.records(step_count):
+                sink.record(*record)
+
+
+def read_trace(path:str) -> Iterator[TraceRecord]:
+    """
+    Reads a binary or JSON Lines trace file.
+    """
+    with open(path, "rb") as fp:
+        binary = fp.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+        if binary:
+            while chunk := fp.read(RECORD.size * 4096):
+                for values in RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % RECORD.size]):
+                    yield TraceRecord._make(values)
+            return
+    with open(path, "r") as fp:
+        for line in fp:
+            if line.strip():
+                yield TraceRecord(**json.loads(line))
+
+
+def render_record(record:TraceRecord) -> str:
+    if record.flags & TRACE_BLOCK:
+        return f"STEP #{record.step}  pc 0x{record.pc:08X}  block of {record.rd_value} instructions"
+    parts = [f"STEP #{record.step}  pc 0x{record.pc:08X}  instruction 0x{record.instruction:08X}"]
+    if record.flags & TRACE_MEM_READ:
+        parts.append(f"MEMORY READ at: 0x{record.mem_address:08X}  data: 0x{record.mem_data:08X}")
+    if record.flags & TRACE_MEM_WRITE:
+        parts.append(f"MEMORY WRITE at: 0x{record.mem_address:08X}  data: 0x{record.mem_data:08X}")
+    if record.flags & TRACE_INT_WRITE:
+        parts.append(f"x{record.rd} = 0x{record.rd_value:08X}")
+    if record.flags & TRACE_FP_WRITE:
+        parts.append(f"f{record.rd} = 0x{record.rd_value:08X}")
+    parts.append(f"next pc 0x{record.next_pc:08X}")
+    return "\n\t".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Renders a binary or JSON Lines step trace written with riscv-sim --trace.",
+        usage="riscv-trace {trace file path}"
+    )
+    parser.add_argument("trace", help="Path to the trace file.")
+    args = parser.parse_args()
+
+    write = sys.stdout.write
+    for record in read_trace(args.trace):
+        write(render_record(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Lockstep engine running many instances of one program with NumPy.
+"""
+from typing import Callable
+
+import time
+
+import numpy as np
+
+import rv32i_alu_control as ac
+from datapath import (
+    EBREAK_WORD, ECALL_WORD, EXIT_BUDGET, EXIT_EBREAK, EXIT_ECALL, EXIT_END, EXIT_ERROR, EXIT_TIMEOUT, DataPath
+)
+from decoded_instruction import DecodedInstruction, SRC1_INT_RS1, SRC1_PC, SRC1_ZERO
+from fpu import FPU
+from instruction_memory import InstructionMemory
+from memory import MASK32, Word
+from paged_memory import PAGE_BITS, PAGE_MASK, PAGE_SIZE, out_of_bounds_error
+
+# Exit codes kept per instance, indexes into EXIT_REASONS
+RUNNING = 0
+EXIT_REASONS = (None, EXIT_END, EXIT_BUDGET, EXIT_TIMEOUT, EXIT_ECALL, EXIT_EBREAK, EXIT_ERROR)
+EXIT_CODES = {reason: code for code, reason in enumerate(EXIT_REASONS) if reason is not None}
+
+
+def _sra(a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    return (a.view(np.int32) >> (b & 0x1F).astype(np.int32)).view(np.uint32)
+
+
+def _slt(a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    return (a.view(np.int32) < b.view(np.int32)).astype(np.uint32)
+
+
+# The RV32IALU operations on uint32 arrays, these must match WORD_OPERATIONS in rv32i_alu.py
+VECTOR_OPERATIONS:dict[tuple, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+    ac.CTRL_ALU_ADD: np.add,
+    ac.CTRL_ALU_SUB: np.subtract,
+    ac.CTRL_ALU_AND: np.bitwise_and,
+    ac.CTRL_ALU_OR: np.bitwise_or,
+    ac.CTRL_ALU_XOR: np.bitwise_xor,
+    ac.CTRL_ALU_SLL: lambda a, b: a << (b & 0x1F),
+    ac.CTRL_ALU_SRL: lambda a, b: a >> (b & 0x1F),
+    ac.CTRL_ALU_SRA: _sra,
+    ac.CTRL_ALU_SLT: _slt,
+    ac.CTRL_ALU_SLTU: lambda a, b: (a < b).astype(np.uint32),
+}
+
+
+class VectorMemory:
+    """
+    Little endian memory of every instance, made of lazily allocated
+    4 KiB pages like PagedMemory.  A page holds the page of every
+    instance as an (instances, PAGE_SIZE) uint8 array, so the same
+    address is read or written across all instances with one gather or
+    scatter.
+    """
+
+    pages:dict[int, np.ndarray]
+
+    def __init__(self, instances:int, size:int):
+        self.instances = instances
+        self.size = size
+        self.pages = {}
+
+    def out_of_bounds(self, addresses:np.ndarray, length:int) -> np.ndarray:
+        return addresses.astype(np.int64) + length > self.size
+
+    def page(self, page_number:int) -> np.ndarray:
+        page = self.pages.get(page_number)
+        if page is None:
+            page = self.pages[page_number] = np.zeros((self.instances, PAGE_SIZE), np.uint8)
+        return page
+
+    def read_word(self, lanes:np.ndarray, addresses:np.ndarray) -> np.ndarray:
+        """
+        Reads the word at addresses[i] of instance lanes[i].
+        """
+        result = np.zeros(len(lanes), np.uint32)
+        page_numbers = addresses >> PAGE_BITS
+        offsets = addresses & PAGE_MASK
+        aligned = (offsets & 3) == 0
+        for page_number in np.unique(page_numbers[aligned]):
+            page = self.pages.get(int(page_number))
+            if page is not None:
+                selected = aligned & (page_numbers == page_number)
+                result[selected] = page.view("<u4")[lanes[selected], offsets[selected] >> 2]
+        for index in np.flatnonzero(~aligned):
+            result[index] = int.from_bytes(self.read_bytes(int(lanes[index]), int(addresses[index]), 4), "little")
+        return result
+
+    def write_word(self, lanes:np.ndarray, addresses:np.ndarray, values:np.ndarray):
+        """
+        Writes values[i] to the word at addresses[i] of instance lanes[i].
+        """
+        page_numbers = addresses >> PAGE_BITS
+        offsets = addresses & PAGE_MASK
+        aligned = (offsets & 3) == 0
+        for page_number in np.unique(page_numbers[aligned]):
+            selected = aligned & (page_numbers == page_number)
+            self.page(int(page_number)).view("<u4")[lanes[selected], offsets[selected] >> 2] = values[selected]
+        for index in np.flatnonzero(~aligned):
+            self.write_bytes(int(lanes[index]), int(addresses[index]), int(values[index]).to_bytes(4, "little"))
+
+    def read_bytes(self, lane:int, address:int, length:int) -> bytes:
+        data = bytearray()
+        for byte_address in range(address, address + length):
+            page = self.pages.get(byte_address >> PAGE_BITS)
+            data.append(0 if page is None else int(page[lane, byte_address & PAGE_MASK]))
+        return bytes(data)
+
+    def write_bytes(self, lane:int, address:int, data:bytes):
+        for byte_address, value in enumerate(data, address):
+            self.page(byte_address >> PAGE_BITS)[lane, byte_address & PAGE_MASK] = value
+
+    def nonzero_bytes(self, lane:int) -> dict[int, int]:
+        """
+        Returns every non zero byte of one instance by address.
+        """
+        result:dict[int, int] = {}
+        for page_number in sorted(self.pages):
+            page = self.pages[page_number][lane]
+            for offset in np.flatnonzero(page):
+                result[(page_number << PAGE_BITS) + int(offset)] = int(page[offset])
+        return result
+
+
+class VectorDataPath:
+    """
+    Runs one program on many machine states in lockstep.
+
+    The instances share the program and its predecoded instructions
+    (DecodedInstruction from the ControlUnit and RV32IALU/FPU controls,
+    the same as FastDataPath), while their registers are (instances, 32)
+    uint32 arrays, their PCs an (instances,) array and their memory a
+    VectorMemory.  Each step executes the instruction at one PC for
+    every running instance at that PC with NumPy array operations, the
+    other instances are masked off.  The lowest PC goes first, so
+    instances whose control flow diverged run their own paths and meet
+    again where the paths rejoin.  While the instances agree, a step
+    costs about the same as one scalar step, whatever the count.
+
+    FPU instructions go through the FPU instance by instance.  Stores do
+    not modify the program, as with DataPath without unified memory.
+    """
+
+    # Vector steps run between checks of the run deadline
+    deadline_interval = 64
+
+    def __init__(self, instances:int, memory_in_megabytes:int = 4096):
+        self.instances = instances
+        self.rv32i_registers = np.zeros((instances, 32), np.uint32)
+        self.rv32f_registers = np.zeros((instances, 32), np.uint32)
+        self.pcs = np.zeros(instances, np.uint32)
+        self.step_counts = np.zeros(instances, np.int64)
+        self.exit_codes = np.zeros(instances, np.uint8)
+        # Error message of every instance that stopped with EXIT_ERROR
+        self.errors:dict[int, str] = {}
+        self.memory = VectorMemory(instances, memory_in_megabytes * 1_000_000)
+        self.instruction_memory = InstructionMemory(packed=True)
+        self.fpu = FPU()
+        self.all_lanes = np.arange(instances)
+
+    def load_program(self, prog:list[str]):
+        self.instruction_memory.load(prog)
+
+    def write_memory_word(self, address:Word, values:np.ndarray|int):
+        """
+        Writes the word at address in every instance, values holds one
+        value per instance or one for all of them.
+        """
+        values = np.broadcast_to(np.asarray(values, np.uint32), (self.instances,))
+        self.memory.write_word(self.all_lanes, np.full(self.instances, address, np.int64), values)
+
+    def state(self, lane:int) -> DataPath.State:
+        """
+        The architectural state of one instance, comparable with DataPath.state().
+        """
+        return DataPath.State(
+            int(self.pcs[lane]),
+            tuple(int(value) for value in self.rv32i_registers[lane]),
+            tuple(int(value) for value in self.rv32f_registers[lane]),
+            self.memory.nonzero_bytes(lane)
+        )
+
+    def run(self, max_steps:int|None = None, timeout:float|None = None, halt_on_ecall:bool = False) -> list[DataPath.ExitStatus]:
+        """
+        Runs every instance until it stops, with the same limits as
+        DataPath.run, max_steps counting the instructions of each
+        instance.  An instance that raises stops with EXIT_ERROR and its
+        message in self.errors, the others keep running.
+
+        Returns the exit status of every instance.
+        """
+        self.exit_codes[:] = RUNNING
+        self.errors = {}
+        limits = self.step_counts + (max_steps if max_steps is not None else np.iinfo(np.int64).max - self.step_counts)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        steps = 0
+        while True:
+            running = self.exit_codes == RUNNING
+            if not running.any():
+                break
+            if deadline is not None and steps % self.deadline_interval == 0 and time.monotonic() >= deadline:
+                self.exit_codes[running] = EXIT_CODES[EXIT_TIMEOUT]
+                break
+            pc = int(self.pcs[running].min())
+            lanes = np.flatnonzero(running & (self.pcs == pc))
+            self.step(pc, lanes, halt_on_ecall)
+            stopped = lanes[(self.step_counts[lanes] >= limits[lanes]) & (self.exit_codes[lanes] == RUNNING)]
+            self.exit_codes[stopped] = EXIT_CODES[EXIT_BUDGET]
+            steps += 1
+        return [
+            DataPath.ExitStatus(EXIT_REASONS[code], int(step_count), int(pc))
+            for code, step_count, pc in zip(self.exit_codes, self.step_counts, self.pcs)
+        ]
+
+    def step(self, pc:Word, lanes:np.ndarray, halt_on_ecall:bool = False):
+        """
+        Executes the instruction at pc in the given instances.
+        """
+        try:
+            decoded = self.instruction_memory.get_decoded(pc)
+        except (ValueError, RuntimeError) as error:
+            self.stop_with_error(lanes, error)
+            return
+        if decoded is None:
+            self.exit_codes[lanes] = EXIT_CODES[EXIT_END]
+            return
+
+        int_registers = self.rv32i_registers
+        float_registers = self.rv32f_registers
+        count = len(lanes)
+        if decoded.RegFileSel:
+            read_data_1 = float_registers[lanes, decoded.rs1]
+            read_data_2 = float_registers[lanes, decoded.rs2]
+        else:
+            read_data_1 = int_registers[lanes, decoded.rs1]
+            read_data_2 = int_registers[lanes, decoded.rs2]
+
+        if decoded.fpu_op is not None:
+            update = self.fpu.update_word
+            operation = decoded.fpu_op
+            result = np.fromiter(
+                (update(operation, int(a), int(b))[1] for a, b in zip(read_data_1, read_data_2)), np.uint32, count
+            )
+        else:
+            src1 = decoded.src1
+            if src1 == SRC1_ZERO:
+                alu_src1 = np.zeros(count, np.uint32)
+            elif src1 == SRC1_PC:
+                alu_src1 = np.full(count, pc, np.uint32)
+            elif src1 == SRC1_INT_RS1:
+                alu_src1 = int_registers[lanes, decoded.rs1]
+            else:
+                alu_src1 = read_data_1
+            alu_src2 = read_data_2 if decoded.imm is None else np.full(count, decoded.imm, np.uint32)
+            result = VECTOR_OPERATIONS[decoded.alu_op](alu_src1, alu_src2)
+
+        # Memory access and write back
+        address = result
+        if decoded.Jump:
+            # Link register
+            result = np.full(count, (pc + 4) & MASK32, np.uint32)
+        if decoded.MemRead or decoded.MemWrite:
+            faulting = self.memory.out_of_bounds(address, 4)
+            if faulting.any():
+                # Each instance reports its own address, as the scalar engines do
+                for lane, lane_address in zip(lanes[faulting], address[faulting]):
+                    self.stop_with_error(lane[np.newaxis], out_of_bounds_error(int(lane_address), 4))
+                keep = ~faulting
+                lanes, address, result, read_data_2 = lanes[keep], address[keep], result[keep], read_data_2[keep]
+        if decoded.MemRead:
+            mem_data = self.memory.read_word(lanes, address)
+            if decoded.MemToReg:
+                result = mem_data
+        if decoded.MemWrite:
+            self.memory.write_word(lanes, address, read_data_2)
+
+        rd = decoded.rd
+        if decoded.FPRegWrite:
+            float_registers[lanes, rd] = result
+        elif decoded.RegWrite and rd != 0:
+            int_registers[lanes, rd] = result
+
+        if decoded.FPToInt and rd != 0:
+            int_registers[lanes, rd] = result
+        elif decoded.IntToFP:
+            float_registers[lanes, rd] = result
+
+        # Branch and jump logic, the zero flag is the execution result being 0
+        if decoded.JumpReg:
+            self.pcs[lanes] = address & np.uint32(~1 & MASK32)
+        elif decoded.Jump:
+            self.pcs[lanes] = (pc + decoded.jump_offset) & MASK32
+        elif decoded.Branch:
+            taken = (address != 0) == bool(decoded.BranchNotZero)
+            self.pcs[lanes] = np.where(taken, (pc + decoded.branch_offset) & MASK32, (pc + 4) & MASK32)
+        else:
+            self.pcs[lanes] = (pc + 4) & MASK32
+
+        self.step_counts[lanes] += 1
+        if decoded.System and halt_on_ecall and decoded.word in (ECALL_WORD, EBREAK_WORD):
+            self.exit_codes[lanes] = EXIT_CODES[EXIT_ECALL if decoded.word == ECALL_WORD else EXIT_EBREAK]
+
+    def stop_with_error(self, lanes:np.ndarray, error:Exception):
+        self.exit_codes[lanes] = EXIT_CODES[EXIT_ERROR]
+        message = f"{type(error).__name__}: {error}"
+        for lane in lanes:
+            self.errors[int(lane)] = message
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+import gates as g
+
+ASM_DIR = Path(__file__).parent / "test_data" / "asm"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmarks", action="store_true", help="Run the tests marked benchmark, which depend on the host's speed.")
+
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Skips the benchmark tests unless --benchmarks is given, host timing is
+    too noisy for the default run.
+    """
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="host timing, run with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def table_backend():
+    """
+    Runs the test on the table gate backend and restores the previous
+    backend after it, the backend is process wide.
+    """
+    with g.backend(g.BACKEND_TABLE):
+        yield
+
+
+@pytest.fixture(params=sorted(ASM_DIR.glob("*.asm")), ids=lambda p: p.name)
+def asm_path(request) -> Path:
+    """
+    Each assembly fixture in tests/test_data/asm, tests comparing engines
+    take it to run once per fixture.
+    """
+    return request.param
+
+
+def _run_steps(dp, max_steps:int = 100) -> str | None:
+    """
+    Steps dp until the program ends, it raises or max_steps ran.  Returns
+    the repr of the raised error, None if nothing was raised, so engines
+    can be compared on how they stopped as well as on their state.
+    """
+    try:
+        for _ in range(max_steps):
+            if not dp.step():
+                break
+    except Exception as e:
+        return repr(e)
+    return None
+
+
+@pytest.fixture
+def run_steps():
+    return _run_steps
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+import rv32i_alu_control as ac
+from datapath import DataPath
+from memory import bits_to_uint32, int_to_bits
+from rv32i_alu import MODE_GATE, MODE_WORD, RV32IALU
+
+ALU_OPERATIONS = [
+    ac.CTRL_ALU_ADD, ac.CTRL_ALU_SUB, ac.CTRL_ALU_AND, ac.CTRL_ALU_OR, ac.CTRL_ALU_XOR,
+    ac.CTRL_ALU_SLL, ac.CTRL_ALU_SRL, ac.CTRL_ALU_SRA, ac.CTRL_ALU_SLT, ac.CTRL_ALU_SLTU,
+]
+
+EDGE_VALUES = [0, 1, 2, 31, 32, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFE, 0xFFFFFFFF]
+
+
+def operand_pairs():
+    random.seed(1)
+    pairs = [(a, b) for a in EDGE_VALUES for b in EDGE_VALUES]
+    pairs += [(random.getrandbits(32), random.getrandbits(32)) for _ in range(20)]
+    return pairs
+
+
+@pytest.mark.parametrize("operation", ALU_OPERATIONS)
+def test_word_mode_matches_gate_mode(operation):
+    gate_alu = RV32IALU(MODE_GATE)
+    word_alu = RV32IALU(MODE_WORD)
+    for a, b in operand_pairs():
+        a_bits, b_bits = int_to_bits(a, 32), int_to_bits(b, 32)
+        assert gate_alu.update(operation, a_bits, b_bits) == word_alu.update(operation, a_bits, b_bits)
+
+
+def test_sub_is_twos_complement():
+    for a, b in operand_pairs():
+        zero, res = RV32IALU.op_sub(int_to_bits(a, 32), int_to_bits(b, 32))
+        assert bits_to_uint32(res) == (a - b) & 0xFFFFFFFF
+        assert zero == int(a == b)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        RV32IALU("analog")
+
+
+def test_datapath_word_alu_matches_gate_alu():
+    program = ["00500093", "00A00113", "002081B3", "40110233"]  # addi, addi, add, sub
+    gate_dp = DataPath()
+    word_dp = DataPath(alu_mode=MODE_WORD)
+    gate_dp.load_program(program)
+    word_dp.load_program(program)
+    gate_dp.run()
+    word_dp.run()
+    assert gate_dp.state() == word_dp.state()
+    assert word_dp.state().rv32i_registers[1:5] == (5, 10, 15, 5)
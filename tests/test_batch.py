@@ -0,0 +1,63 @@
+import hashlib
+import io
+import json
+from pathlib import Path
+
+from assembler import Assembler
+from batch import EXIT_ERROR, Job, find_jobs, memory_digest, run_batch, run_job, write_results
+from datapath import EXIT_BUDGET, EXIT_ECALL, EXIT_END
+from fast_datapath import FastDataPath
+
+ASM_DIR = Path(__file__).parent / "test_data" / "asm"
+
+
+def test_results_match_a_direct_run():
+    path = ASM_DIR / "read_write_mem.asm"
+    result = run_job(Job(str(path), "functional"))
+    dp = FastDataPath()
+    dp.load_program(Assembler(path.read_text()).parse(0x0))
+    dp.run()
+    assert (result.exit_reason, result.step_count, result.error) == (EXIT_END, dp.step_count, None)
+    assert result.rv32i_registers == list(dp.state().rv32i_registers)
+    # The program stores to memory, so the digest isn't the one of no bytes
+    assert dp.memory.nonzero_bytes()
+    assert result.memory_digest == memory_digest(dp)
+    assert result.memory_digest != hashlib.sha256().hexdigest()
+    # Same memory, same digest, whatever the engine
+    assert result.memory_digest == run_job(Job(str(path), "gate")).memory_digest
+
+
+def test_errors_are_reported(tmp_path):
+    path = tmp_path / "fault.asm"
+    path.write_text("lui x2, 0xFFFFF\nlw x3, 0(x2)\n")
+    result = run_job(Job(str(path)))
+    assert result.exit_reason == EXIT_ERROR
+    assert result.error.startswith("RuntimeError")
+    assert result.step_count == 1
+
+
+def test_manifest_sets_limits_per_program(tmp_path):
+    (tmp_path / "loop.asm").write_text("loop:\nbeq x0, x0, loop\n")
+    (tmp_path / "ecall.asm").write_text("addi x1, x0, 1\necall\naddi x1, x0, 2\n")
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text("\n".join([
+        json.dumps({"path": "loop.asm", "max_steps": 50}),
+        json.dumps({"path": "ecall.asm", "halt_on_ecall": True, "engine": "gate"}),
+    ]))
+    jobs = find_jobs(str(manifest), {"engine": "block", "max_steps": 1000})
+    assert jobs == [
+        Job(str(tmp_path / "loop.asm"), "block", 50),
+        Job(str(tmp_path / "ecall.asm"), "gate", 1000, None, True),
+    ]
+    output = io.StringIO()
+    write_results(run_batch(jobs, workers=2), output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(result["exit_reason"], result["step_count"]) for result in results] == [(EXIT_BUDGET, 50), (EXIT_ECALL, 2)]
+
+
+def test_directory_jobs_run_in_order():
+    jobs = find_jobs(str(ASM_DIR), {"max_steps": 200})
+    assert [Path(job.path).name for job in jobs] == sorted(path.name for path in ASM_DIR.iterdir() if path.suffix in (".asm", ".hex"))
+    results = list(run_batch(jobs, workers=2, chunksize=4))
+    assert [result.path for result in results] == [job.path for job in jobs]
+    assert all(result.step_count <= 200 for result in results)
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import pytest
+from benchmark import Result, find_regressions, load_programs, main, measure, save
+from fast_datapath import FastDataPath
+
+BENCHMARK_DIR = Path(__file__).parent.parent / "benchmarks"
+
+# Checks each workload computes what its header comment says
+EXPECTED = {
+    "int_loop": lambda x, f: x[5] == 134225920,
+    "memcpy": lambda x, f: x[20] == 1571328,
+    "bubble_sort": lambda x, f: (x[20], x[21]) == (1, 64),
+    "fib": lambda x, f: x[10] == 610,
+    "dot_product": lambda x, f: f[4] == 0x46FF0000,
+}
+
+
+def test_every_workload_is_checked():
+    assert set(load_programs(BENCHMARK_DIR)) == set(EXPECTED)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_workload_results(name):
+    dp = FastDataPath()
+    dp.load_program(load_programs(BENCHMARK_DIR)[name])
+    dp.run()
+    assert EXPECTED[name](dp.rv32i_register_file.registers, dp.rv32f_register_file.registers)
+
+
+def test_gate_configuration_is_capped():
+    program = load_programs(BENCHMARK_DIR)["int_loop"]
+    result = measure(program, "gate", repeat=1)
+    assert result.steps == 1000
+    assert result.mips > 0
+
+
+def test_regressions_over_the_threshold_are_reported(tmp_path):
+    results = {"fib/block": Result(1000, 0.01, 0.1), "fib/functional": Result(1000, 0.01, 0.1), "new/block": Result(1, 1, 1)}
+    path = tmp_path / "baseline.json"
+    save({"fib/block": Result(1000, 0.005, 0.2), "fib/functional": Result(1000, 0.0095, 0.105)}, str(path))
+    baseline = json.loads(path.read_text())["results"]
+    regressions = find_regressions(results, baseline, 0.1)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("fib/block")
+
+
+def test_missing_workloads_are_an_error(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["riscv-bench"])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 2
+    assert "No .asm workloads in benchmarks" in capsys.readouterr().err
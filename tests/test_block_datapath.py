@@ -0,0 +1,118 @@
+from pathlib import Path
+
+import pytest
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from fast_datapath import FastDataPath
+
+ASM_DIR = Path(__file__).parent / "test_data" / "asm"
+
+# Upper bound on the steps of a fixture, the block engine is only run
+# on fixtures that finish within it
+MAX_STEPS = 1000
+
+
+def finishes(program: list[str], max_steps: int = MAX_STEPS) -> bool:
+    """
+    Whether the program runs past its end (or raises) within max_steps on
+    the stepping engine.
+    """
+    fast_dp = FastDataPath()
+    fast_dp.load_program(program)
+    try:
+        for _ in range(max_steps):
+            if not fast_dp.step():
+                return True
+    except Exception:
+        return True
+    return False
+
+
+def run_program(dp: FastDataPath) -> str | None:
+    try:
+        dp.run()
+    except Exception as e:
+        return repr(e)
+    return None
+
+
+def test_block_engine_matches_fast_engine(asm_path: Path):
+    program = Assembler(asm_path.read_text()).parse(0x0)
+    if not finishes(program):
+        pytest.skip(f"{asm_path.name} does not finish within {MAX_STEPS} steps")
+
+    fast_dp = FastDataPath()
+    block_dp = BlockDataPath()
+    fast_dp.load_program(program)
+    block_dp.load_program(program)
+
+    assert run_program(fast_dp) == run_program(block_dp)
+    assert fast_dp.step_count == block_dp.step_count
+    assert fast_dp.state() == block_dp.state()
+
+
+def test_blocks_end_at_branches_and_are_cached():
+    program = Assembler("\n".join([
+        "addi x1, x0, 1",
+        "addi x2, x0, 1",
+        "beq x1, x2, 8",
+        "addi x3, x0, 3",
+        "addi x4, x0, 4",
+    ])).parse(0x0)
+    block_dp = BlockDataPath()
+    block_dp.load_program(program)
+    block_dp.run()
+
+    first = block_dp.blocks[0]
+    assert first.length == 3
+    assert first.end == 12
+    # The taken beq skips addi x3
+    assert block_dp.step_count == 4
+    assert block_dp.rv32i_register_file.registers[3:5] == [0, 4]
+
+
+def test_fault_inside_block_leaves_pc_on_faulting_instruction():
+    program = Assembler("\n".join([
+        "addi x1, x0, 5",
+        "lui x2, 0xFFFFF",
+        "lw x3, 0(x2)",  # out of bounds
+        "addi x4, x0, 1",
+    ])).parse(0x0)
+    block_dp = BlockDataPath()
+    block_dp.load_program(program)
+
+    with pytest.raises(RuntimeError):
+        block_dp.run()
+    assert block_dp.pc.value == 8
+    assert block_dp.step_count == 2
+    assert block_dp.rv32i_register_file.registers[1] == 5
+    assert block_dp.rv32i_register_file.registers[4] == 0
+
+
+def test_store_into_text_invalidates_blocks():
+    program = Assembler("\n".join([
+        "addi x1, x0, 7",
+        "sw x1, 0(x0)",
+    ])).parse(0x0)
+    block_dp = BlockDataPath(unified_memory=True)
+    block_dp.load_program(program)
+    block_dp.run()
+
+    assert 0 not in block_dp.blocks
+    assert block_dp.instruction_memory.decoded[0] is None
+    assert block_dp.instruction_memory.decoded[1] is not None
+
+
+def test_data_stores_keep_blocks_with_separate_memories():
+    program = Assembler("\n".join([
+        "addi x1, x0, 7",
+        "sw x1, 0(x0)",
+    ])).parse(0x0)
+    block_dp = BlockDataPath()
+    block_dp.load_program(program)
+    block_dp.run()
+
+    assert 0 in block_dp.blocks
+    assert "_invalidate" not in block_dp.blocks[0].source
+    assert None not in block_dp.instruction_memory.decoded
+    assert block_dp.memory.read_word(0) == 7
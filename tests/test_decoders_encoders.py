@@ -1,8 +1,8 @@
 import pytest
 
 from encoder_decoder import (
-    decoder2x4, decoder3x8, decoder4x16, decoder5x32,
-    encoder8x3, one_hot_to_decimal
+    decoder2x4, decoder3x8, decoder4x16, decoder5x32, decoder5x32_table,
+    encoder8x3, one_hot_to_decimal, REGISTER_INDEX
 )
 
 # Unit Tests created with assistance from AI to ensure correctness.
@@ -87,6 +87,13 @@ def test_decoder5x32_exhaustive():
         assert actual == expected
 
 
+def test_decoder5x32_table_matches_gates():
+    for i in range(32):
+        bits = int_to_bits(i, 5)
+        assert decoder5x32_table(*bits) == decoder5x32(*bits)
+        assert REGISTER_INDEX[bits] == one_hot_to_decimal(decoder5x32(*bits)) == i
+
+
 ##############################################
 # 8 → 3 ENCODER
 ##############################################
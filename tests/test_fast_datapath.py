@@ -0,0 +1,88 @@
+from pathlib import Path
+import time
+
+import pytest
+from assembler import Assembler
+from datapath import DataPath
+from fast_datapath import FastDataPath
+
+
+def test_fast_engine_conformance(asm_path: Path, run_steps):
+    program = Assembler(asm_path.read_text()).parse(0x0)
+
+    gate_dp = DataPath()
+    fast_dp = FastDataPath()
+    gate_dp.load_program(program)
+    fast_dp.load_program(program)
+
+    assert run_steps(gate_dp) == run_steps(fast_dp)
+    assert gate_dp.step_count == fast_dp.step_count
+    assert gate_dp.state() == fast_dp.state()
+
+
+def test_instructions_are_decoded_once():
+    fast_dp = FastDataPath()
+    fast_dp.load_program(["00000063"])  # beq x0, x0, 0 (branches to itself)
+    assert fast_dp.instruction_memory.decoded == [None]
+
+    for _ in range(10):
+        fast_dp.step()
+    decoded = fast_dp.instruction_memory.decoded[0]
+    assert decoded is not None
+    assert decoded.Branch
+
+    fast_dp.step()
+    assert fast_dp.instruction_memory.decoded[0] is decoded
+
+
+def test_invalidate_drops_decoded_slots():
+    fast_dp = FastDataPath()
+    fast_dp.load_program(["00500093", "00A00113", "002081B3"])
+    for _ in range(3):
+        fast_dp.step()
+    assert None not in fast_dp.instruction_memory.decoded
+
+    fast_dp.instruction_memory.invalidate(4, 8)
+    assert fast_dp.instruction_memory.decoded[0] is not None
+    assert fast_dp.instruction_memory.decoded[1] is None
+    assert fast_dp.instruction_memory.decoded[2] is not None
+
+
+def test_data_stores_do_not_invalidate_separate_instruction_memory():
+    program = Assembler("\n".join([
+        "addi x1, x0, 7",
+        "sw x1, 0(x0)",
+    ])).parse(0x0)
+    fast_dp = FastDataPath()
+    fast_dp.load_program(program)
+    fast_dp.run()
+
+    assert None not in fast_dp.instruction_memory.decoded
+    assert fast_dp.memory.read_word(0) == 7
+
+
+def instructions_per_second(engine, program: list[str], steps: int) -> float:
+    # Best of three runs in CPU time, other load on the machine only slows a run down
+    best = float("inf")
+    for _ in range(3):
+        dp = engine()
+        dp.load_program(program)
+        start = time.process_time()
+        for _ in range(steps):
+            dp.step()
+        best = min(best, time.process_time() - start)
+    return steps / max(best, 1e-9)
+
+
+@pytest.mark.benchmark
+def test_fast_engine_meets_the_speedup_target():
+    program = Assembler("\n".join([
+        "addi x5, x0, 1000",
+        "loop:",
+        "addi x6, x6, 3",
+        "addi x5, x5, -1",
+        "bne x5, x0, loop",
+    ])).parse(0x0)
+    gate_rate = instructions_per_second(DataPath, program, 50)
+    fast_rate = instructions_per_second(FastDataPath, program, 2000)
+    assert fast_rate >= 100 * gate_rate, f"{fast_rate / gate_rate:.0f}x"
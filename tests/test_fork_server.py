@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from datapath import EXIT_BUDGET, EXIT_END, EXIT_ERROR, EXIT_TIMEOUT, DataPath
+from fast_datapath import FastDataPath
+from fork_server import ForkServer, find_inputs
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+# x5 is set up before the marker, the rest reads the input length and
+# first word from 0x01000000
+PROGRAM = """
+addi x5, x0, 100
+ecall
+lui x7, 0x1000
+lw x6, 0(x7)
+lw x8, 4(x7)
+add x9, x6, x5
+sw x9, 8(x7)
+"""
+
+
+def server(engine=BlockDataPath, program=PROGRAM, **kwargs):
+    dp = engine(post_mortem_size=0)
+    dp.load_program(Assembler(program).parse(0x0))
+    return ForkServer(dp, **kwargs)
+
+
+@pytest.mark.parametrize("engine", [DataPath, FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+def test_children_run_from_the_warm_state(engine):
+    fork_server = server(engine)
+    warm = fork_server.warm_up()
+    assert (warm.step_count, warm.pc) == (2, 8)
+    results = list(fork_server.run_all([b"\x07\x00\x00\x00", b"abcdefgh"]))
+    assert [result.exit_reason for result in results] == [EXIT_END, EXIT_END]
+    assert [result.rv32i_registers[6] for result in results] == [4, 8]
+    assert [result.rv32i_registers[9] for result in results] == [104, 108]
+    assert results[0].rv32i_registers[8] == 7
+    assert results[1].rv32i_registers[8] == int.from_bytes(b"abcd", "little")
+    assert results[0].step_count == 7
+    # The server's own machine is still at the marker
+    assert fork_server.dp.step_count == 2
+    assert fork_server.dp.state().rv32i_registers[6] == 0
+
+
+def test_children_get_their_own_limits():
+    fork_server = server(program="ecall\nloop:\nbeq x0, x0, loop\n", max_steps=50)
+    fork_server.warm_up()
+    result = fork_server.run(b"")
+    assert (result.exit_reason, result.step_count) == (EXIT_BUDGET, 51)
+
+
+def test_guest_errors_are_reported():
+    fork_server = server(input_address=0xFFFF_FFF0)
+    fork_server.warm_up()
+    result = fork_server.run(b"x" * 64)
+    assert result.exit_reason == EXIT_ERROR
+    assert "out of bounds" in result.error
+
+
+def test_a_child_that_dies_is_reported():
+    fork_server = server()
+    fork_server.warm_up()
+    fork_server.execute = lambda data: os._exit(3)
+    result = fork_server.run(b"")
+    assert result.exit_reason == EXIT_ERROR
+    assert "status 3" in result.error
+
+
+def test_a_hung_child_is_killed():
+    # No max_steps or timeout, the child would loop forever
+    fork_server = server(program="ecall\nloop:\nbeq x0, x0, loop\n", kill_after=0.5)
+    fork_server.warm_up()
+    result = fork_server.run(b"")
+    assert result.exit_reason == EXIT_TIMEOUT
+    assert "killed after 0.5 seconds" in result.error
+    assert 0.5 <= result.seconds < 10
+    # The server keeps going with the next child
+    fork_server.execute = lambda data: os._exit(3)
+    assert fork_server.run(b"").exit_reason == EXIT_ERROR
+
+
+def test_warm_up_needs_a_marker():
+    fork_server = server(program="addi x1, x0, 1\n")
+    with pytest.raises(RuntimeError, match="before reaching an ecall"):
+        fork_server.warm_up()
+
+
+def test_memory_images_are_refused(tmp_path):
+    dp = FastDataPath(memory_image=str(tmp_path / "ram.img"))
+    with pytest.raises(ValueError):
+        ForkServer(dp)
+    dp.memory.close()
+
+
+def test_find_inputs(tmp_path):
+    single = tmp_path / "single"
+    single.write_bytes(b"3")
+    directory = tmp_path / "corpus"
+    directory.mkdir()
+    (directory / "x").write_bytes(b"4")
+    assert find_inputs([str(directory), str(single)]) == [directory / "x", single]
@@ -0,0 +1,84 @@
+import random
+
+from decoded_instruction import DecodedInstruction
+from fast_datapath import FastDataPath
+from fuzzer import COVERAGE_POINTS, NOP, Fuzzer, coverage_of, mutate, random_instruction, random_program
+import control_unit as cu
+
+FDIV = 0x182081D3  # fdiv.s f3, f1, f2, not implemented by the FPU
+
+
+def test_generated_instructions_decode():
+    rng = random.Random(0)
+    for _ in range(3000):
+        word = random_instruction(rng, 8)
+        decoded = DecodedInstruction.from_word(word)
+        assert set(coverage_of(decoded)) <= set(COVERAGE_POINTS)
+        if decoded.opcode == cu.OPCODE_BRANCH_WORD:
+            assert decoded.branch_offset % 4 == 0
+        if decoded.opcode == cu.OPCODE_JAL_WORD:
+            assert decoded.jump_offset % 4 == 0
+
+
+def test_mutations_keep_programs_valid():
+    rng = random.Random(1)
+    words = random_program(rng, 4)
+    for _ in range(200):
+        words = mutate(rng, words)
+        assert words
+        for word in words:
+            DecodedInstruction.from_word(word)
+
+
+def test_campaign_is_kept_on_disk(tmp_path):
+    fuzzer = Fuzzer(str(tmp_path), seed=3, reference=None)
+    fuzzer.fuzz(200)
+    assert fuzzer.corpus
+    assert set(fuzzer.coverage) <= set(COVERAGE_POINTS)
+    assert len(list((tmp_path / "corpus").glob("*.bin"))) == len(fuzzer.corpus)
+
+    resumed = Fuzzer(str(tmp_path), reference=None)
+    assert resumed.coverage == fuzzer.coverage
+    assert sorted(resumed.corpus) == sorted(fuzzer.corpus)
+    assert resumed.crashes == fuzzer.crashes
+
+
+def test_crashes_are_shrunk(tmp_path):
+    fuzzer = Fuzzer(str(tmp_path), reference=None)
+    program = [0x00100093, 0x00208113, FDIV, 0x00000013, 0x0040006F, 0x00100193]
+    signature = fuzzer.fuzz_one(program)
+    assert signature.startswith("RuntimeError: FPU Operation not supported")
+    assert fuzzer.crashes[signature] == [FDIV]
+    assert (tmp_path / "crashes").is_dir()
+    # The same crash again is not kept twice
+    assert fuzzer.fuzz_one([FDIV, FDIV]) == signature
+    assert len(fuzzer.crashes) == 1
+
+
+def test_guest_faults_are_not_crashes(tmp_path):
+    fuzzer = Fuzzer(str(tmp_path), reference=None)
+    # lui x1, 0xFFFFF then lw x2, 0(x1)
+    assert fuzzer.fuzz_one([0xFFFFF0B7, 0x0000A103]) is None
+
+
+class BrokenEngine(FastDataPath):
+    def run(self, *args, **kwargs):
+        status = super().run(*args, **kwargs)
+        self.rv32i_register_file.registers[5] ^= 1
+        return status
+
+
+def test_cross_check_finds_and_shrinks_mismatches(tmp_path):
+    fuzzer = Fuzzer(str(tmp_path), engine=lambda: BrokenEngine(post_mortem_size=0))
+    signature = fuzzer.fuzz_one([0x00100093, 0x00208113, 0x00000073])
+    assert signature == "mismatch: rv32i_registers"
+    assert fuzzer.crashes[signature] == [NOP]
+
+
+def test_cross_checks_reuse_the_engine_run(tmp_path):
+    engines = []
+    fuzzer = Fuzzer(str(tmp_path), engine=lambda: engines.append(1) or FastDataPath(post_mortem_size=0))
+    # New coverage, so it is cross-checked
+    assert fuzzer.fuzz_one([0x00100093, 0x00208113]) is None
+    assert len(engines) == fuzzer.executions == 1
+    assert len(fuzzer.corpus) == 1
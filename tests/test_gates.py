@@ -0,0 +1,94 @@
+from itertools import product
+
+import pytest
+import gates as g
+from encoder_decoder import decoder5x32
+from rv32i_alu import RV32IALU
+from memory import bits_to_uint32, int_to_bits
+
+
+@pytest.mark.parametrize("name", sorted(g.TABLE_GATE_INPUTS))
+def test_table_gates_match_transistor_gates(name):
+    transistor_gate = g.TRANSISTOR_GATES[name]
+    table_gate = g.TABLE_GATES[name]
+    inputs = g.TABLE_GATE_INPUTS[name]
+    for bits in product((0, 1), repeat=inputs):
+        assert table_gate(*bits) == transistor_gate(*bits)
+        for power in (0, 1):
+            assert table_gate(*bits, power) == transistor_gate(*bits, power)
+
+
+def test_use_backend_rebinds_module_gates(table_backend):
+    assert g.get_backend() == g.BACKEND_TABLE
+    assert g.and_gate is g.table_and_gate
+    assert g.one_bit_adder is g.table_one_bit_adder
+
+
+def test_transistor_gates_stay_transistor_gates(table_backend):
+    # The reference model does not pick up the active backend's sub-gates
+    assert g.TRANSISTOR_GATES["and_gate"] is g.transistor_and_gate
+    assert g.and_gate is g.table_and_gate
+    calls = []
+    pmos = g.pmos
+    g.pmos = lambda control, data: calls.append(control) or pmos(control, data)
+    try:
+        g.TRANSISTOR_GATES["and_gate"](1, 1)
+    finally:
+        g.pmos = pmos
+    assert calls
+
+
+def test_backend_is_restored():
+    previous = g.get_backend()
+    with g.backend(g.BACKEND_TABLE):
+        assert g.get_backend() == g.BACKEND_TABLE
+    assert g.get_backend() == previous
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        g.use_backend("relay")
+
+
+def test_components_work_on_table_backend(table_backend):
+    for i in range(32):
+        out = decoder5x32(*int_to_bits(i, 5))
+        assert out.index(1) == i and sum(out) == 1
+
+    _, res = RV32IALU.op_add(int_to_bits(0xDEADBEEF, 32), int_to_bits(0x12345678, 32))
+    assert bits_to_uint32(res) == (0xDEADBEEF + 0x12345678) & 0xFFFFFFFF
+
+
+@pytest.mark.parametrize("name", sorted(g.TABLE_GATE_INPUTS))
+def test_transistor_gates_take_bit_slices(name):
+    np = pytest.importorskip("numpy")
+    inputs = g.TABLE_GATE_INPUTS[name]
+    rows = list(product((0, 1), repeat=inputs))
+    columns = [np.array(column, dtype=bool) for column in zip(*rows)]
+    gate = g.TRANSISTOR_GATES[name]
+    sliced = gate(*columns)
+    expected = [gate(*bits) for bits in rows]
+    if name == "one_bit_adder":
+        assert [(int(s), int(c)) for s, c in zip(*sliced)] == expected
+    else:
+        assert sliced.dtype == bool
+        assert sliced.astype(int).tolist() == expected
+
+
+@pytest.mark.parametrize("instances", [1, 5])
+def test_alu_on_bit_slices(instances):
+    np = pytest.importorskip("numpy")
+    from memory import bit_slices_to_words, words_to_bit_slices
+    a = np.array([0, 1, 0xFFFFFFFF, 0xDEADBEEF, 0x80000000][:instances], dtype=np.uint64)
+    b = np.array([0, 2, 1, 0x12345678, 0x80000000][:instances], dtype=np.uint64)
+    for op, expected in (
+        (RV32IALU.op_add, lambda x, y: (x + y) & 0xFFFFFFFF),
+        (RV32IALU.op_sub, lambda x, y: (x - y) & 0xFFFFFFFF),
+        (RV32IALU.op_and, lambda x, y: x & y),
+        (RV32IALU.op_or, lambda x, y: x | y),
+        (RV32IALU.op_xor, lambda x, y: x ^ y),
+    ):
+        zero, res = op(words_to_bit_slices(a), words_to_bit_slices(b))
+        words = [expected(int(x), int(y)) for x, y in zip(a, b)]
+        assert bit_slices_to_words(res).tolist() == words, op.__name__
+        assert zero.astype(int).tolist() == [int(word == 0) for word in words], op.__name__
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from assembler import Assembler
+from datapath import DataPath
+from instrumentation import Instrumentation, STAGES
+
+ASM_DIR = Path(__file__).parent / "test_data" / "asm"
+
+
+def test_stages_are_counted_once_per_instruction():
+    program = Assembler((ASM_DIR / "read_write_mem.asm").read_text()).parse(0x0)
+    dp = DataPath(packed_words=True)
+    dp.load_program(program)
+    with Instrumentation(dp) as instrumentation:
+        dp.run()
+
+    counters = instrumentation.counters
+    assert instrumentation.instructions == dp.step_count == 5
+    # One fetch per step plus the fetch that finds the end of the program
+    assert counters["fetch"].calls == 6
+    assert counters["decode"].calls == 5
+    assert counters["memory"].calls == 2
+    assert counters["fpu"].calls == 0
+    assert all(counter.nanoseconds >= 0 for counter in counters.values())
+    report = instrumentation.report()
+    assert "Guest instructions: 5" in report
+    for stage in STAGES:
+        assert stage in report
+
+
+def test_detach_restores_the_components():
+    dp = DataPath()
+    original = type(dp.rv32i_alu).update
+    with Instrumentation(dp):
+        assert dp.rv32i_alu.update.__name__ == "timed"
+    assert "update" not in vars(dp.rv32i_alu)
+    assert dp.rv32i_alu.update.__func__ is original
+
+
+def test_nested_stage_calls_are_timed_once():
+    dp = DataPath(alu_mode="word")
+    with Instrumentation(dp) as instrumentation:
+        dp.rv32i_alu.update((0, 0, 0, 0), (0,) * 32, (0,) * 32)
+    # RV32IALU.update calls update_word in word mode
+    assert instrumentation.counters["alu"].calls == 1
@@ -0,0 +1,116 @@
+import pytest
+
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from datapath import DataPath
+from fast_datapath import FastDataPath
+from lockstep import LockstepChecker
+
+# A loop summing 1..10 into x2 and storing each partial sum
+PROGRAM = """
+addi x1, x0, 10
+lui x3, 0x10
+loop:
+add x2, x2, x1
+sw x2, 0(x3)
+addi x3, x3, 4
+addi x1, x1, -1
+bne x1, x0, loop
+"""
+
+
+def load(engine, program=PROGRAM):
+    dp = engine(post_mortem_size=0)
+    dp.load_program(Assembler(program).parse(0x0) if isinstance(program, str) else program)
+    return dp
+
+
+class WrongStore(BlockDataPath):
+    """
+    Stores the wrong byte once the third partial sum has been written.
+    """
+
+    def run(self, *args, **kwargs):
+        status = super().run(*args, **kwargs)
+        address = 0x10008
+        if self.memory.memory.read_word(address) == 27:
+            self.memory.memory.write_word(address, 28)
+        return status
+
+
+class WrongRegister(FastDataPath):
+    def run(self, *args, **kwargs):
+        status = super().run(*args, **kwargs)
+        if self.step_count >= 9:
+            self.rv32i_register_file.registers[7] = 1
+        return status
+
+
+@pytest.mark.parametrize("engine", [FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+@pytest.mark.parametrize("interval", [1, 7, 1000])
+def test_engines_agree(engine, interval):
+    reference = load(lambda **kwargs: DataPath(packed_words=True, **kwargs))
+    candidate = load(engine)
+    assert LockstepChecker(reference, candidate, interval).run() is None
+    assert reference.step_count == candidate.step_count == 52
+    assert candidate.state().rv32i_registers[2] == 55
+
+
+def test_gate_level_reference():
+    checker = LockstepChecker(load(DataPath), load(BlockDataPath), interval=5)
+    assert checker.run(max_steps=12) is None
+    assert checker.reference.step_count == 12
+
+
+def test_checks_compare_only_written_pages():
+    checker = LockstepChecker(load(FastDataPath), load(BlockDataPath))
+    # A page written before the run and never again
+    for dp in (checker.reference, checker.candidate):
+        dp.memory.memory.write_word(0x20000, 1)
+    compared = []
+    compare_pages = checker.compare_pages
+    checker.compare_pages = lambda reference, candidate, page_numbers: (compared.append(page_numbers), compare_pages(reference, candidate, page_numbers))[1]
+    assert checker.run() is None
+    # A check per instruction and one for the run that ends at the end
+    # of the program, only the sw instructions write, to page 0x10
+    assert len(compared) == 53
+    assert [page_numbers for page_numbers in compared if page_numbers] == [{0x10}] * 10
+
+
+@pytest.mark.parametrize("interval", [1, 4, 1000])
+def test_first_memory_divergence_is_found(interval):
+    checker = LockstepChecker(load(FastDataPath), load(WrongStore), interval)
+    divergence = checker.run()
+    # The third sw is the 14th instruction
+    assert (divergence.step_count, divergence.pc) == (14, 0xC)
+    assert divergence.differences == ["mem[0x00010008]: 0x1B != 0x1C"]
+    assert "0x0000000C" in divergence.render()
+
+
+def test_register_divergence_is_found_when_checking_rarely():
+    checker = LockstepChecker(load(BlockDataPath), load(WrongRegister), interval=1000)
+    divergence = checker.run()
+    assert divergence.step_count == 9
+    assert divergence.differences == ["x7: 0x00000000 != 0x00000001"]
+
+
+def test_errors_are_compared():
+    # fdiv.s f3, f1, f2, not implemented by the FPU
+    program = ["182081D3"]
+    assert LockstepChecker(load(DataPath, program), load(FastDataPath, program)).run() is None
+
+    class NoError(FastDataPath):
+        def run(self, *args, **kwargs):
+            self.pc.value += 4
+            self.step_count += 1
+            return self.ExitStatus("end", self.step_count, self.pc.value)
+
+    divergence = LockstepChecker(load(FastDataPath, program), load(NoError, program)).run()
+    assert divergence.differences[0].startswith("exit: error (RuntimeError: FPU Operation not supported")
+
+
+def test_memory_images_are_refused(tmp_path):
+    dp = FastDataPath(memory_image=str(tmp_path / "ram.img"))
+    with pytest.raises(ValueError):
+        LockstepChecker(load(FastDataPath), dp)
+    dp.memory.close()
@@ -0,0 +1,45 @@
+import os
+
+from mapped_memory import MappedMemory
+from memory_unit import MemoryUnit
+from fast_datapath import FastDataPath
+from assembler import Assembler
+
+
+def test_image_is_sparse_and_round_trips(tmp_path):
+    path = tmp_path / "ram.img"
+    memory = MappedMemory(str(path), 1 << 30)
+    assert os.path.getsize(path) == 1 << 30
+    assert memory.read_word(0x1234_5678) == 0
+    memory.write_word(0x2000_0000, 0xDEADBEEF)
+    memory.write_half(0x10, 0xABCD)
+    memory.write_byte(0x3FFF_FFFF, 0x7F)
+    assert memory.read_word(0x2000_0000) == 0xDEADBEEF
+    assert memory.read_byte(0x11) == 0xAB
+    assert memory.nonzero_bytes() == {
+        0x10: 0xCD, 0x11: 0xAB,
+        0x2000_0000: 0xEF, 0x2000_0001: 0xBE, 0x2000_0002: 0xAD, 0x2000_0003: 0xDE,
+        0x3FFF_FFFF: 0x7F,
+    }
+    memory.close()
+    # Only the written pages take up disk space
+    assert os.stat(path).st_blocks * 512 < 1 << 20
+
+
+def test_image_is_kept_and_preloaded(tmp_path):
+    path = tmp_path / "ram.img"
+    with open(path, "wb") as fp:
+        fp.truncate(1 << 20)
+        fp.seek(0x400)
+        fp.write((1234).to_bytes(4, "little"))
+
+    program = Assembler("lw x1, 1024(x0)\naddi x1, x1, 1\nsw x1, 1028(x0)\n").parse(0)
+    dp = FastDataPath(memory_image=str(path))
+    dp.load_program(program)
+    dp.run()
+    dp.memory.close()
+    assert dp.rv32i_register_file.registers[1] == 1235
+
+    unit = MemoryUnit(1, packed=True, image_path=str(path))
+    assert unit.read_word(0x404) == 1235
+    unit.close()
@@ -0,0 +1,82 @@
+import random
+from pathlib import Path
+
+import pytest
+from assembler import Assembler
+from datapath import DataPath
+from fpu import MODE_FLOAT, MODE_REFERENCE, FPU
+import fpu_control as fc
+from memory import bits_to_uint32, int_to_bits
+from rv32i_alu import RV32IALU
+import rv32i_alu_control as ac
+
+ALU_OPERATIONS = [
+    ac.CTRL_ALU_ADD, ac.CTRL_ALU_SUB, ac.CTRL_ALU_AND, ac.CTRL_ALU_OR, ac.CTRL_ALU_XOR,
+    ac.CTRL_ALU_SLL, ac.CTRL_ALU_SRL, ac.CTRL_ALU_SRA, ac.CTRL_ALU_SLT, ac.CTRL_ALU_SLTU,
+]
+
+
+def test_alu_word_matches_bits():
+    alu = RV32IALU()
+    random.seed(0)
+    for _ in range(50):
+        a = random.getrandbits(32)
+        b = random.choice([random.getrandbits(32), random.getrandbits(5), a])
+        for op in ALU_OPERATIONS:
+            zero_bits, res_bits = alu.update(op, int_to_bits(a, 32), int_to_bits(b, 32))
+            zero_word, res_word = alu.update_word(op, a, b)
+            assert zero_bits == zero_word
+            assert bits_to_uint32(res_bits) == res_word, f"{op} {a:08X} {b:08X}"
+
+
+@pytest.mark.parametrize("mode", [MODE_REFERENCE, MODE_FLOAT])
+def test_fpu_word_matches_bits(mode):
+    fpu = FPU(mode)
+    samples = [0x3FC00000, 0x40200000, 0x40600000, 0x40C00000, 0xC0C00000, 0x00000000, 0x7F800000, 0x00400000]
+    for a in samples:
+        for b in samples:
+            for op in (fc.CTRL_FPU_ADD, fc.CTRL_FPU_SUB, fc.CTRL_FPU_MUL):
+                zero_bits, res_bits = fpu.update(op, int_to_bits(a, 32), int_to_bits(b, 32))
+                zero_word, res_word = fpu.update_word(op, a, b)
+                assert zero_bits == zero_word
+                assert bits_to_uint32(res_bits) == res_word
+
+
+def random_float_word(rng: random.Random) -> int:
+    kind = rng.random()
+    if kind < 0.1:
+        # Zeros, infinities, NaNs, subnormals and the normal range limits
+        return rng.choice([0x00000000, 0x80000000, 0x7F800000, 0xFF800000, 0x7FC00000, 0x00000001, 0x807FFFFF, 0x00800000, 0x7F7FFFFF])
+    if kind < 0.5:
+        return rng.getrandbits(32)
+    # Exponents close together, so the operands overlap when added
+    return rng.getrandbits(1) << 31 | rng.randint(120, 134) << 23 | rng.getrandbits(23)
+
+
+def test_fpu_float_mode_matches_reference():
+    rng = random.Random(0)
+    fast, reference = FPU(MODE_FLOAT), FPU(MODE_REFERENCE)
+    for _ in range(20000):
+        a = random_float_word(rng)
+        # Near equal magnitudes cancel when subtracted
+        b = random_float_word(rng) if rng.random() < 0.8 else a ^ rng.getrandbits(3)
+        for op in (fc.CTRL_FPU_ADD, fc.CTRL_FPU_SUB, fc.CTRL_FPU_MUL):
+            assert fast.update_word(op, a, b) == reference.update_word(op, a, b), f"{op} {a:08X} {b:08X}"
+
+
+def test_fpu_mode_is_checked():
+    with pytest.raises(ValueError):
+        FPU("double")
+
+
+def test_packed_datapath_matches_bit_datapath(asm_path: Path, run_steps):
+    program = Assembler(asm_path.read_text()).parse(0x0)
+
+    bits_dp = DataPath()
+    packed_dp = DataPath(packed_words=True)
+    bits_dp.load_program(program)
+    packed_dp.load_program(program)
+
+    assert run_steps(bits_dp) == run_steps(packed_dp)
+    assert bits_dp.step_count == packed_dp.step_count
+    assert bits_dp.state() == packed_dp.state()
@@ -0,0 +1,64 @@
+import pytest
+
+from paged_memory import PAGE_SIZE, PagedMemory
+from memory_unit import MemoryUnit
+from memory import word_to_bits
+
+
+def test_untouched_memory_reads_zero_without_allocating():
+    memory = PagedMemory(1 << 32)
+    assert memory.read_word(0x1234) == 0
+    assert memory.read_half(0xFFFF_0000) == 0
+    assert memory.read_byte(7) == 0
+    assert memory.resident_bytes == 0
+
+
+def test_word_half_byte_round_trip():
+    memory = PagedMemory(1 << 20)
+    memory.write_word(0x100, 0xDEADBEEF)
+    assert memory.read_word(0x100) == 0xDEADBEEF
+    assert memory.read_half(0x100) == 0xBEEF
+    assert memory.read_half(0x102) == 0xDEAD
+    assert memory.read_byte(0x103) == 0xDE
+    memory.write_byte(0x100, 0x1FF)
+    memory.write_half(0x102, 0x12345)
+    assert memory.read_word(0x100) == 0x2345BEFF
+    assert memory.resident_bytes == PAGE_SIZE
+
+
+def test_accesses_across_a_page_boundary():
+    memory = PagedMemory(1 << 20)
+    address = PAGE_SIZE - 2
+    memory.write_word(address, 0x11223344)
+    assert memory.read_word(address) == 0x11223344
+    assert memory.read_half(PAGE_SIZE - 1) == 0x2233
+    assert memory.read_bytes(address, 4) == bytes([0x44, 0x33, 0x22, 0x11])
+    assert memory.resident_bytes == 2 * PAGE_SIZE
+    assert memory.nonzero_bytes() == {
+        PAGE_SIZE - 2: 0x44, PAGE_SIZE - 1: 0x33, PAGE_SIZE: 0x22, PAGE_SIZE + 1: 0x11
+    }
+
+
+def test_bulk_write_spans_pages():
+    memory = PagedMemory(1 << 20)
+    data = bytes(range(256)) * 40
+    memory.write_bytes(100, data)
+    assert memory.read_bytes(100, len(data)) == data
+    assert memory.read_bytes(0, 100) == bytes(100)
+
+
+def test_out_of_bounds_raises():
+    memory = PagedMemory(1024)
+    with pytest.raises(RuntimeError):
+        memory.read_word(1022)
+    with pytest.raises(RuntimeError):
+        memory.write_byte(-1, 0)
+
+
+def test_memory_unit_modes_share_the_backing_store():
+    bits_unit = MemoryUnit(1)
+    packed_unit = MemoryUnit(1, packed=True)
+    bits_unit[8] = word_to_bits(0xCAFEF00D)
+    packed_unit.write(8, 0xCAFEF00D)
+    assert bits_unit.nonzero_bytes() == packed_unit.nonzero_bytes()
+    assert bits_unit[8] == word_to_bits(packed_unit.read(8))
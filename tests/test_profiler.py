@@ -0,0 +1,96 @@
+import pytest
+
+from assembler import Assembler
+from datapath import DataPath
+from fast_datapath import FastDataPath
+from block_datapath import BlockDataPath
+
+PROGRAM = """
+_start:
+addi x1, x0, 5
+lui x5, 0x00010
+sw x1, 0(x5)
+beq x0, x1, next
+next:
+lw x3, 0(x5)
+"""
+
+
+def test_engines_agree(asm_path, run_steps):
+    program = Assembler(asm_path.read_text()).parse(0x0)
+    gate_dp = DataPath(packed_words=True, profile=True)
+    fast_dp = FastDataPath(profile=True)
+    gate_dp.load_program(program)
+    fast_dp.load_program(program)
+    assert run_steps(gate_dp) == run_steps(fast_dp)
+    assert gate_dp.profiler.counts == fast_dp.profiler.counts
+    assert gate_dp.profiler.taken == fast_dp.profiler.taken
+    assert sum(fast_dp.profiler.counts) == fast_dp.step_count
+
+
+@pytest.mark.parametrize("engine", [FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+def test_summary_and_report(engine):
+    assembler = Assembler(PROGRAM)
+    dp = engine(profile=True)
+    dp.load_program(assembler.parse(0))
+    dp.run()
+
+    executed = dict(dp.profiler.executed())
+    assert sum(executed.values()) == dp.step_count == 5
+    summary = dp.profiler.summary()
+    assert summary["total"] == 5
+    assert (summary["branches"], summary["taken_branches"]) == (1, 0)
+    assert (summary["memory_reads"], summary["memory_writes"]) == (1, 1)
+    assert (summary["load"], summary["store"], summary["lui"], summary["alu immediate"]) == (1, 1, 1, 1)
+
+    report = dp.profiler.report(assembler.parse_labels(0))
+    assert "Executed instructions: 5" in report
+    assert "next " in report
+    assert "_start+0xC" in report
+
+
+def test_redirects_are_counted_as_taken():
+    dp = FastDataPath(profile=True)
+    dp.load_program(Assembler(PROGRAM).parse(0))
+    dp.profiler.count(12, 20)
+    dp.profiler.count(12, 16)
+    dp.profiler.count_block(0, 4, 0)
+    assert list(dp.profiler.counts) == [1, 1, 1, 3, 0]
+    assert list(dp.profiler.taken) == [0, 0, 0, 2, 0]
+
+
+def test_reloading_resets_the_counters():
+    dp = FastDataPath(profile=True)
+    dp.load_program(Assembler(PROGRAM).parse(0))
+    dp.run()
+    dp.load_program(Assembler("addi x1, x0, 1\n").parse(0))
+    assert list(dp.profiler.counts) == [0]
+
+
+# The load at patch runs once, then the store turns it into addi x6, x6, 1
+SELF_MODIFYING_PROGRAM = """
+addi x10, x0, 2
+lui x5, 0x00130
+addi x5, x5, 0x313
+patch:
+lw x7, 0(x0)
+sw x5, 12(x0)
+addi x10, x10, -1
+bne x10, x0, patch
+"""
+
+
+@pytest.mark.parametrize("engine", [
+    lambda: DataPath(packed_words=True, unified_memory=True, profile=True),
+    lambda: FastDataPath(unified_memory=True, profile=True),
+    lambda: BlockDataPath(unified_memory=True, profile=True),
+], ids=["packed", "fast", "block"])
+def test_summary_classifies_the_code_that_ran(engine):
+    dp = engine()
+    dp.load_program(Assembler(SELF_MODIFYING_PROGRAM).parse(0))
+    dp.run()
+    assert dp.rv32i_register_file.registers[6] == 1
+    summary = dp.profiler.summary()
+    assert summary["load"] == summary["memory_reads"] == 1
+    assert summary["alu immediate"] == 5
+    assert summary["total"] == dp.step_count == 11
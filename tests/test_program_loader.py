@@ -0,0 +1,111 @@
+import struct
+
+import pytest
+
+from assembler import Assembler
+from fast_datapath import FastDataPath
+from datapath import DataPath
+from program_loader import (
+    EM_RISCV, PF_X, PT_LOAD, load_elf, load_file, load_flat_binary, words_from_bytes
+)
+
+PROGRAM = [
+    "lw x1, 0(x2)",     # x2 holds the data address
+    "addi x1, x1, 5",
+    "sw x1, 4(x2)",
+]
+
+
+def assemble_words(lines, base):
+    return [int(word, 16) for word in Assembler("\n".join(lines) + "\n").parse(base)]
+
+
+def build_elf(text_address, text, data_address, data, bss_size, entry):
+    """
+    A minimal RV32 executable with a text segment and a data segment with .bss.
+    """
+    header_size = 52
+    program_header_size = 32
+    text_offset = header_size + 2 * program_header_size
+    data_offset = text_offset + len(text)
+    ident = b"\x7fELF" + bytes([1, 1, 1]) + bytes(9)
+    header = struct.pack("<16sHHIIIIIHHHHHH", ident, 2, EM_RISCV, 1, entry, header_size, 0, 0,
+        header_size, program_header_size, 2, 0, 0, 0)
+    text_header = struct.pack("<IIIIIIII", PT_LOAD, text_offset, text_address, text_address,
+        len(text), len(text), PF_X | 0x4, 4)
+    data_header = struct.pack("<IIIIIIII", PT_LOAD, data_offset, data_address, data_address,
+        len(data), len(data) + bss_size, 0x6, 4)
+    return header + text_header + data_header + text + data
+
+
+def test_words_from_bytes_pads_the_last_word():
+    assert words_from_bytes(bytes([0x13, 0, 0, 0, 0xFF])) == [0x13, 0xFF]
+
+
+def test_flat_binary():
+    words = assemble_words(PROGRAM, 0)
+    program = load_flat_binary(b"".join(struct.pack("<I", word) for word in words))
+    assert program.entry == 0
+    assert program.instructions == words
+    assert bytes(program.segments[0].data)[:4] == struct.pack("<I", words[0])
+
+
+def test_rejects_other_machines():
+    elf = bytearray(build_elf(0x1000, bytes(4), 0x2000, b"", 0, 0x1000))
+    elf[18] = 0x3E
+    with pytest.raises(ValueError):
+        load_elf(elf)
+
+
+@pytest.mark.parametrize("offset, value", [
+    (28, 0xFFFFFF00),  # e_phoff past the end of the file
+    (44, 3),           # e_phnum counts a header past the end of the file
+    (42, 16),          # e_phentsize smaller than a program header
+])
+def test_rejects_a_truncated_program_header_table(offset, value):
+    elf = bytearray(build_elf(0x1000, bytes(4), 0x2000, b"", 0, 0x1000))
+    field = "<I" if offset == 28 else "<H"
+    struct.pack_into(field, elf, offset, value)
+    with pytest.raises(ValueError):
+        load_elf(elf)
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_elf_runs_from_its_entry_point(tmp_path, packed, table_backend):
+    text_address = 0x1000
+    words = assemble_words(PROGRAM, text_address + 4)
+    text = struct.pack("<I", 0) + b"".join(struct.pack("<I", word) for word in words)
+    data = struct.pack("<I", 37)
+    path = tmp_path / "prog.elf"
+    path.write_bytes(build_elf(text_address, text, 0x8000, data, 64, text_address + 4))
+
+    program = load_file(str(path))
+    assert program.entry == text_address + 4
+    assert program.text_base == text_address
+    assert len(program.instructions) == 4
+
+    dp = DataPath(packed_words=packed, alu_mode="word")
+    dp.memory.memory.write_word(0x8004, 0xFFFFFFFF) # cleared as .bss
+    dp.load_image(program)
+    if packed:
+        dp.rv32i_register_file.registers[2] = 0x8000
+    else:
+        dp.rv32i_register_file.update((0,)*5, (0,)*5, (0, 1, 0, 0, 0), tuple((0x8000 >> i) & 1 for i in range(32)), 1)
+    dp.run()
+    state = dp.state()
+    assert state.pc == text_address + 16
+    assert state.rv32i_registers[1] == 42
+    assert dp.memory.read_word(0x8004) == 42
+
+
+def test_functional_engine_loads_elf(tmp_path):
+    words = assemble_words(PROGRAM, 0x400)
+    text = b"".join(struct.pack("<I", word) for word in words)
+    path = tmp_path / "prog.elf"
+    path.write_bytes(build_elf(0x400, text, 0x8000, struct.pack("<I", 1), 0, 0x400))
+    dp = FastDataPath()
+    dp.load_image(load_file(str(path)))
+    dp.rv32i_register_file.registers[2] = 0x8000
+    dp.run()
+    assert dp.rv32i_register_file.registers[1] == 6
+    assert dp.memory.read_word(0x8004) == 6
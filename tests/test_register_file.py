@@ -16,6 +16,16 @@ def bits_to_int(bits: Bitx32) -> int:
 
 # --- Tests ------------------------------------------------------
 
+def test_gate_decoder_matches_direct_lookup():
+    direct = RV32IRegisterFile()
+    gated = RV32IRegisterFile(gate_decoder=True)
+    for i in range(32):
+        direct.update(bx5(0), bx5(0), bx5(i), bx32(i * 7 + 1), 1)
+        gated.update(bx5(0), bx5(0), bx5(i), bx32(i * 7 + 1), 1)
+    for i in range(32):
+        assert direct.update(bx5(i), bx5(31 - i), bx5(0), bx32(0), 0) == gated.update(bx5(i), bx5(31 - i), bx5(0), bx32(0), 0)
+
+
 def test_initial_registers_are_zero():
     rf = RV32IRegisterFile()
     for i in range(32):
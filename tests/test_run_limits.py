@@ -0,0 +1,72 @@
+import pytest
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from datapath import EXIT_BUDGET, EXIT_EBREAK, EXIT_ECALL, EXIT_END, EXIT_TIMEOUT, DataPath
+from fast_datapath import FastDataPath
+
+ENGINES = {
+    "gate": DataPath,
+    "packed": lambda: DataPath(packed_words=True),
+    "fast": FastDataPath,
+    "block": BlockDataPath,
+}
+
+SELF_BRANCH = "addi x1, x0, 1\nloop:\naddi x1, x1, 1\nbeq x0, x0, loop\n"
+
+SYSTEM_PROGRAM = """
+addi x1, x0, 1
+ecall
+addi x1, x0, 2
+ebreak
+addi x1, x0, 3
+"""
+
+
+def load(engine: str, asm: str):
+    dp = ENGINES[engine]()
+    dp.load_program(Assembler(asm).parse(0x0))
+    return dp
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_budget_stops_an_infinite_loop(engine):
+    dp = load(engine, SELF_BRANCH)
+    status = dp.run(max_steps=25)
+    assert (status.reason, status.step_count) == (EXIT_BUDGET, 25)
+    # The budget counts from the start of each run
+    assert dp.run(max_steps=10).step_count == 35
+    assert dp.state().rv32i_registers[1] == 18
+
+
+@pytest.mark.parametrize("engine", ["packed", "fast", "block"])
+def test_timeout_stops_an_infinite_loop(engine):
+    dp = load(engine, SELF_BRANCH)
+    status = dp.run(timeout=0.05)
+    assert status.reason == EXIT_TIMEOUT
+    assert status.step_count > 0
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_halt_on_ecall_and_ebreak(engine):
+    dp = load(engine, SYSTEM_PROGRAM)
+    status = dp.run(halt_on_ecall=True)
+    assert (status.reason, status.step_count, status.pc) == (EXIT_ECALL, 2, 8)
+    assert dp.state().rv32i_registers[1] == 1
+    # Running again resumes after the ecall
+    assert dp.run(halt_on_ecall=True) == DataPath.ExitStatus(EXIT_EBREAK, 4, 16)
+    assert dp.run(halt_on_ecall=True) == DataPath.ExitStatus(EXIT_END, 5, 20)
+    assert dp.state().rv32i_registers[1] == 3
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_ecall_is_a_no_op_by_default(engine):
+    dp = load(engine, SYSTEM_PROGRAM)
+    assert dp.run() == DataPath.ExitStatus(EXIT_END, 5, 20)
+    assert dp.state().rv32i_registers[1] == 3
+
+
+def test_profiler_counts_the_halting_ecall():
+    dp = FastDataPath(profile=True)
+    dp.load_program(Assembler(SYSTEM_PROGRAM).parse(0x0))
+    dp.run(halt_on_ecall=True)
+    assert list(dp.profiler.counts) == [1, 1, 0, 0, 0]
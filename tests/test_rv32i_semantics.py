@@ -0,0 +1,167 @@
+import pytest
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from datapath import DataPath
+from decoded_instruction import DecodedInstruction
+from fast_datapath import FastDataPath
+import fpu_control as fc
+import rv32i_alu_control as ac
+
+ENGINES = {
+    "gate": DataPath,
+    "packed": lambda: DataPath(packed_words=True),
+    "fast": FastDataPath,
+    "block": BlockDataPath,
+}
+
+
+def run_asm(engine: str, asm: str, max_steps: int = 1000):
+    dp = ENGINES[engine]()
+    dp.load_program(Assembler(asm).parse(0x0))
+    if engine == "block":
+        dp.run()
+    else:
+        for _ in range(max_steps):
+            if not dp.step():
+                break
+    return dp.state()
+
+
+@pytest.mark.parametrize("word, alu_op", [
+    (0x00208033, ac.CTRL_ALU_ADD),   # add
+    (0x40208033, ac.CTRL_ALU_SUB),   # sub
+    (0x00209033, ac.CTRL_ALU_SLL),   # sll
+    (0x0020C033, ac.CTRL_ALU_XOR),   # xor
+    (0x0020D033, ac.CTRL_ALU_SRL),   # srl
+    (0x4020D033, ac.CTRL_ALU_SRA),   # sra
+    (0x0020E033, ac.CTRL_ALU_OR),    # or
+    (0x0020F033, ac.CTRL_ALU_AND),   # and
+    (0xFFF08013, ac.CTRL_ALU_ADD),   # addi x0, x1, -1 keeps ADD with bit 30 set
+    (0x4030D013, ac.CTRL_ALU_SRA),   # srai
+    (0xFE029EE3, ac.CTRL_ALU_SUB),   # bne
+    (0x00004063, ac.CTRL_ALU_SLT),   # blt
+    (0x00007063, ac.CTRL_ALU_SLTU),  # bgeu
+])
+def test_funct3_selects_the_alu_operation(word, alu_op):
+    assert DecodedInstruction.from_word(word).alu_op == alu_op
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_branch_conditions(engine):
+    # Every branch is taken exactly when it should be, x10 counts the taken ones
+    state = run_asm(engine, "\n".join([
+        "addi x1, x0, -1",
+        "addi x2, x0, 1",
+        "beq x2, x2, 8",
+        "addi x20, x0, 1",
+        "bne x1, x2, 8",
+        "addi x20, x0, 2",
+        "blt x1, x2, 8",
+        "addi x20, x0, 3",
+        "bge x2, x1, 8",
+        "addi x20, x0, 4",
+        "bltu x2, x1, 8",
+        "addi x20, x0, 5",
+        "bgeu x1, x2, 8",
+        "addi x20, x0, 6",
+        "beq x1, x2, 8",
+        "addi x10, x10, 1",
+        "bne x2, x2, 8",
+        "addi x10, x10, 1",
+        "blt x2, x1, 8",
+        "addi x10, x10, 1",
+        "bge x1, x2, 8",
+        "addi x10, x10, 1",
+        "bltu x1, x2, 8",
+        "addi x10, x10, 1",
+        "bgeu x2, x1, 8",
+        "addi x10, x10, 1",
+    ]))
+    assert state.rv32i_registers[20] == 0
+    assert state.rv32i_registers[10] == 6
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_backward_branch_loop(engine):
+    state = run_asm(engine, "\n".join([
+        "addi x5, x0, 5",
+        "loop:",
+        "addi x6, x6, 3",
+        "addi x5, x5, -1",
+        "bne x5, x0, loop",
+    ]))
+    assert state.rv32i_registers[5:7] == (0, 15)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_jal_and_jalr_link_and_return(engine):
+    state = run_asm(engine, "\n".join([
+        "jal x1, function",
+        "addi x7, x0, 7",
+        "jal x0, end",
+        "function:",
+        "addi x6, x0, 6",
+        "jalr x0, 0(x1)",
+        "end:",
+    ]))
+    assert state.rv32i_registers[1] == 4
+    assert state.rv32i_registers[6:8] == (6, 7)
+    assert state.pc == 20
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_shifts(engine):
+    state = run_asm(engine, "\n".join([
+        "addi x1, x0, -16",
+        "addi x2, x0, 2",
+        "sll x3, x1, x2",
+        "srl x4, x1, x2",
+        "sra x5, x1, x2",
+        "slli x6, x2, 4",
+    ]))
+    assert state.rv32i_registers[3:7] == (0xFFFFFFC0, 0x3FFFFFFC, 0xFFFFFFFC, 32)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fsw_addresses_with_the_integer_base(engine):
+    state = run_asm(engine, "\n".join([
+        "lui x5, 0x3FC00",
+        "lui x7, 0x10",
+        "sw x5, 0(x7)",
+        "flw f1, 0(x7)",
+        "fsw f1, 8(x7)",
+    ]))
+    assert state.memory.get(0x1000A) == 0xC0
+    assert state.memory.get(0x1000B) == 0x3F
+
+
+@pytest.mark.parametrize("word, fpu_op", [
+    (0x002081D3, fc.CTRL_FPU_ADD),    # fadd.s f3, f1, f2
+    (0x082081D3, fc.CTRL_FPU_SUB),    # fsub.s
+    (0x102081D3, fc.CTRL_FPU_MUL),    # fmul.s
+    (0x182081D3, fc.CTRL_FPU_DIV),    # fdiv.s
+    (0x202081D3, fc.CTRL_FPU_SGNJ),   # fsgnj.s
+    (0x282091D3, fc.CTRL_FPU_MAX),    # fmax.s
+    (0xA020A1D3, fc.CTRL_FPU_EQ),     # feq.s
+    (0xE00081D3, fc.CTRL_FPU_MV_X_W), # fmv.x.w
+    (0xE00091D3, fc.CTRL_FPU_CLASS),  # fclass.s
+    (0xF00081D3, fc.CTRL_FPU_MV_W_X), # fmv.w.x
+])
+def test_funct7_selects_the_fpu_operation(word, fpu_op):
+    assert DecodedInstruction.from_word(word).fpu_op == fpu_op
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fsub(engine):
+    state = run_asm(engine, "\n".join([
+        "lui x5, 0x40200",
+        "lui x6, 0x3FC00",
+        "lui x7, 0x10",
+        "sw x5, 0(x7)",
+        "sw x6, 4(x7)",
+        "flw f1, 0(x7)",
+        "flw f2, 4(x7)",
+        "fsub.s f3, f1, f2",
+    ]))
+    # 2.5 - 1.5
+    assert state.rv32f_registers[3] == 0x3F800000
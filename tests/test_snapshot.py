@@ -0,0 +1,135 @@
+import pytest
+
+from assembler import Assembler
+from block_datapath import BlockDataPath
+from checkpoint import load_checkpoint, save_checkpoint
+from datapath import EXIT_ECALL, DataPath
+from fast_datapath import FastDataPath
+from mapped_memory import MappedMemory
+from paged_memory import PagedMemory
+
+ENGINES = {
+    "gate": DataPath,
+    "packed": lambda **kwargs: DataPath(packed_words=True, **kwargs),
+    "fast": FastDataPath,
+    "block": BlockDataPath,
+}
+
+# The init phase stores to memory and stops on the ecall, the rest
+# depends on everything it set up
+BOOTED = """
+addi x1, x0, 5
+lui x7, 0x10
+sw x1, 0(x7)
+ecall
+lw x2, 0(x7)
+add x3, x2, x1
+sw x3, 4(x7)
+addi x1, x1, 1
+sw x1, 0(x7)
+"""
+
+
+def boot(engine: str, **kwargs):
+    dp = ENGINES[engine](**kwargs)
+    dp.load_program(Assembler(BOOTED).parse(0x0))
+    assert dp.run(halt_on_ecall=True).reason == EXIT_ECALL
+    return dp
+
+
+def test_pages_are_shared_until_written():
+    memory = PagedMemory(1 << 20)
+    memory.write_word(0x10, 1)
+    memory.write_word(0x2000, 2)
+    snapshot = memory.snapshot()
+    assert snapshot[0] is memory.pages[0]
+    memory.write_word(0x14, 3)
+    assert memory.read_word(0x14) == 3
+    assert snapshot[0][0x14] == 0
+    # Only the written page was copied
+    assert snapshot[2] is memory.pages[2]
+    assert memory.dirty_pages() == [0]
+    memory.restore(snapshot)
+    assert memory.nonzero_bytes() == {0x10: 1, 0x2000: 2}
+    assert memory.dirty_pages() == []
+
+
+def test_clear_does_not_reach_the_snapshot():
+    memory = PagedMemory(1 << 20)
+    memory.write_word(0x10, 0xFFFFFFFF)
+    snapshot = memory.snapshot()
+    memory.clear(0x10, 2)
+    assert memory.read_word(0x10) == 0xFFFF0000
+    assert snapshot[0][0x10:0x14] == b"\xFF" * 4
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_restore_rolls_back_a_run(engine):
+    dp = boot(engine)
+    snapshot = dp.snapshot()
+    dp.run()
+    finished = dp.state()
+    assert finished.rv32i_registers[1:4] == (6, 5, 10)
+    for _ in range(2):
+        dp.restore(snapshot)
+        assert dp.state().rv32i_registers[1:4] == (5, 0, 0)
+        assert dp.step_count == 4
+        dp.run()
+        assert dp.state() == finished
+
+
+@pytest.mark.parametrize("engine", ["packed", "fast", "block"])
+def test_restore_drops_code_decoded_after_the_snapshot(engine):
+    dp = ENGINES[engine](unified_memory=True)
+    program = Assembler("ecall\nlui x5, 0x00700\naddi x5, x5, 0x93\nsw x5, 20(x0)\naddi x1, x0, 1\naddi x1, x0, 2\n").parse(0x0)
+    dp.load_program(program)
+    dp.run(halt_on_ecall=True)
+    snapshot = dp.snapshot()
+    dp.run()
+    assert dp.instruction_memory.get_decoded(20).word == 0x00700093
+    dp.restore(snapshot)
+    assert dp.instruction_memory.get_decoded(20).word == int(program[5], 16)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_checkpoint_resumes_in_a_new_machine(engine, tmp_path):
+    path = str(tmp_path / "booted.ckpt")
+    dp = boot(engine)
+    save_checkpoint(dp.snapshot(), path)
+    dp.run()
+
+    resumed = ENGINES[engine]()
+    resumed.load_program(Assembler(BOOTED).parse(0x0))
+    resumed.restore(load_checkpoint(path))
+    resumed.run()
+    assert resumed.state() == dp.state()
+    assert resumed.step_count == dp.step_count
+
+
+def test_checkpoint_round_trips(tmp_path):
+    path = str(tmp_path / "booted.ckpt")
+    snapshot = boot("fast").snapshot()
+    save_checkpoint(snapshot, path)
+    assert load_checkpoint(path) == snapshot
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"RVTRACE1", "not a checkpoint"),
+    (b"RVCKPT01\x00", "truncated"),
+])
+def test_bad_checkpoints_are_rejected(tmp_path, data, message):
+    path = tmp_path / "bad.ckpt"
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        load_checkpoint(str(path))
+
+
+def test_mapped_memory_snapshot(tmp_path):
+    memory = MappedMemory(str(tmp_path / "ram.img"), 1 << 24)
+    memory.write_word(0x10, 1)
+    snapshot = memory.snapshot()
+    memory.write_word(0x10, 2)
+    memory.write_word(0x5000, 3)
+    memory.restore(snapshot)
+    assert memory.nonzero_bytes() == {0x10: 1}
+    memory.close()
@@ -0,0 +1,136 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+from assembler import Assembler
+from datapath import DataPath
+from fast_datapath import FastDataPath
+from block_datapath import BlockDataPath
+import main
+from step_trace import (
+    TRACE_INT_WRITE, TRACE_MEM_READ, TRACE_MEM_WRITE, BinaryTraceSink, JsonLinesTraceSink,
+    PostMortemBuffer, RingBufferTraceSink, TraceSink, read_trace, render_record
+)
+
+ASM_DIR = Path(__file__).parent / "test_data" / "asm"
+
+
+def test_engines_write_the_same_trace(asm_path, run_steps, table_backend):
+    program = Assembler(asm_path.read_text()).parse(0x0)
+    gate_dp = DataPath(trace=RingBufferTraceSink(256), alu_mode="word")
+    fast_dp = FastDataPath(trace=RingBufferTraceSink(256))
+    gate_dp.load_program(program)
+    fast_dp.load_program(program)
+    assert run_steps(gate_dp) == run_steps(fast_dp)
+    assert gate_dp.trace.records() == fast_dp.trace.records()
+
+
+def test_memory_and_register_writes_are_recorded():
+    program = Assembler((ASM_DIR / "read_write_mem.asm").read_text()).parse(0x0)
+    dp = BlockDataPath(trace=RingBufferTraceSink(16))
+    dp.load_program(program)
+    dp.run()
+    records = dp.trace.records()
+    assert [record.step for record in records] == list(range(5))
+    store, load = records[3], records[4]
+    assert store.flags == TRACE_MEM_WRITE
+    stored = dp.rv32i_register_file.registers[5]
+    assert (store.mem_address, store.mem_data) == (0x1000, stored)
+    assert load.flags == TRACE_MEM_READ | TRACE_INT_WRITE
+    assert (load.rd, load.rd_value, load.mem_data) == (7, stored, stored)
+    assert f"MEMORY WRITE at: 0x00001000  data: 0x{stored:08X}" in render_record(store)
+
+
+def test_ring_buffer_keeps_the_last_records():
+    sink = RingBufferTraceSink(4)
+    for step in range(10):
+        sink.record(step, step * 4, 0x13, step * 4 + 4, 0, 0, 0, 0, 0)
+    assert [record.step for record in sink.records()] == [6, 7, 8, 9]
+
+
+@pytest.mark.parametrize("sink_type", [BinaryTraceSink, JsonLinesTraceSink])
+def test_trace_files_round_trip(tmp_path, sink_type):
+    program = Assembler((ASM_DIR / "example_prog2.asm").read_text()).parse(0x0)
+    ring = RingBufferTraceSink(64)
+    dp = FastDataPath(trace=ring)
+    dp.load_program(program)
+    dp.run()
+
+    path = tmp_path / "trace"
+    with sink_type(str(path)) as sink:
+        dp = FastDataPath(trace=sink)
+        dp.load_program(program)
+        dp.run()
+    assert list(read_trace(str(path))) == ring.records()
+
+
+FAULTING_PROGRAM = """
+addi x1, x0, 1
+addi x1, x1, 2
+lui x2, 0xFFFFF
+lw x3, 0(x2)
+"""
+
+
+@pytest.mark.parametrize("engine", [DataPath, FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+def test_post_mortem_is_reported_when_run_raises(engine):
+    dp = engine(post_mortem_size=2) if engine is not DataPath else DataPath(packed_words=True, post_mortem_size=2)
+    dp.load_program(Assembler(FAULTING_PROGRAM).parse(0))
+    with pytest.raises(RuntimeError) as info:
+        dp.run()
+    note = "\n".join(info.value.__notes__)
+    assert "Stopped at pc 0x0000000C" in note
+    if engine is BlockDataPath:
+        # Only the three instructions that ran before the fault are kept
+        assert "block of 3 instructions" in note
+    else:
+        assert [record.step for record in dp.post_mortem.records(dp.step_count)] == [1, 2]
+        assert "x1 = 0x00000003" in note
+
+
+def test_post_mortem_matches_the_full_trace(tmp_path, table_backend):
+    program = Assembler((ASM_DIR / "read_write_mem.asm").read_text()).parse(0x0)
+    gate_dp = DataPath(trace=RingBufferTraceSink(8), post_mortem_size=8, alu_mode="word")
+    fast_dp = FastDataPath(post_mortem_size=8, post_mortem_path=str(tmp_path / "post_mortem"))
+    for dp in (gate_dp, fast_dp):
+        dp.load_program(program)
+        dp.run()
+    records = gate_dp.trace.records()
+    # The last next pc is only known to the full trace
+    records[-1] = records[-1]._replace(next_pc=0)
+    assert gate_dp.post_mortem.records(gate_dp.step_count) == records
+    assert fast_dp.post_mortem.records(fast_dp.step_count) == records
+
+
+def test_post_mortem_is_written_to_a_file(tmp_path):
+    path = tmp_path / "post_mortem"
+    dp = FastDataPath(post_mortem_path=str(path))
+    dp.load_program(Assembler(FAULTING_PROGRAM).parse(0))
+    with pytest.raises(RuntimeError):
+        dp.run()
+    assert [record.pc for record in read_trace(str(path))] == [0, 4, 8]
+
+
+def test_post_mortem_keeps_fixed_size_columns():
+    buffer = PostMortemBuffer(5)
+    assert buffer.capacity == 8
+    for step in range(20):
+        buffer.record(step, 4 * step, 0x00108093, step, 0)
+    assert len(buffer.pcs) == 8
+    assert [record.step for record in buffer.records(20)] == list(range(12, 20))
+    assert [record.rd_value for record in buffer.records(20)] == list(range(12, 20))
+
+
+def test_trace_sink_requires_record():
+    with pytest.raises(TypeError):
+        TraceSink()
+
+
+def test_trace_flag_turns_step_printing_off(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "trace"
+    source = str(ASM_DIR / "read_write_mem.asm")
+    monkeypatch.setattr(sys, "argv", ["riscv-sim", source, "--engine", "functional", "--trace", str(path)])
+    main.main()
+    assert "STEP" not in capsys.readouterr().out
+    assert len(list(read_trace(str(path)))) == 5
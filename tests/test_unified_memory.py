@@ -0,0 +1,77 @@
+import pytest
+
+from assembler import Assembler
+from datapath import DataPath
+from fast_datapath import FastDataPath
+from block_datapath import BlockDataPath
+from program_loader import LoadedProgram
+
+SELF_MODIFYING = """
+lui x5, 0x00700
+addi x5, x5, 0x93
+sw x5, 16(x0)
+addi x1, x0, 1
+addi x1, x0, 2
+"""
+
+
+def make(engine, **kwargs):
+    if engine is DataPath:
+        return DataPath(packed_words=True, unified_memory=True, **kwargs)
+    return engine(unified_memory=True, **kwargs)
+
+
+@pytest.mark.parametrize("engine", [DataPath, FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+def test_program_is_loaded_into_data_memory(engine):
+    program = Assembler("addi x1, x0, 5\nlw x2, 0(x0)\n").parse(0)
+    dp = make(engine)
+    dp.load_program(program)
+    dp.run()
+    assert dp.rv32i_register_file.registers[1] == 5
+    assert dp.rv32i_register_file.registers[2] == int(program[0], 16)
+    assert dp.instruction_memory.memory == []
+
+
+@pytest.mark.parametrize("engine", [DataPath, FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+def test_stores_modify_the_program(engine):
+    dp = make(engine)
+    dp.load_program(Assembler(SELF_MODIFYING).parse(0))
+    # Warm the decode caches before the store replaces the last instruction
+    for _ in range(5):
+        dp.instruction_memory.get_decoded(_ * 4)
+    dp.run()
+    assert dp.rv32i_register_file.registers[1] == 7
+    assert dp.step_count == 5
+
+
+def test_gate_level_datapath_fetches_from_memory(table_backend):
+    dp = DataPath(unified_memory=True, alu_mode="word")
+    dp.load_program(Assembler(SELF_MODIFYING).parse(0))
+    dp.run()
+    assert dp.state().rv32i_registers[1] == 7
+
+
+def test_gate_level_stores_drop_stale_decodes(table_backend):
+    dp = DataPath(unified_memory=True, alu_mode="word")
+    dp.load_program(Assembler(SELF_MODIFYING).parse(0))
+    stale = dp.instruction_memory.get_decoded(16)
+    dp.run()
+    assert dp.state().rv32i_registers[1] == 7
+    # The store replaced addi x1, x0, 2 with addi x1, x0, 7
+    decoded = dp.instruction_memory.get_decoded(16)
+    assert decoded is not stale
+    assert decoded.word == 0x00700093
+
+
+@pytest.mark.parametrize("engine", [DataPath, FastDataPath, BlockDataPath], ids=lambda e: e.__name__)
+def test_stores_below_the_text_keep_decodes(engine):
+    # The first store is below the text, the second overwrites its first word
+    words = [int(word, 16) for word in Assembler("lui x1, 0x1\nsw x1, 0(x0)\nsw x0, 0(x1)\n").parse(0)]
+    dp = make(engine)
+    dp.load_image(LoadedProgram(0x1000, 0x1000, words))
+    invalidated = []
+    invalidate = dp.instruction_memory.invalidate
+    dp.instruction_memory.invalidate = lambda start, end: (invalidated.append(start), invalidate(start, end))
+    dp.run()
+    assert dp.memory.memory.read_word(0) == 0x1000
+    assert invalidated == [0x1000]
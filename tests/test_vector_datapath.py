@@ -0,0 +1,102 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from assembler import Assembler
+from datapath import EXIT_BUDGET, EXIT_ECALL, EXIT_END, EXIT_ERROR
+from fast_datapath import FastDataPath
+from vector_datapath import VectorDataPath
+
+# x1 selects the path, every instance sorts its own three words at 0x100
+DIVERGENT = """
+lui x7, 0x1
+addi x2, x0, 3
+loop:
+beq x1, x0, even
+addi x3, x3, 5
+sub x4, x4, x1
+jal x0, next
+even:
+addi x3, x3, -7
+sra x4, x3, x2
+next:
+sw x3, 256(x0)
+lw x5, 256(x0)
+slt x6, x4, x3
+sltu x8, x4, x3
+addi x2, x2, -1
+bne x2, x0, loop
+sw x4, 2(x7)
+lw x9, 2(x7)
+"""
+
+SYSTEM_PROGRAM = "addi x1, x1, 1\necall\naddi x1, x1, 2\n"
+
+
+def scalar_state(program: list[str], x1: int):
+    dp = FastDataPath()
+    dp.load_program(program)
+    dp.rv32i_register_file.registers[1] = x1
+    dp.run()
+    return dp.state()
+
+
+@pytest.mark.parametrize("instances", [1, 5])
+def test_every_instance_matches_the_functional_engine(instances):
+    program = Assembler(DIVERGENT).parse(0x0)
+    values = [0, 1, 0xFFFFFFFF, 0x80000000, 7][:instances]
+    vdp = VectorDataPath(instances)
+    vdp.load_program(program)
+    vdp.rv32i_registers[:, 1] = values
+    statuses = vdp.run()
+    assert {status.reason for status in statuses} == {EXIT_END}
+    for lane, x1 in enumerate(values):
+        expected = scalar_state(program, x1)
+        assert vdp.state(lane) == expected
+
+
+def test_divergent_instances_count_their_own_steps():
+    program = Assembler(DIVERGENT).parse(0x0)
+    vdp = VectorDataPath(2)
+    vdp.load_program(program)
+    vdp.rv32i_registers[:, 1] = [0, 1]
+    statuses = vdp.run()
+    for lane, x1 in enumerate([0, 1]):
+        dp = FastDataPath()
+        dp.load_program(program)
+        dp.rv32i_register_file.registers[1] = x1
+        assert statuses[lane].step_count == dp.run().step_count
+
+
+def test_budget_and_halt_on_ecall_apply_per_instance():
+    vdp = VectorDataPath(3)
+    vdp.load_program(Assembler(SYSTEM_PROGRAM).parse(0x0))
+    vdp.rv32i_registers[:, 1] = [0, 10, 20]
+    statuses = vdp.run(halt_on_ecall=True)
+    assert [status.reason for status in statuses] == [EXIT_ECALL] * 3
+    assert [status.pc for status in statuses] == [8] * 3
+    statuses = vdp.run(max_steps=1)
+    assert [status.reason for status in statuses] == [EXIT_BUDGET] * 3
+    assert list(vdp.rv32i_registers[:, 1]) == [3, 13, 23]
+
+
+def test_a_faulting_instance_stops_alone():
+    vdp = VectorDataPath(3)
+    vdp.load_program(Assembler("lw x2, 0(x1)\naddi x3, x0, 1\n").parse(0x0))
+    vdp.rv32i_registers[:, 1] = [0x100, 0xFFFFFFF0, 0xFFFFFFFE]
+    statuses = vdp.run()
+    assert [status.reason for status in statuses] == [EXIT_END, EXIT_ERROR, EXIT_ERROR]
+    # The same errors as the scalar engines, each with its own address
+    assert vdp.errors == {
+        1: "RuntimeError: Memory address out of bounds: 0xfffffff0 to 0xfffffff4",
+        2: "RuntimeError: Memory address out of bounds: 0xfffffffe to 0x100000002",
+    }
+    assert list(vdp.rv32i_registers[:, 3]) == [1, 0, 0]
+
+
+def test_memory_words_per_instance():
+    vdp = VectorDataPath(3)
+    vdp.write_memory_word(0x1FFE, [0x11223344, 0x55667788, 0xAABBCCDD])
+    vdp.write_memory_word(0x3000, 9)
+    assert vdp.memory.read_word(np.arange(3), np.full(3, 0x1FFE)).tolist() == [0x11223344, 0x55667788, 0xAABBCCDD]
+    assert vdp.state(1).memory == {0x1FFE: 0x88, 0x1FFF: 0x77, 0x2000: 0x66, 0x2001: 0x55, 0x3000: 9}